@@ -1,3 +1,47 @@
 from django.contrib import admin
+from .models import CashDailyBalance, CashFlowMonthlyCube, InvoiceOutbox, InvoiceSequence, ReportJob
 
-# Register your models here.
+
+@admin.register(CashDailyBalance)
+class CashDailyBalanceAdmin(admin.ModelAdmin):
+    list_display = ('cash', 'date', 'opening_amount', 'income_amount', 'expense_amount', 'closing_amount',
+                    'closing_balance', 'movement_count')
+    list_filter = ('cash', 'date', 'has_closing')
+    search_fields = ('cash__name',)
+    readonly_fields = ('cash', 'date', 'opening_amount', 'income_amount', 'expense_amount', 'closing_amount',
+                       'has_closing', 'movement_count', 'closing_balance')
+    date_hierarchy = 'date'
+
+
+@admin.register(CashFlowMonthlyCube)
+class CashFlowMonthlyCubeAdmin(admin.ModelAdmin):
+    list_display = ('month', 'cash', 'subsidiary', 'dimension', 'key', 'total', 'movement_count')
+    list_filter = ('dimension', 'subsidiary', 'cash')
+    readonly_fields = ('month', 'cash', 'subsidiary', 'dimension', 'key', 'total', 'movement_count')
+    date_hierarchy = 'month'
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'report_type', 'status', 'user', 'created_at', 'started_at', 'finished_at', 'filename')
+    list_filter = ('report_type', 'status')
+    readonly_fields = ('report_type', 'params', 'key', 'file_url', 'filename', 'message', 'user', 'created_at',
+                       'started_at', 'finished_at')
+
+
+@admin.register(InvoiceOutbox)
+class InvoiceOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'order_id', 'document_type', 'status', 'serial', 'correlative', 'attempts',
+                    'next_attempt_at', 'created_at', 'finished_at')
+    list_filter = ('document_type', 'status', 'released')
+    search_fields = ('order_id', 'key', 'operation_id')
+    readonly_fields = ('order_id', 'document_type', 'product_type', 'key', 'serial', 'correlative', 'released',
+                       'operation_id',
+                       'attempts', 'message', 'created_at', 'started_at', 'finished_at')
+
+
+@admin.register(InvoiceSequence)
+class InvoiceSequenceAdmin(admin.ModelAdmin):
+    list_display = ('serial', 'document_type', 'last_number')
+    list_filter = ('document_type',)
+    search_fields = ('serial',)
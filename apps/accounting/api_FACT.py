@@ -1,40 +1,96 @@
-import requests
-import decimal
 from django.db.models import Max
 from django.db.models.functions import Coalesce
 
+from .fact_client import FactDocument, FactError, get_fact_client, submit_fact_document, submit_fact_documents
+from .fact_payloads import client_input, credit_note_items, credit_note_payload, sale_items, sale_payload
 from .format_to_dates import utc_to_local
 from .models import *
 from ..sales.models import Order, OrderDetail, Product
 from datetime import datetime, date
 
-GRAPHQL_URL = "https://ng.tuf4ctur4.net.pe/graphql"
-# GRAPHQL_URL = "http://192.168.1.80:9050/graphql"
-
 tokens = {
     "10471315198": "gAAAAABpNGSrdx4rldIqTvwIF3OXemYIfqzx9My1YT9hNVKW9ruOLVfzAeL0MsUUKOqh6XPA1HFX7tu-MmvFu7JojTEM8PGizg==",
 }
 
 
-def get_new_correlative(serial, document_type):
-    """
-    Obtiene un nuevo correlativo para el serial y tipo de documento especificado.
-    document_type: '1' para Factura, '2' para Boleta
-    """
-    # Buscar el último correlativo usando los campos de Order directamente
+def get_last_order_correlative(serial, document_type):
+    """Último correlativo registrado en las órdenes; solo se usa para iniciar la secuencia de la serie"""
     # bill_type: '1' para Factura, '2' para Boleta
-    last_order = Order.objects.filter(
+    return Order.objects.filter(
         subsidiary__serial=serial,
         bill_type=document_type
-    ).exclude(bill_number__isnull=True).order_by('-bill_number').first()
-    
-    if last_order and last_order.bill_number:
-        return last_order.bill_number + 1
-    else:
-        return 1
+    ).aggregate(r=Coalesce(Max('bill_number'), 0)).get('r')
 
 
-def send_bill_4_fact(order_id, product_type='bien'):  # FACTURA 4 FACT
+def get_new_correlative(serial, document_type, count=1):
+    """
+    Reserva un nuevo correlativo (o count consecutivos) para el serial y tipo de documento
+    especificado y devuelve el primero. Cada número se entrega una sola vez, aunque el envío falle.
+    document_type: '1' para Factura, '2' para Boleta
+    """
+    return InvoiceSequence.allocate(
+        serial, document_type, count, initial=lambda: get_last_order_correlative(serial, document_type)
+    )
+
+
+def _register_sale_result(serie, correlative, document_type, failure_message):
+    """Interpreta la respuesta de registerSale"""
+    def parse(result):
+        data = (result.get("data") or {}).get("registerSale") or {}
+        if data.get("success"):
+            return {
+                "success": data.get("success"),
+                "message": data.get("message"),
+                "operationId": data.get("operationId"),
+                "serie": serie,
+                "numero": correlative,
+                "tipo_de_comprobante": document_type,
+            }
+        # Maneja el caso en que la operación no fue exitosa
+        errors = result.get("errors") or []
+        return {
+            "success": False,
+            "message": failure_message,
+            # Motivo del rechazo según el proveedor (p. ej. comprobante ya registrado)
+            "provider_message": data.get("message") or "; ".join(str(e.get("message") or "") for e in errors),
+        }
+    return parse
+
+
+def _order_client(order_obj):
+    """Cliente del comprobante: bill_client si existe, sino client"""
+    return order_obj.bill_client or order_obj.client
+
+
+def _client_name(client_obj):
+    client_name = str(client_obj.full_name or "")
+    if not client_name:
+        client_name = f"{client_obj.first_name or ''} {client_obj.surname or ''}".strip()
+    return client_name
+
+
+def _issue_date_time(order_obj):
+    """Fecha y hora de emisión: bill_date si existe, sino fecha/hora actual"""
+    if order_obj.bill_date:
+        register_date = order_obj.bill_date
+        if getattr(register_date, 'tzinfo', None):
+            register_date = utc_to_local(register_date)
+        return register_date.strftime("%Y-%m-%d"), register_date.strftime("%H:%M:%S")
+    return date.today().strftime("%Y-%m-%d"), datetime.now().strftime("%H:%M:%S")
+
+
+def _order_sale_items(order_obj, product_type):
+    details = OrderDetail.objects.filter(order=order_obj).select_related('product')
+    # Unidad según tipo de producto: NIU para bien, ZZ para servicio
+    unit = 'ZZ' if product_type == 'servicio' else 'NIU'
+    return sale_items(
+        ((str((d.product.name if d.product else d.product_name) or ""), d.quantity, d.price_unit) for d in details),
+        unit
+    )
+
+
+def build_bill_4_fact(order_id, product_type='bien', correlative=None):  # FACTURA 4 FACT
+    """Documento de la factura listo para enviar, o {"error": ...} si la orden no es válida"""
     order_obj = Order.objects.select_related('client', 'bill_client', 'subsidiary').get(id=int(order_id))
     
     # Obtener serial de la sucursal
@@ -42,195 +98,41 @@ def send_bill_4_fact(order_id, product_type='bien'):  # FACTURA 4 FACT
         return {"error": "La orden no tiene sucursal asignada"}
     serial = order_obj.subsidiary.serial or ""
     
-    correlative = get_new_correlative(serial, '1')
-    details = OrderDetail.objects.filter(order=order_obj)
-    
-    # Usar bill_client si existe, sino usar client
-    if order_obj.bill_client:
-        client_obj = order_obj.bill_client
-    elif order_obj.client:
-        client_obj = order_obj.client
-    else:
+    client_obj = _order_client(order_obj)
+    if not client_obj:
         return {"error": "La orden no tiene cliente asignado"}
-    
-    # Obtener nombre del cliente
-    client_name = str(client_obj.full_name or "").replace('"', "'")
-    if not client_name:
-        client_name = f"{client_obj.first_name or ''} {client_obj.surname or ''}".strip()
-    
-    # Obtener dirección del cliente
-    client_address = str(client_obj.address or "").replace('"', "'")
-    
     # Obtener documento del cliente (RUC para factura)
-    if client_obj.document == '06':
-        client_document_number = client_obj.number or ""
-    else:
+    if client_obj.document != '06':
         return {"error": "El cliente debe tener RUC para generar una factura"}
     
-    # Obtener fecha de registro - siempre usar fecha actual del día
-    # Revisar bill_date si existe, sino usar fecha/hora actual
-    if order_obj.bill_date:
-        register_date = order_obj.bill_date
-        formatdate = register_date.strftime("%Y-%m-%d")
-        hour_date = register_date.strftime("%H:%M:%S")
-    else:
-        # Siempre usar la fecha actual del día
-        formatdate = date.today().strftime("%Y-%m-%d")
-        hour_date = datetime.now().strftime("%H:%M:%S")
-    
-    # Obtener total de detracción
-    total_detraction = decimal.Decimal(order_obj.total_detraction or 0)
-    
-    items = []
-    items_credit_graphql = []
-    index = 1
-    sub_total = decimal.Decimal(0)
-    total = decimal.Decimal(0)
-    igv_total = decimal.Decimal(0)
-    
-    # Verificar si es pago a crédito
-    if order_obj.way_to_pay == 'C':
-        # Para crédito, necesitaríamos PaymentFees si existe ese modelo
-        # Por ahora, asumimos que no hay cuotas definidas
-        payment = 9
-        items_credit_graphql = "[]"
-    else:
-        payment = 1
-        items_credit_graphql = "[]"
-    
-    # Procesar detalles de la orden
-    for d in details:
-        if not d.product:
-            # Si no hay producto, usar product_name
-            product_name = str(d.product_name or "").replace('"', "'")
-        else:
-            product_name = str(d.product.name or "").replace('"', "'")
-        
-        # Obtener cantidad (usar quantity en lugar de quantity_sold)
-        quantity = decimal.Decimal(d.quantity or 0)
-        if quantity == 0:
-            continue
-        
-        base_total = quantity * decimal.Decimal(d.price_unit or 0)
-        base_amount = base_total / decimal.Decimal(1.1800)
-        igv = base_total - base_amount
-        sub_total = sub_total + decimal.Decimal(base_amount)
-        total = total + base_total
-        igv_total = igv_total + decimal.Decimal(igv)
-        _base_amount_v = (base_amount / quantity).quantize(decimal.Decimal('0.000001'))
-        
-        # Unidad según tipo de producto: NIU para bien, ZZ para servicio
-        _unit = 'ZZ' if product_type == 'servicio' else 'NIU'
-        
-        item = {
-            "index": str(index),
-            "codigoUnidad": str(_unit),
-            "codigoProducto": "0000",
-            "codigoSunat": "10000000",
-            "producto": product_name,
-            "cantidad": quantity,
-            "precioBase": _base_amount_v,
-            "tipoIgvCodigo": "10"
-        }
-        items.append(item)
-        index += 1
-    
-    if not items:
+    document_items = _order_sale_items(order_obj, product_type)
+    if not document_items.items:
         return {"error": "La orden no tiene items válidos"}
     
-    items_graphql = ", ".join(
-        f"""{{  
-               producto: "{item['producto']}", 
-               cantidad: {item['cantidad']}, 
-               precioBase: {item['precioBase']}, 
-               codigoSunat: "{item['codigoSunat']}",
-               codigoProducto: "{item['codigoProducto']}",
-               codigoUnidad: "{item['codigoUnidad']}",                                            
-               tipoIgvCodigo: "{item['tipoIgvCodigo']}" 
-        }}"""
-        for item in items
+    correlative = correlative or get_new_correlative(serial, '1')
+    # Crédito (9): las cuotas se envían vacías mientras no exista el modelo PaymentFees
+    payment = 9 if order_obj.way_to_pay == 'C' else 1
+    query, variables = sale_payload(
+        'bill', client_input(_client_name(client_obj), client_obj.number or "", 6, str(client_obj.address or "")),
+        "F" + serial, correlative, *_issue_date_time(order_obj), document_items, payment,
+        order_obj.total_detraction or 0
+    )
+    return FactDocument(
+        query, variables, tokens.get("10471315198", "ID no encontrado"),
+        _register_sale_result("F" + serial, correlative, "1",
+                              "La operación no fue exitosa, revise la venta e informe a Sistemas")
     )
-    
-    items_graphql = f"[{items_graphql}]"
-    
-    graphql_query = f"""
-    mutation RegisterSale  {{
-        registerSale(            
-            cliente: {{
-                razonSocialNombres: "{client_name}",
-                numeroDocumento: "{client_document_number}",
-                codigoTipoEntidad: 6,
-                clienteDireccion: "{client_address}"
-            }},
-            venta: {{
-                serie: "F{serial}",
-                numero: "{int(correlative)}",
-                fechaEmision: "{formatdate}",
-                horaEmision: "{hour_date}",
-                fechaVencimiento: "",
-                monedaId: 1,                
-                formaPagoId: {payment},
-                totalGravada: {float(sub_total)},
-                totalDescuentoGlobalPorcentaje: 0,
-                totalDescuentoGlobal: 0,
-                totalIgv: {float(igv_total)},
-                totalExonerada: 0,
-                totalInafecta: 0,
-                totalImporte: {float(total.quantize(decimal.Decimal('0.01')))},
-                totalAPagar: {float(total.quantize(decimal.Decimal('0.01')))},
-                totalDetraction: {float(total_detraction.quantize(decimal.Decimal('0.01')))},
-                tipoDocumentoCodigo: "01",
-                nota: " "
-            }},
-            items: {items_graphql}
-            creditPay: {items_credit_graphql}
-        ) {{
-            message
-            success
-            operationId
-        }}
-    }}
-    """
-    # print(graphql_query)
-    
-    token = tokens.get("10471315198", "ID no encontrado")
-    
-    HEADERS = {
-        "Content-Type": "application/json",
-        "token": token
-    }
-    
-    try:
-        response = requests.post(GRAPHQL_URL, json={"query": graphql_query}, headers=HEADERS)
-        response.raise_for_status()
-        
-        result = response.json()
-        
-        success = result.get("data", {}).get("registerSale", {}).get("success")
-        
-        if success:
-            return {
-                "success": success,
-                "message": result.get("data", {}).get("registerSale", {}).get("message"),
-                "operationId": result.get("data", {}).get("registerSale", {}).get("operationId"),
-                "serie": "F" + serial,
-                "numero": correlative,
-                "tipo_de_comprobante": "1",
-            }
-        else:
-            # Maneja el caso en que la operación no fue exitosa
-            return {
-                "success": False,
-                "message": "La operación no fue exitosa, revise la venta e informe a Sistemas",
-            }
-    
-    except requests.exceptions.RequestException as e:
-        return {"error": f"Error en la solicitud: {str(e)}"}
-    except ValueError:
-        return {"error": "La respuesta no es un JSON válido"}
 
 
-def send_receipt_4_fact(order_id, product_type='bien'):  # BOLETA 4 FACT
+def send_bill_4_fact(order_id, product_type='bien'):  # FACTURA 4 FACT
+    document = build_bill_4_fact(order_id, product_type)
+    if isinstance(document, dict):
+        return document
+    return submit_fact_document(document)
+
+
+def build_receipt_4_fact(order_id, product_type='bien', correlative=None):  # BOLETA 4 FACT
+    """Documento de la boleta listo para enviar, o {"error": ...} si la orden no es válida"""
     order_obj = Order.objects.select_related('client', 'bill_client', 'subsidiary').get(id=int(order_id))
     
     # Obtener serial de la sucursal
@@ -238,277 +140,106 @@ def send_receipt_4_fact(order_id, product_type='bien'):  # BOLETA 4 FACT
         return {"error": "La orden no tiene sucursal asignada"}
     serial = order_obj.subsidiary.serial or ""
     
-    correlative = get_new_correlative(serial, '2')
-    details = OrderDetail.objects.filter(order=order_obj)
-    
-    # Usar bill_client si existe, sino usar client
-    if order_obj.bill_client:
-        client_obj = order_obj.bill_client
-    elif order_obj.client:
-        client_obj = order_obj.client
-    else:
+    client_obj = _order_client(order_obj)
+    if not client_obj:
         return {"error": "La orden no tiene cliente asignado"}
     
-    # Obtener nombre del cliente
-    client_name = str(client_obj.full_name or "").replace('"', "'")
-    if not client_name:
-        client_name = f"{client_obj.first_name or ''} {client_obj.surname or ''}".strip()
-    
-    # Obtener dirección del cliente
-    client_address = str(client_obj.address or "").replace('"', "'")
-    
-    # Obtener documento del cliente (DNI para boleta)
-    if client_obj.document == '01':
-        client_document_number = client_obj.number or ""
-    else:
-        # Si no es DNI, intentar usar el número de documento que tenga
-        client_document_number = client_obj.number or ""
-    
-    # Obtener fecha de registro - siempre usar fecha actual del día
-    # Revisar bill_date si existe, sino usar fecha/hora actual
-    if order_obj.bill_date:
-        register_date = utc_to_local(order_obj.bill_date) if hasattr(order_obj.bill_date, 'tzinfo') and order_obj.bill_date.tzinfo else order_obj.bill_date
-        formatdate = register_date.strftime("%Y-%m-%d")
-        hour_date = register_date.strftime("%H:%M:%S")
-    else:
-        # Siempre usar la fecha actual del día
-        formatdate = date.today().strftime("%Y-%m-%d")
-        hour_date = datetime.now().strftime("%H:%M:%S")
-    
-    # Obtener total de detracción
-    total_detraction = decimal.Decimal(order_obj.total_detraction or 0)
-    
-    items = []
-    index = 1
-    sub_total = decimal.Decimal(0)
-    total = decimal.Decimal(0)
-    igv_total = decimal.Decimal(0)
-    
-    # Procesar detalles de la orden
-    for d in details:
-        if not d.product:
-            # Si no hay producto, usar product_name
-            product_name = str(d.product_name or "").replace('"', "'")
-        else:
-            product_name = str(d.product.name or "").replace('"', "'")
-        
-        # Obtener cantidad (usar quantity en lugar de quantity_sold)
-        quantity = decimal.Decimal(d.quantity or 0)
-        if quantity == 0:
-            continue
-        
-        base_total = quantity * decimal.Decimal(d.price_unit or 0)
-        base_amount = base_total / decimal.Decimal(1.1800)
-        igv = base_total - base_amount
-        sub_total = sub_total + decimal.Decimal(base_amount)
-        total = total + base_total
-        igv_total = igv_total + decimal.Decimal(igv)
-        _base_amount_v = (base_amount / quantity).quantize(decimal.Decimal('0.000001'))
-        
-        # Unidad según tipo de producto: NIU para bien, ZZ para servicio
-        _unit = 'ZZ' if product_type == 'servicio' else 'NIU'
-        
-        item = {
-            "index": str(index),
-            "codigoUnidad": _unit,
-            "codigoProducto": "0000",
-            "codigoSunat": "10000000",
-            "producto": product_name,
-            "cantidad": quantity,
-            "precioBase": _base_amount_v,
-            "tipoIgvCodigo": "10"
-        }
-        items.append(item)
-        index += 1
-    
-    if not items:
+    document_items = _order_sale_items(order_obj, product_type)
+    if not document_items.items:
         return {"error": "La orden no tiene items válidos"}
     
-    items_graphql = ", ".join(
-        f"""{{                     
-                codigoUnidad: "{item['codigoUnidad']}", 
-                codigoProducto: "{item['codigoProducto']}", 
-                codigoSunat: "{item['codigoSunat']}", 
-                producto: "{item['producto']}", 
-                cantidad: {item['cantidad']}, 
-                precioBase: {item['precioBase']}, 
-                tipoIgvCodigo: "{item['tipoIgvCodigo']}" 
-            }}"""
-        for item in items
+    correlative = correlative or get_new_correlative(serial, '2')
+    # DNI para boleta; si no es DNI se usa el número de documento que tenga
+    query, variables = sale_payload(
+        'receipt', client_input(_client_name(client_obj), client_obj.number or "", 1, str(client_obj.address or "")),
+        "B" + serial, correlative, *_issue_date_time(order_obj), document_items, 1,
+        order_obj.total_detraction or 0
+    )
+    return FactDocument(
+        query, variables, tokens.get("10471315198", "ID no encontrado"),
+        _register_sale_result("B" + serial, correlative, "2", "La operación no fue exitosa")
     )
-    
-    items_graphql = f"[{items_graphql}]"
-    
-    graphql_query = f"""
-        mutation RegisterSale  {{
-            registerSale(            
-                cliente: {{
-                    razonSocialNombres: "{client_name}",
-                    numeroDocumento: "{client_document_number}",
-                    codigoTipoEntidad: 1,
-                    clienteDireccion: "{client_address}"
-                }},
-                venta: {{
-                    serie: "B{serial}",
-                    numero: "{int(correlative)}",
-                    fechaEmision: "{formatdate}",
-                    horaEmision: "{hour_date}",
-                    fechaVencimiento: "",
-                    monedaId: 1,                
-                    formaPagoId: 1,
-                    totalGravada: {float(sub_total)},
-                    totalDescuentoGlobalPorcentaje: 0,
-                    totalDescuentoGlobal: 0,
-                    totalIgv: {float(igv_total)},
-                    totalExonerada: 0,
-                    totalInafecta: 0,
-                    totalImporte: {float(total.quantize(decimal.Decimal('0.01')))},
-                    totalAPagar: {float(total.quantize(decimal.Decimal('0.01')))},
-                    totalDetraction: {float(total_detraction.quantize(decimal.Decimal('0.01')))},
-                    tipoDocumentoCodigo: "03",
-                    nota: " "
-                }},
-                items: {items_graphql}
-            ) {{
-                message
-                success
-                operationId
-            }}
-        }}
-        """
-    
-    # print(graphql_query)
-    
-    token = tokens.get("10471315198", "ID no encontrado")
-    
-    HEADERS = {
-        "Content-Type": "application/json",
-        "token": token
-    }
-    
-    try:
-        response = requests.post(GRAPHQL_URL, json={"query": graphql_query}, headers=HEADERS)
-        response.raise_for_status()
-        
-        result = response.json()
-        
-        success = result.get("data", {}).get("registerSale", {}).get("success")
-        
-        if success:
-            return {
-                "success": success,
-                "message": result.get("data", {}).get("registerSale", {}).get("message"),
-                "operationId": result.get("data", {}).get("registerSale", {}).get("operationId"),
-                "serie": "B" + serial,
-                "numero": correlative,
-                "tipo_de_comprobante": "2",
-            }
-        else:
-            # Maneja el caso en que la operación no fue exitosa
-            return {
-                "success": False,
-                "message": "La operación no fue exitosa",
-            }
-    
-    except requests.exceptions.RequestException as e:
-        return {"error": f"Error en la solicitud: {str(e)}"}
-    except ValueError:
-        return {"error": "La respuesta no es un JSON válido"}
 
 
-def number_note(serial=None):
+def send_receipt_4_fact(order_id, product_type='bien'):  # BOLETA 4 FACT
+    document = build_receipt_4_fact(order_id, product_type)
+    if isinstance(document, dict):
+        return document
+    return submit_fact_document(document)
+
+
+def send_batch_4_fact(order_ids, document_type='2', product_type='bien'):
     """
-    Obtiene el siguiente número de nota de crédito.
-    Si no existe el modelo CreditNote, retorna 1.
+    Envía varias facturas ('1') o boletas ('2') en lotes de una sola mutación por viaje al proveedor.
+    Los correlativos de cada serie se reservan en un solo bloque. Devuelve {order_id: resultado}
+    con la misma forma que send_bill_4_fact / send_receipt_4_fact.
+    """
+    build = build_bill_4_fact if document_type == '1' else build_receipt_4_fact
+    serials = dict(Order.objects.filter(id__in=[int(i) for i in order_ids]).values_list('id', 'subsidiary__serial'))
+    # serie -> [siguiente número del bloque, números sin usar]
+    blocks = {}
+    for order_id in order_ids:
+        serial = serials.get(int(order_id)) or ""
+        blocks.setdefault(serial, [None, 0])[1] += 1
+    for serial, block in blocks.items():
+        block[0] = get_new_correlative(serial, document_type, block[1])
+
+    results, documents, document_orders = {}, [], []
+    for order_id in order_ids:
+        block = blocks[serials.get(int(order_id)) or ""]
+        document = build(order_id, product_type, block[0])
+        if isinstance(document, dict):
+            results[order_id] = document
+            continue
+        block[0] += 1
+        block[1] -= 1
+        documents.append(document)
+        document_orders.append(order_id)
+    for serial, (next_number, unused) in blocks.items():
+        # Las órdenes inválidas no consumen número
+        if unused:
+            InvoiceSequence.release(serial, document_type, next_number, unused)
+    results.update(zip(document_orders, submit_fact_documents(documents)))
+    return results
+
+
+def get_last_credit_note_correlative(serial):
+    """
+    Último número de nota de crédito registrado; solo se usa para iniciar la secuencia de la serie.
+    Si no existe el modelo CreditNote, retorna 0.
     """
     try:
         from .models import CreditNote
-        number = CreditNote.objects.filter(serial=serial).aggregate(
+        return CreditNote.objects.filter(serial=serial).aggregate(
             r=Coalesce(Max('correlative'), 0)).get('r')
-        return number + 1
     except (ImportError, AttributeError):
-        # Si no existe el modelo, retornar 1
-        return 1
+        # Si no existe el modelo, la secuencia empieza en 1
+        return 0
+
+
+def number_note(serial=None):
+    """Reserva el siguiente número de nota de crédito de la serie"""
+    return InvoiceSequence.allocate(serial, '3', initial=lambda: get_last_credit_note_correlative(serial))
 
 
 def send_credit_note_fact(pk, details, motive):
-    order_obj = Order.objects.get(id=int(pk))
+    order_obj = Order.objects.select_related('client').get(id=int(pk))
     serial = str(order_obj.voucher_type) + "N01"
-    correlative = number_note(serial)
     client_obj = order_obj.client
-    # date_voucher = datetime.now().strftime("%d-%m-%Y")
-    items = []
-    index = 1
-    sub_total = decimal.Decimal(0)
-    total = decimal.Decimal(0)
-    for d in details:
-        if d['quantityReturned']:
-            product_id = int(d['productID'])
-            product_obj = Product.objects.get(id=product_id)
-            description = str(str(product_obj.name).upper()).replace('"', "'")
-            total_item_igv = decimal.Decimal(d['quantityReturned']) * decimal.Decimal(d['price'])
-            price_igv = decimal.Decimal(d['price'])
-            price_sin_igv = price_igv / decimal.Decimal(1.1800)
-            total_item_sin_igv = total_item_igv / decimal.Decimal(1.1800)
-            igv_item = total_item_igv - total_item_sin_igv
-            total = total + total_item_igv
-            sub_total = sub_total + total_item_sin_igv
-            # Unidad siempre será NIU
-            _unit = 'NIU'
-            
-            item = {
-                "index": str(index),
-                "codigoUnidad": str(_unit),
-                "codigoProducto": str(product_obj.code),
-                "codigoSunat": "10000000",
-                "producto": description,
-                "cantidad": decimal.Decimal(d['quantityReturned']).quantize(decimal.Decimal('0.0001')),
-                "precioBase": price_sin_igv.quantize(decimal.Decimal('0.000001')),
-                "tipoIgvCodigo": "10"
-            }
-            items.append(item)
-    
-    items_graphql = ", ".join(
-        f"""{{  
-                   producto: "{item['producto']}", 
-                   cantidad: {item['cantidad']}, 
-                   precioBase: {item['precioBase']}, 
-                   codigoSunat: "{item['codigoSunat']}",
-                   codigoProducto: "{item['codigoProducto']}",
-                   codigoUnidad: "{item['codigoUnidad']}",                                            
-                   tipoIgvCodigo: "{item['tipoIgvCodigo']}" 
-            }}"""
-        for item in items
-    )
-    
-    items_graphql = f"[{items_graphql}]"
     
-    _type_document = '01' if order_obj.voucher_type == 'B' else '06'
+    details = [d for d in details if d['quantityReturned']]
+    products = Product.objects.in_bulk([int(d['productID']) for d in details])
+    # Unidad siempre será NIU
+    document_items = credit_note_items((
+        (str(products[int(d['productID'])].name).upper(), str(products[int(d['productID'])].code),
+         d['quantityReturned'], d['price'])
+        for d in details
+    ))
+    total_invoice = document_items.total
     
     # Obtener datos del cliente según el modelo Person
-    client_names = str(client_obj.full_name or "").replace('"', "'")
-    if not client_names:
-        client_names = f"{client_obj.first_name or ''} {client_obj.surname or ''}".strip()
-    
-    client_document = client_obj.number or ""
     client_document_type = 1 if client_obj.document == '01' else 6
     
-    client_address = str(client_obj.address or "").replace('"', "'")
-    
-    total_engraved = decimal.Decimal(sub_total)
-    total_invoice = total_engraved * decimal.Decimal(1.1800)
-    total_igv = total_invoice - total_engraved
-    
-    # Siempre usar la fecha actual del día
-    # Revisar bill_date si existe, sino usar fecha/hora actual
-    if order_obj.bill_date:
-        register_date = utc_to_local(order_obj.bill_date) if hasattr(order_obj.bill_date, 'tzinfo') and order_obj.bill_date.tzinfo else order_obj.bill_date
-        formatdate = register_date.strftime("%Y-%m-%d")
-        hour_date = register_date.strftime("%H:%M:%S")
-    else:
-        formatdate = date.today().strftime("%Y-%m-%d")
-        hour_date = datetime.now().strftime("%H:%M:%S")
-    
     type_document_code = ''
     
     # Usar los campos de Order directamente en lugar de OrderBill
@@ -524,78 +255,28 @@ def send_credit_note_fact(pk, details, motive):
         elif order_obj.voucher_type == 'F':
             type_document_code = '01'
     
-    # Obtener serial y número del comprobante desde Order
-    bill_serial = order_obj.bill_serial or ""
-    bill_number = order_obj.bill_number or 0
-    
-    graphql_query = f"""
-        mutation RegisterCreditNote  {{
-            registerCreditNote(            
-                client: {{
-                    razonSocialNombres: "{client_names}",
-                    numeroDocumento: "{client_document}",
-                    codigoTipoEntidad: {client_document_type},
-                    clienteDireccion: "{client_address}"
-                }},
-                creditNote: {{
-                    serie: "{serial}",
-                    numero: "{correlative}",
-                    fechaEmision: "{formatdate}",
-                    horaEmision: "{hour_date}",
-                    fechaVencimiento: "{formatdate}",
-                    monedaId: 1,                
-                    formaPagoId: 1,
-                    totalGravada: {float(total_engraved)},
-                    totalDescuentoGlobalPorcentaje: 0,
-                    totalDescuentoGlobal: 0,
-                    totalIgv: {float(total_igv)},
-                    totalExonerada: 0,
-                    totalInafecta: 0,
-                    totalImporte: {float(total_invoice.quantize(decimal.Decimal('0.01')))},
-                    totalAPagar: {float(total_invoice.quantize(decimal.Decimal('0.01')))},
-                    tipoDocumentoCodigo: "07",
-                    nota: "",
-                    motiveCreditNote: "{motive}"
-                }},
-                relatedDocuments: {{
-                    serial: "{str(bill_serial)}"      
-                    number: "{str(bill_number)}"      
-                    codeTypeDocument: "{str(type_document_code)}"      
-                }},
-                items: {items_graphql}
-            ) {{
-                message
-                error
-                operationId
-            }}
-        }}
-        """
-    # print(graphql_query)
-    
-    token = tokens.get("20603890214", "ID no encontrado")
-    
-    HEADERS = {
-        "Content-Type": "application/json",
-        "token": token
-    }
+    correlative = number_note(serial)
+    # Serial y número del comprobante relacionado desde Order
+    query, variables = credit_note_payload(
+        client_input(_client_name(client_obj), client_obj.number or "", client_document_type,
+                     str(client_obj.address or "")),
+        serial, correlative, *_issue_date_time(order_obj), document_items, motive,
+        order_obj.bill_serial or "", order_obj.bill_number or 0, type_document_code
+    )
     
-    try:
-        response = requests.post(GRAPHQL_URL, json={"query": graphql_query}, headers=HEADERS)
-        response.raise_for_status()
-        
-        result = response.json()
-        
-        success = not result.get("data", {}).get("registerCreditNote", {}).get("error")
+    def parse(result):
+        data = (result.get("data") or {}).get("registerCreditNote") or {}
+        success = not data.get("error")
         
         if success:
-            operation_id = result.get("data", {}).get("registerCreditNote", {}).get("operationId")
+            operation_id = data.get("operationId")
             enlace_pdf = f'https://ng.tuf4ctur4.net.pe/operations/print_credit_note/{operation_id}/'
             # enlace_pdf = f'http://192.168.1.80:9050/operations/print_credit_note/{operation_id}/'
             note_total = total_invoice
             return {
                 "success": success,
                 'tipo_de_comprobante': '3',
-                "message": result.get("data", {}).get("registerCreditNote", {}).get("message"),
+                "message": data.get("message"),
                 'serial': str(serial),
                 'correlative': correlative,
                 'enlace_del_pdf': enlace_pdf,
@@ -606,13 +287,10 @@ def send_credit_note_fact(pk, details, motive):
             return {
                 "success": False,
                 "message": "La operación no fue exitosa, revise la venta e informe a Sistemas",
-                "error": result.get("data", {}).get("registerCreditNote", {}).get("error"),
+                "error": data.get("error"),
             }
     
-    except requests.exceptions.RequestException as e:
-        return {"error": f"Error en la solicitud: {str(e)}"}
-    except ValueError:
-        return {"error": "La respuesta no es un JSON válido"}
+    return submit_fact_document(FactDocument(query, variables, tokens.get("20603890214", "ID no encontrado"), parse))
 
 
 def annul_invoice(order_id):
@@ -637,25 +315,12 @@ def annul_invoice(order_id):
     
     token = tokens.get("20603890214", "ID no encontrado")
     
-    HEADERS = {
-        "Content-Type": "application/json",
-        "token": token
-    }
-    
     # print("Enviando mutación GraphQL:")
     # print("Query:", mutation)
     # print("Variables:", variables)
-    # print("Headers:", HEADERS)
     
     try:
-        response = requests.post(
-            GRAPHQL_URL,
-            json={"query": mutation, "variables": variables},
-            headers=HEADERS
-        )
-        response.raise_for_status()
-        
-        result = response.json()
+        result = get_fact_client().execute(mutation, variables, token)
         
         data = result.get("data", {}).get("annulInvoice")
         
@@ -670,7 +335,5 @@ def annul_invoice(order_id):
                 "message": data.get("message") if data else "No se obtuvo respuesta del servidor.",
             }
     
-    except requests.exceptions.RequestException as e:
-        return {"success": False, "message": f"Error en la solicitud: {str(e)}"}
-    except ValueError:
-        return {"success": False, "message": "La respuesta no es un JSON válido"}
+    except FactError as e:
+        return {"success": False, "message": str(e)}
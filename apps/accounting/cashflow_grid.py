@@ -0,0 +1,169 @@
+"""
+Grilla de movimientos de caja paginada por cursor (type, id), con caché por filtros y página.
+La caché se invalida incrementando una versión global cada vez que se registra, actualiza
+o elimina un movimiento (CashFlow.save y CashFlow.delete, al confirmarse la transacción);
+las escrituras masivas que no pasan por el modelo deben llamar a invalidate_cashflow_grid.
+"""
+import hashlib
+import json
+import time
+from datetime import datetime
+
+import pytz
+from django.core.cache import cache
+from django.db.models import Q
+
+from .cashflow_summary import get_cashflow_summary
+from .models import CashFlow
+
+CASHFLOW_GRID_PAGE_SIZE = 100
+CASHFLOW_GRID_MAX_PAGE_SIZE = 500
+CASHFLOW_GRID_CACHE_TIMEOUT = 60 * 10
+CASHFLOW_GRID_VERSION_KEY = 'cashflow_grid:version'
+
+# Tipos que muestra el listado de gastos
+GRID_TYPES = ('S', 'A')
+GRID_FIELDS = (
+    'id', 'transaction_date', 'description', 'serial', 'n_receipt', 'document_type_attached', 'type',
+    'type_expense', 'way_to_pay', 'subtotal', 'igv', 'total', 'operation_code', 'cash_id', 'cash__name',
+    'cash__subsidiary__name', 'user_id', 'user__username', 'user__first_name', 'user__last_name',
+)
+
+TYPE_LABELS = dict(CashFlow.TYPE_CHOICES)
+EXPENSE_LABELS = dict(CashFlow.TYPE_EXPENSE)
+PAYMENT_LABELS = dict(CashFlow.TYPE_CHOICES_PAYMENT)
+DOCUMENT_LABELS = dict(CashFlow.DOCUMENT_TYPE_ATTACHED_CHOICES)
+
+
+def get_cashflow_grid_version():
+    version = cache.get(CASHFLOW_GRID_VERSION_KEY)
+    if version is None:
+        # Una versión basada en el tiempo evita reutilizar entradas antiguas si la clave fue desalojada
+        cache.add(CASHFLOW_GRID_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CASHFLOW_GRID_VERSION_KEY)
+    return version
+
+
+def invalidate_cashflow_grid():
+    """Invalida todas las páginas y totales en caché de la grilla de gastos"""
+    try:
+        cache.incr(CASHFLOW_GRID_VERSION_KEY)
+    except ValueError:
+        cache.add(CASHFLOW_GRID_VERSION_KEY, int(time.time() * 1000), None)
+
+
+def get_cashflow_filters(data, user):
+    """Normaliza los filtros del listado de gastos según los permisos del usuario"""
+    is_admin = hasattr(user, 'has_access_to_all') and user.has_access_to_all
+    cash_id = data.get('cash_account')
+    expense_type = data.get('expense_type')
+    start_date = data.get('start_date') or None
+    end_date = data.get('end_date') or None
+    # Si no se proporcionan fechas, usar la fecha de hoy
+    if not start_date and not end_date:
+        start_date = end_date = datetime.now(pytz.timezone('America/Lima')).date().isoformat()
+    return {
+        # Si no es admin, solo ve sus propios gastos
+        'user_id': None if is_admin else user.id,
+        'cash_id': int(cash_id) if cash_id and cash_id != '0' else None,
+        # Filtro por tipo de gasto (solo para admins)
+        'expense_type': expense_type if is_admin and expense_type and expense_type != '0' else None,
+        'start_date': start_date,
+        'end_date': end_date,
+    }
+
+
+def filter_cashflows(filters):
+    cashflows = CashFlow.objects.filter(type__in=GRID_TYPES)
+    if filters['user_id']:
+        cashflows = cashflows.filter(user_id=filters['user_id'])
+    if filters['cash_id']:
+        cashflows = cashflows.filter(cash_id=filters['cash_id'])
+    if filters['expense_type']:
+        cashflows = cashflows.filter(type_expense=filters['expense_type'])
+    if filters['start_date']:
+        cashflows = cashflows.filter(transaction_date__gte=filters['start_date'])
+    if filters['end_date']:
+        cashflows = cashflows.filter(transaction_date__lte=filters['end_date'])
+    return cashflows
+
+
+def parse_cashflow_cursor(cursor):
+    """Cursor 'type:id' de la última fila mostrada; lanza ValueError si es inválido"""
+    cashflow_type, cashflow_id = cursor.split(':')
+    if cashflow_type not in TYPE_LABELS:
+        raise ValueError(cursor)
+    return cashflow_type, int(cashflow_id)
+
+
+def _cache_key(*parts):
+    digest = hashlib.md5(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+    return f'cashflow_grid:{get_cashflow_grid_version()}:{digest}'
+
+
+def _serialize_row(row):
+    return {
+        'id': row['id'],
+        'transaction_date': row['transaction_date'].strftime('%Y-%m-%d') if row['transaction_date'] else None,
+        'description': row['description'],
+        'serial': row['serial'],
+        'n_receipt': row['n_receipt'],
+        'document_type': row['document_type_attached'],
+        'document_type_display': DOCUMENT_LABELS.get(row['document_type_attached']),
+        'type': row['type'],
+        'type_display': TYPE_LABELS.get(row['type']),
+        'type_expense': row['type_expense'],
+        'type_expense_display': EXPENSE_LABELS.get(row['type_expense']),
+        'way_to_pay': row['way_to_pay'],
+        'way_to_pay_display': PAYMENT_LABELS.get(row['way_to_pay']),
+        'subtotal': row['subtotal'],
+        'igv': row['igv'],
+        'total': row['total'],
+        'operation_code': row['operation_code'],
+        'cash_id': row['cash_id'],
+        'cash_name': row['cash__name'],
+        'subsidiary_name': row['cash__subsidiary__name'],
+        'user_id': row['user_id'],
+        'user_name': f"{row['user__first_name'] or ''} {row['user__last_name'] or ''}".strip() or row['user__username'],
+    }
+
+
+def get_cashflow_totals(filters):
+    """Totales de los filtros (independientes de la página), en caché"""
+    key = _cache_key('totals', filters)
+    totals = cache.get(key)
+    if totals is None:
+        summary = get_cashflow_summary(filter_cashflows(filters))
+        totals = {
+            'count': summary['count'],
+            'total_income': summary['total_income'],
+            'total_expenses': summary['total_expenses'],
+            'net_balance': summary['net_balance'],
+            'expense_totals': summary['expense_totals'],
+        }
+        cache.set(key, totals, CASHFLOW_GRID_CACHE_TIMEOUT)
+    return totals
+
+
+def get_cashflow_grid_page(filters, cursor=None, limit=CASHFLOW_GRID_PAGE_SIZE):
+    """
+    Página de la grilla ordenada como el listado (aperturas primero, luego por id).
+    Devuelve las filas, el cursor de la siguiente página y los totales de los filtros.
+    """
+    key = _cache_key('page', filters, cursor, limit)
+    page = cache.get(key)
+    if page is None:
+        cashflows = filter_cashflows(filters)
+        if cursor:
+            cashflow_type, cashflow_id = parse_cashflow_cursor(cursor)
+            cashflows = cashflows.filter(Q(type__gt=cashflow_type) | Q(type=cashflow_type, id__gt=cashflow_id))
+        rows = list(cashflows.order_by('type', 'id').values(*GRID_FIELDS)[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        page = {
+            'rows': [_serialize_row(row) for row in rows],
+            'has_more': has_more,
+            'next_cursor': f"{rows[-1]['type']}:{rows[-1]['id']}" if has_more else None,
+        }
+        cache.set(key, page, CASHFLOW_GRID_CACHE_TIMEOUT)
+    return dict(page, totals=get_cashflow_totals(filters))
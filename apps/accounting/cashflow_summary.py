@@ -0,0 +1,120 @@
+"""
+Resumen de movimientos de caja (ingresos, egresos, balance y totales por tipo de gasto)
+calculado en una sola consulta con sumas condicionales, o leído del cubo mensual para meses completos
+"""
+from decimal import Decimal
+
+from django.db.models import Sum, Count, Q
+
+from .models import CashFlow, CashFlowMonthlyCube
+
+INCOME_TYPES = CashFlow.INCOME_TYPES
+EXPENSE_TYPES = CashFlow.EXPENSE_TYPES
+# Los totales por tipo de gasto consideran salidas y aperturas, igual que el listado de gastos
+EXPENSE_TYPE_TYPES = ('S', 'A')
+
+
+def _summary_aggregates(expense_filter=None):
+    expense_q = Q(type__in=EXPENSE_TYPES)
+    if expense_filter is not None:
+        expense_q &= expense_filter
+    aggregates = {
+        'count': Count('id'),
+        'total_income': Sum('total', filter=Q(type__in=INCOME_TYPES)),
+        'total_expenses': Sum('total', filter=expense_q),
+    }
+    for code, name in CashFlow.TYPE_CHOICES:
+        aggregates[f'type_{code}'] = Sum('total', filter=Q(type=code))
+    for code, name in CashFlow.TYPE_EXPENSE:
+        aggregates[f'expense_{code}'] = Sum('total', filter=Q(type__in=EXPENSE_TYPE_TYPES, type_expense=code))
+    for code, name in CashFlow.TYPE_CHOICES_PAYMENT:
+        aggregates[f'payment_{code}'] = Sum('total', filter=Q(type__in=INCOME_TYPES, way_to_pay=code))
+    return aggregates
+
+
+def _build_summary(row):
+    def amount(key):
+        return row[key] or Decimal('0')
+
+    total_income = amount('total_income')
+    total_expenses = amount('total_expenses')
+    return {
+        'count': row['count'],
+        'total_income': total_income,
+        'total_expenses': total_expenses,
+        'net_balance': total_income - total_expenses,
+        'total_opening': amount('type_A'),
+        'type_totals': {code: amount(f'type_{code}') for code, name in CashFlow.TYPE_CHOICES},
+        'expense_totals': {code: amount(f'expense_{code}') for code, name in CashFlow.TYPE_EXPENSE},
+        'income_by_payment': {code: amount(f'payment_{code}') for code, name in CashFlow.TYPE_CHOICES_PAYMENT},
+    }
+
+
+def get_cashflow_summary(cashflows, expense_filter=None):
+    """
+    Totales de un queryset de CashFlow ya filtrado:
+    - total_income / total_expenses / net_balance
+    - total_opening: suma de aperturas
+    - type_totals: total por tipo de transacción
+    - expense_totals: total por tipo de gasto
+    - income_by_payment: ingresos por forma de pago
+    expense_filter restringe adicionalmente las salidas que cuentan como egresos.
+    """
+    row = cashflows.order_by().aggregate(**_summary_aggregates(expense_filter))
+    return _build_summary(row)
+
+
+def get_cashflow_summary_by(cashflows, field, expense_filter=None):
+    """Mismos totales que get_cashflow_summary agrupados por un campo, en una sola consulta GROUP BY"""
+    rows = cashflows.order_by().values(field).annotate(**_summary_aggregates(expense_filter)).order_by(field)
+    return [dict(_build_summary(row), key=row[field]) for row in rows]
+
+
+def _build_cube_summary(cells):
+    """Totales con la forma de get_cashflow_summary a partir de {(dimensión, código): (total, cantidad)}"""
+    def amount(dimension, code):
+        return cells.get((dimension, code), (Decimal('0'), 0))[0]
+
+    type_totals = {code: amount('T', code) for code, name in CashFlow.TYPE_CHOICES}
+    total_income = sum((type_totals[code] for code in INCOME_TYPES), Decimal('0'))
+    total_expenses = sum((type_totals[code] for code in EXPENSE_TYPES), Decimal('0'))
+    return {
+        'count': sum(count for (dimension, code), (total, count) in cells.items() if dimension == 'T'),
+        'total_income': total_income,
+        'total_expenses': total_expenses,
+        'net_balance': total_income - total_expenses,
+        'total_opening': type_totals['A'],
+        'type_totals': type_totals,
+        'expense_totals': {code: amount('G', code) for code, name in CashFlow.TYPE_EXPENSE},
+        'income_by_payment': {code: amount('P', code) for code, name in CashFlow.TYPE_CHOICES_PAYMENT},
+    }
+
+
+def _monthly_cubes(month, subsidiary_id=None):
+    cubes = CashFlowMonthlyCube.objects.filter(month=CashFlowMonthlyCube.month_of(month))
+    if subsidiary_id:
+        cubes = cubes.filter(subsidiary_id=subsidiary_id)
+    return cubes.order_by()
+
+
+def get_monthly_summary(month, subsidiary_id=None):
+    """Mismos totales que get_cashflow_summary para los movimientos de un mes, leídos del cubo mensual"""
+    rows = _monthly_cubes(month, subsidiary_id).values('dimension', 'key').annotate(
+        total=Sum('total'), count=Sum('movement_count')
+    )
+    return _build_cube_summary({(row['dimension'], row['key']): (row['total'], row['count']) for row in rows})
+
+
+def get_monthly_summary_by_subsidiary(month, subsidiary_id=None):
+    """Mismos totales que get_monthly_summary por nombre de sucursal (key), del cubo mensual"""
+    rows = _monthly_cubes(month, subsidiary_id).values('subsidiary__name', 'dimension', 'key').annotate(
+        total=Sum('total'), count=Sum('movement_count')
+    )
+    by_subsidiary = {}
+    for row in rows:
+        cells = by_subsidiary.setdefault(row['subsidiary__name'], {})
+        cells[(row['dimension'], row['key'])] = (row['total'], row['count'])
+    return [
+        dict(_build_cube_summary(cells), key=name)
+        for name, cells in sorted(by_subsidiary.items(), key=lambda item: (item[0] is None, item[0] or ''))
+    ]
@@ -0,0 +1,189 @@
+"""
+Motor de exportación a Excel en modo de solo escritura (openpyxl write_only).
+Las filas se escriben en orden y se descartan de memoria al agregarse; los estilos son
+estilos con nombre registrados una vez por libro, así cada celda solo guarda una referencia.
+"""
+import os
+import tempfile
+from copy import copy
+from http import HTTPStatus
+
+from django.http import FileResponse, JsonResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+from farm import settings
+
+# Filas leídas por lote del cursor del servidor al recorrer querysets grandes
+EXPORT_CHUNK_SIZE = 2000
+
+# Formato de contabilidad con S/
+CURRENCY_FORMAT = '_("S/"* #,##0.00_);_("S/"* (#,##0.00);_("S/"* "-"??_);_(@_)'
+
+COLORS = {
+    'primary': '007bff',
+    'success': '28a745',
+    'danger': 'dc3545',
+    'info': '17a2b8',
+    'warning': 'ffc107',
+}
+# Fondos de filas y etiquetas del reporte de ventas
+ROW_FILLS = {'blue': 'e3f2fd', 'green': 'e8f5e8', 'orange': 'fff3e0'}
+BADGES = {
+    'green': ('e8f5e8', '2e7d32'),
+    'dark_green': ('c8e6c9', '1b5e20'),
+    'orange': ('ffe0b2', 'e65100'),
+}
+SEPARATORS = {'blue': 'bbdefb', 'orange': 'ff9800'}
+
+
+def _fill(color):
+    return PatternFill(start_color=color, end_color=color, fill_type='solid')
+
+
+def _border(style, color):
+    side = Side(style=style, color=color)
+    return Border(left=side, right=side, top=side, bottom=side)
+
+
+def _style_specs():
+    """Estilos usados por los reportes: nombre -> atributos de NamedStyle"""
+    border = _border('medium', 'adb5bd')
+    thin = _border('thin', '000000')
+    center = Alignment(horizontal='center')
+    white = Font(bold=True, color='FFFFFF', size=11)
+    bold = Font(bold=True)
+
+    specs = {
+        'title': {'font': Font(bold=True, size=16, color=COLORS['primary']), 'alignment': center},
+        'cell': {'border': border},
+        'currency': {'border': border, 'number_format': CURRENCY_FORMAT},
+        'bold': {'font': bold},
+        'bold_currency': {'font': bold, 'number_format': CURRENCY_FORMAT},
+        'subtotal': {'font': bold, 'fill': _fill('f8f9fa')},
+        'subtotal_currency': {'font': bold, 'fill': _fill('f8f9fa'), 'number_format': CURRENCY_FORMAT},
+        'final': {'font': Font(bold=True, size=12, color=COLORS['warning']), 'fill': _fill('fff3cd')},
+        'final_currency': {
+            'font': Font(bold=True, size=12, color=COLORS['warning']), 'fill': _fill('fff3cd'),
+            'number_format': CURRENCY_FORMAT,
+        },
+        'grid_cell': {'border': thin},
+        'grid_currency': {'border': thin, 'number_format': CURRENCY_FORMAT},
+        'grid_currency_alert': {
+            'border': thin, 'number_format': CURRENCY_FORMAT, 'font': Font(bold=True, color=COLORS['danger']),
+        },
+        'grid_total_label': {'font': Font(bold=True, size=12), 'alignment': Alignment(horizontal='right')},
+    }
+    for name, color in COLORS.items():
+        specs[f'section_{name}'] = {'font': white, 'fill': _fill(color), 'alignment': center}
+        specs[f'header_{name}'] = {'font': white, 'fill': _fill(color), 'alignment': center, 'border': border}
+        specs[f'total_{name}'] = {'font': white, 'fill': _fill(color)}
+        specs[f'total_currency_{name}'] = {'font': white, 'fill': _fill(color), 'number_format': CURRENCY_FORMAT}
+        specs[f'heading_{name}'] = {'font': Font(bold=True, size=12, color=color)}
+        specs[f'summary_{name}'] = {'font': Font(bold=True, size=11, color=color)}
+        specs[f'summary_currency_{name}'] = {
+            'font': Font(bold=True, size=11, color=color), 'number_format': CURRENCY_FORMAT,
+        }
+        specs[f'grid_title_{name}'] = {'font': Font(bold=True, size=14, color=color), 'alignment': center}
+        specs[f'grid_header_{name}'] = {
+            'font': white, 'fill': _fill(color), 'border': thin,
+            'alignment': Alignment(horizontal='center', vertical='center'),
+        }
+        specs[f'grid_total_{name}'] = {
+            'font': Font(bold=True, color='FFFFFF', size=12), 'fill': _fill(color), 'border': thin,
+            'number_format': CURRENCY_FORMAT,
+        }
+    for name, color in ROW_FILLS.items():
+        specs[f'cell_{name}'] = {'border': border, 'fill': _fill(color)}
+        specs[f'currency_{name}'] = {'border': border, 'fill': _fill(color), 'number_format': CURRENCY_FORMAT}
+    for name, (fill, color) in BADGES.items():
+        specs[f'badge_{name}'] = {'border': border, 'fill': _fill(fill), 'font': Font(bold=True, color=color)}
+    for name, color in SEPARATORS.items():
+        specs[f'separator_{name}'] = {'border': border, 'fill': _fill(color)}
+    return specs
+
+
+STYLE_SPECS = _style_specs()
+
+
+class ExcelReport:
+    """
+    Hoja de Excel escrita fila por fila.
+    Cada fila es una lista de celdas o un dict {columna: celda}; una celda es un valor
+    o una tupla (valor, nombre_de_estilo).
+    """
+
+    def __init__(self, title, column_widths=()):
+        self.workbook = Workbook(write_only=True)
+        # Asignar un estilo por nombre recorre la lista de estilos del libro en cada celda;
+        # se guarda el índice de cada estilo una vez y las celdas reciben una copia
+        self.styles = {}
+        for name, spec in STYLE_SPECS.items():
+            style = NamedStyle(name=name, **spec)
+            self.workbook.add_named_style(style)
+            self.styles[name] = style.as_tuple()
+        # Excel no admite títulos de hoja de más de 31 caracteres
+        self.sheet = self.workbook.create_sheet(title=title[:31])
+        for col, width in enumerate(column_widths, 1):
+            self.sheet.column_dimensions[get_column_letter(col)].width = width
+        self.row = 0
+
+    def _cell(self, value):
+        if isinstance(value, tuple):
+            value, style = value
+            cell = WriteOnlyCell(self.sheet, value=value)
+            cell._style = copy(self.styles[style])
+            return cell
+        return value
+
+    def append(self, cells=(), style=None):
+        """Escribe la siguiente fila; style se aplica a los valores sin estilo propio"""
+        if isinstance(cells, dict):
+            last = max(cells) if cells else 0
+            cells = [cells.get(col) for col in range(1, last + 1)]
+        if style:
+            cells = [cell if cell is None or isinstance(cell, tuple) else (cell, style) for cell in cells]
+        self.sheet.append([self._cell(cell) for cell in cells])
+        self.row += 1
+        return self.row
+
+    def skip(self, rows=1):
+        for _ in range(rows):
+            self.append()
+
+    def merge(self, first_col, last_col, row=None):
+        """Combina columnas de una fila ya escrita (por defecto la última)"""
+        row = row or self.row
+        self.sheet.merged_cells.add(f'{get_column_letter(first_col)}{row}:{get_column_letter(last_col)}{row}')
+
+    def heading(self, text, style, last_col):
+        """Fila de título combinada desde la columna A"""
+        self.append([(text, style)])
+        self.merge(1, last_col)
+
+    def save(self, filename):
+        """Escribe el libro una sola vez en MEDIA_ROOT/reports y devuelve su URL"""
+        filepath = os.path.join(settings.MEDIA_ROOT, 'reports', filename)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        self.workbook.save(filepath)
+        return f"{settings.MEDIA_URL}reports/{filename}"
+
+    def stream(self, filename):
+        """Descarga directa: el libro se escribe en un temporal que se envía por bloques y se elimina al cerrar"""
+        tmp = tempfile.TemporaryFile()
+        self.workbook.save(tmp)
+        tmp.seek(0)
+        return FileResponse(tmp, as_attachment=True, filename=filename)
+
+    def response(self, request, filename, message='Reporte exportado exitosamente'):
+        """Respuesta de las vistas de exportación: descarga directa si se pide 'download', si no la URL del archivo"""
+        if request.POST.get('download') in ('1', 'true'):
+            return self.stream(filename)
+        return JsonResponse({
+            'success': True,
+            'message': message,
+            'file_url': self.save(filename),
+            'filename': filename
+        }, status=HTTPStatus.OK)
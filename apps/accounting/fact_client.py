@@ -0,0 +1,182 @@
+"""
+Cliente HTTP del API GraphQL de facturación electrónica (FACT).
+Una sola sesión de requests por proceso reutiliza las conexiones TLS con el proveedor; cada
+llamada tiene tiempo límite de conexión y de lectura, y los fallos transitorios se reintentan con
+espera exponencial. El modo por lotes envía varios comprobantes en una sola mutación GraphQL,
+con un alias por documento.
+"""
+import json
+import re
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+GRAPHQL_URL = "https://ng.tuf4ctur4.net.pe/graphql"
+# GRAPHQL_URL = "http://192.168.1.80:9050/graphql"
+
+# Segundos (conexión, lectura)
+FACT_TIMEOUT = (3.05, 30)
+FACT_RETRIES = 3
+FACT_BACKOFF = 0.5
+# Documentos por mutación en el modo por lotes
+FACT_BATCH_SIZE = 20
+# Estados HTTP de fallos transitorios del proveedor
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# query/variables: mutación de un solo campo; parse: JSON de la respuesta -> resultado del envío
+FactDocument = namedtuple('FactDocument', 'query variables token parse')
+
+_OPERATION = re.compile(r'^\s*mutation\s*\w*\s*(?:\((?P<definitions>.*?)\))?\s*\{(?P<body>.*)\}\s*$', re.S)
+_VARIABLE = re.compile(r'\$(\w+)')
+
+
+def _rename_variables(text, index):
+    """Sufijo por documento para que las variables de un lote no choquen entre sí"""
+    return _VARIABLE.sub(lambda match: f'${match.group(1)}_{index}', text)
+
+
+def encode_payload(payload):
+    """Cuerpo JSON compacto en UTF-8 (sin espacios ni escapes de tildes)"""
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+class FactError(Exception):
+    """Fallo de comunicación con el proveedor: red, estado HTTP o respuesta que no es JSON"""
+
+
+def failed_before_sending(error):
+    """
+    El error de conexión ocurrió al conectar (tiempo de conexión agotado, conexión rechazada o
+    nombre no resuelto), antes de enviar la solicitud: el proveedor no la recibió
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class FactClient:
+    def __init__(self, url=GRAPHQL_URL, timeout=FACT_TIMEOUT, retries=FACT_RETRIES, backoff=FACT_BACKOFF,
+                 pool_size=10):
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Content-Type'] = 'application/json'
+
+    def execute(self, query, variables=None, token=''):
+        """
+        Envía la operación y devuelve el JSON de la respuesta.
+        Se reintentan los fallos al conectar (failed_before_sending) y los estados de RETRY_STATUSES.
+        Un tiempo de lectura agotado o una conexión cortada después de enviar ("Connection aborted")
+        no se reintentan porque el proveedor pudo haber registrado el comprobante.
+        """
+        payload = {'query': query}
+        if variables:
+            payload['variables'] = variables
+        body = encode_payload(payload)
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                response = self.session.post(self.url, data=body, headers={'token': token}, timeout=self.timeout)
+                if response.status_code in RETRY_STATUSES and not last:
+                    response.close()
+                else:
+                    response.raise_for_status()
+                    return response.json()
+            except requests.exceptions.ConnectionError as e:
+                if last or not failed_before_sending(e):
+                    raise FactError(f'Error en la solicitud: {str(e)}')
+            except requests.exceptions.RequestException as e:
+                raise FactError(f'Error en la solicitud: {str(e)}')
+            except ValueError:
+                raise FactError('La respuesta no es un JSON válido')
+            time.sleep(self.backoff * 2 ** attempt)
+
+    def execute_batch(self, documents, token=''):
+        """
+        Envía los documentos (mutaciones de un solo campo) en una sola operación y devuelve, por
+        documento, una respuesta con la misma forma que la de execute.
+        """
+        definitions, fields, variables, names = [], [], {}, []
+        for index, (query, document_variables) in enumerate(documents):
+            match = _OPERATION.match(query)
+            if not match:
+                raise ValueError('Solo se pueden agrupar mutaciones')
+            body, alias = match.group('body').strip(), f'd{index}'
+            names.append(re.match(r'\w+', body).group())
+            if document_variables:
+                if match.group('definitions'):
+                    definitions.append(_rename_variables(match.group('definitions'), index))
+                body = _rename_variables(body, index)
+                variables.update({f'{name}_{index}': value for name, value in document_variables.items()})
+            fields.append(f'{alias}: {body}')
+
+        query = 'mutation Batch{} {{\n{}\n}}'.format(
+            f"({', '.join(definitions)})" if definitions else '', '\n'.join(fields)
+        )
+        result = self.execute(query, variables, token)
+
+        data = result.get('data') or {}
+        errors = {}
+        for error in result.get('errors') or []:
+            errors.setdefault((error.get('path') or [None])[0], []).append(error)
+        responses = []
+        for index, name in enumerate(names):
+            alias = f'd{index}'
+            response = {'data': {name: data.get(alias)}}
+            if alias in errors or None in errors:
+                response['errors'] = errors.get(alias, []) + errors.get(None, [])
+            responses.append(response)
+        return responses
+
+
+@lru_cache(maxsize=None)
+def get_fact_client():
+    """Cliente compartido por el proceso (la sesión de requests admite varios hilos)"""
+    return FactClient()
+
+
+def submit_fact_document(document, client=None):
+    """Envía un comprobante; los fallos de comunicación se devuelven como {"error": ...}"""
+    client = client or get_fact_client()
+    try:
+        result = client.execute(document.query, document.variables, document.token)
+    except FactError as e:
+        return {"error": str(e)}
+    return document.parse(result)
+
+
+def submit_fact_documents(documents, batch_size=FACT_BATCH_SIZE, client=None):
+    """
+    Envía los comprobantes en lotes de batch_size por mutación (agrupados por token) y devuelve
+    los resultados en el mismo orden.
+    """
+    client = client or get_fact_client()
+    results = [None] * len(documents)
+    by_token = {}
+    for index, document in enumerate(documents):
+        by_token.setdefault(document.token, []).append(index)
+    for token, indexes in by_token.items():
+        for offset in range(0, len(indexes), batch_size):
+            chunk = indexes[offset:offset + batch_size]
+            try:
+                responses = client.execute_batch(
+                    [(documents[i].query, documents[i].variables) for i in chunk], token
+                )
+            except FactError as e:
+                responses = [e] * len(chunk)
+            for index, response in zip(chunk, responses):
+                if isinstance(response, FactError):
+                    results[index] = {"error": str(response)}
+                else:
+                    results[index] = documents[index].parse(response)
+    return results
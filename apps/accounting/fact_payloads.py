@@ -0,0 +1,231 @@
+"""
+Serialización de comprobantes para el API GraphQL de FACT.
+Cada tipo de documento tiene una mutación fija, armada una sola vez al importar el módulo, y los
+datos del comprobante viajan como variables GraphQL en lugar de interpolarse en la consulta: los
+nombres con comillas o saltos de línea no necesitan escaparse y la consulta es la misma en cada
+envío. Facturas, boletas y notas de crédito comparten el cálculo de ítems y totales.
+Las variables necesitan los nombres de los tipos de entrada del esquema del proveedor
+(FACT_INPUT_TYPES, verificables con check_fact_schema). Si el proveedor los rechaza,
+FACT_GRAPHQL_VARIABLES = False escribe los datos como argumentos literales en la consulta, como
+antes, pero escapados.
+"""
+import decimal
+import json
+from collections import namedtuple
+from json.encoder import encode_basestring
+
+# False envía los datos como argumentos literales (si check_fact_schema encuentra diferencias)
+FACT_GRAPHQL_VARIABLES = True
+
+# Tipos de entrada del esquema GraphQL del proveedor, por argumento de las mutaciones
+FACT_INPUT_TYPES = {
+    'cliente': 'ClientInput!',
+    'client': 'ClientInput!',
+    'venta': 'SaleInput!',
+    'creditNote': 'CreditNoteInput!',
+    'relatedDocuments': 'RelatedDocumentInput!',
+    'items': '[ItemInput]!',
+    'creditPay': '[CreditPayInput]',
+}
+
+DocumentSpec = namedtuple('DocumentSpec', 'operation field arguments selection')
+DOCUMENT_SPECS = {
+    'bill': DocumentSpec('RegisterSale', 'registerSale', ('cliente', 'venta', 'items', 'creditPay'),
+                         ('message', 'success', 'operationId')),
+    'receipt': DocumentSpec('RegisterSale', 'registerSale', ('cliente', 'venta', 'items'),
+                            ('message', 'success', 'operationId')),
+    'credit_note': DocumentSpec('RegisterCreditNote', 'registerCreditNote',
+                                ('client', 'creditNote', 'relatedDocuments', 'items'),
+                                ('message', 'error', 'operationId')),
+}
+# Código SUNAT del tipo de comprobante
+DOCUMENT_CODES = {'bill': '01', 'receipt': '03', 'credit_note': '07'}
+
+IGV_FACTOR = decimal.Decimal(1.1800)
+CENTS = decimal.Decimal('0.01')
+BASE_PRICE_PLACES = decimal.Decimal('0.000001')
+QUANTITY_PLACES = decimal.Decimal('0.0001')
+
+# Ítems y totales de un comprobante
+DocumentItems = namedtuple('DocumentItems', 'items sub_total igv_total total')
+
+
+def compile_mutation(spec):
+    definitions = ', '.join(f'${name}: {FACT_INPUT_TYPES[name]}' for name in spec.arguments)
+    arguments = ', '.join(f'{name}: ${name}' for name in spec.arguments)
+    selection = ' '.join(spec.selection)
+    return f'mutation {spec.operation}({definitions}) {{ {spec.field}({arguments}) {{ {selection} }} }}'
+
+
+MUTATIONS = {kind: compile_mutation(spec) for kind, spec in DOCUMENT_SPECS.items()}
+
+
+# Literal GraphQL de los valores simples; bool y None pasan por json.dumps
+_SCALAR_LITERALS = {str: encode_basestring, float: float.__repr__, int: int.__repr__}
+
+
+def graphql_literal(value):
+    """
+    Valor GraphQL literal: como JSON (sus escapes de texto son válidos en GraphQL) pero con las
+    llaves sin comillas.
+    """
+    value_type = type(value)
+    if value_type is dict:
+        return '{' + ', '.join([f'{key}: {graphql_literal(item)}' for key, item in value.items()]) + '}'
+    if value_type is list or value_type is tuple:
+        if value and set(map(type, value)) == {dict} and value[0] and len(set(map(tuple, value))) == 1:
+            return _literal_rows(value)
+        return '[' + ', '.join([graphql_literal(item) for item in value]) + ']'
+    literal = _SCALAR_LITERALS.get(value_type)
+    return literal(value) if literal else json.dumps(value)
+
+
+def _literal_rows(rows):
+    """
+    Lista de dicts con las mismas llaves (los ítems), escrita por columnas: los valores simples de
+    una columna se convierten con map, sin una llamada de Python por valor.
+    """
+    keys = tuple(rows[0])
+    columns = []
+    for key in keys:
+        values = [row[key] for row in rows]
+        types = set(map(type, values))
+        literal = _SCALAR_LITERALS.get(types.pop()) if len(types) == 1 else None
+        columns.append(map(literal or graphql_literal, values))
+    template = '{' + ', '.join(f'{key}: %s' for key in keys) + '}'
+    return '[' + ', '.join([template % row for row in zip(*columns)]) + ']'
+
+
+def literal_mutation(spec, variables):
+    """Mutación con los datos escritos como argumentos literales (sin variables ni nombres de tipos)"""
+    arguments = ', '.join(f'{name}: {graphql_literal(variables[name])}' for name in spec.arguments)
+    selection = ' '.join(spec.selection)
+    return f'mutation {spec.operation} {{ {spec.field}({arguments}) {{ {selection} }} }}'
+
+
+def document_payload(kind, variables):
+    """(consulta, variables) del documento: mutación con variables o, sin ellas, con argumentos literales"""
+    if FACT_GRAPHQL_VARIABLES:
+        return MUTATIONS[kind], variables
+    return literal_mutation(DOCUMENT_SPECS[kind], variables), None
+
+
+def _item(product, quantity, base_price, unit, product_code):
+    return {
+        'producto': product,
+        'cantidad': float(quantity),
+        'precioBase': float(base_price),
+        'codigoSunat': '10000000',
+        'codigoProducto': product_code,
+        'codigoUnidad': unit,
+        'tipoIgvCodigo': '10',
+    }
+
+
+def sale_items(lines, unit='NIU'):
+    """
+    Ítems de una factura o boleta. lines: (producto, cantidad, precio unitario con IGV);
+    las líneas sin cantidad se omiten.
+    """
+    items = []
+    sub_total = igv_total = total = decimal.Decimal(0)
+    for product, quantity, price_unit in lines:
+        quantity = decimal.Decimal(quantity or 0)
+        if quantity == 0:
+            continue
+        base_total = quantity * decimal.Decimal(price_unit or 0)
+        base_amount = base_total / IGV_FACTOR
+        sub_total += base_amount
+        total += base_total
+        igv_total += base_total - base_amount
+        items.append(_item(product, quantity, (base_amount / quantity).quantize(BASE_PRICE_PLACES), unit, '0000'))
+    return DocumentItems(items, sub_total, igv_total, total)
+
+
+def credit_note_items(lines, unit='NIU'):
+    """Ítems de una nota de crédito. lines: (producto, código de producto, cantidad devuelta, precio con IGV)"""
+    items = []
+    sub_total = decimal.Decimal(0)
+    for product, product_code, quantity, price in lines:
+        quantity, price = decimal.Decimal(quantity), decimal.Decimal(price)
+        sub_total += quantity * price / IGV_FACTOR
+        items.append(_item(product, quantity.quantize(QUANTITY_PLACES),
+                           (price / IGV_FACTOR).quantize(BASE_PRICE_PLACES), unit, product_code))
+    total = sub_total * IGV_FACTOR
+    return DocumentItems(items, sub_total, total - sub_total, total)
+
+
+def client_input(name, document_number, entity_type, address):
+    return {
+        'razonSocialNombres': name,
+        'numeroDocumento': document_number,
+        'codigoTipoEntidad': entity_type,
+        'clienteDireccion': address,
+    }
+
+
+def _totals(document_items):
+    total = float(document_items.total.quantize(CENTS))
+    return {
+        'totalGravada': float(document_items.sub_total),
+        'totalDescuentoGlobalPorcentaje': 0,
+        'totalDescuentoGlobal': 0,
+        'totalIgv': float(document_items.igv_total),
+        'totalExonerada': 0,
+        'totalInafecta': 0,
+        'totalImporte': total,
+        'totalAPagar': total,
+    }
+
+
+def sale_payload(kind, client, serie, number, issue_date, issue_time, document_items, payment=1,
+                 total_detraction=0):
+    """(consulta, variables) de una factura ('bill') o boleta ('receipt')"""
+    variables = {
+        'cliente': client,
+        'venta': {
+            'serie': serie,
+            'numero': str(int(number)),
+            'fechaEmision': issue_date,
+            'horaEmision': issue_time,
+            'fechaVencimiento': '',
+            'monedaId': 1,
+            'formaPagoId': payment,
+            **_totals(document_items),
+            'totalDetraction': float(decimal.Decimal(total_detraction).quantize(CENTS)),
+            'tipoDocumentoCodigo': DOCUMENT_CODES[kind],
+            'nota': ' ',
+        },
+        'items': document_items.items,
+    }
+    if 'creditPay' in DOCUMENT_SPECS[kind].arguments:
+        variables['creditPay'] = []
+    return document_payload(kind, variables)
+
+
+def credit_note_payload(client, serie, number, issue_date, issue_time, document_items, motive,
+                        related_serial, related_number, related_code):
+    """(consulta, variables) de una nota de crédito sobre el comprobante related_serial-related_number"""
+    variables = {
+        'client': client,
+        'creditNote': {
+            'serie': serie,
+            'numero': str(number),
+            'fechaEmision': issue_date,
+            'horaEmision': issue_time,
+            'fechaVencimiento': issue_date,
+            'monedaId': 1,
+            'formaPagoId': 1,
+            **_totals(document_items),
+            'tipoDocumentoCodigo': DOCUMENT_CODES['credit_note'],
+            'nota': '',
+            'motiveCreditNote': motive,
+        },
+        'relatedDocuments': {
+            'serial': str(related_serial),
+            'number': str(related_number),
+            'codeTypeDocument': str(related_code),
+        },
+        'items': document_items.items,
+    }
+    return document_payload('credit_note', variables)
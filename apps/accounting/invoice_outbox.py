@@ -0,0 +1,220 @@
+"""
+Bandeja de salida de comprobantes electrónicos.
+La venta solo registra el comprobante en InvoiceOutbox, dentro de su misma transacción, y responde
+sin esperar al proveedor FACT; el comando run_invoice_outbox envía las filas pendientes con un pool
+de hilos, reintenta los fallos de comunicación con espera exponencial y, al aceptarse el
+comprobante, copia su serie y número en la orden. La serie y el número se fijan antes del primer
+envío, así cada reintento repite el mismo comprobante ante el proveedor.
+Si el comprobante falla sin registrarse en su primer intento (no se pudo armar o el proveedor lo
+rechazó) su número se devuelve a la secuencia o, si ya se reservaron otros después, queda liberado para el siguiente
+comprobante de la serie: la numeración no tiene huecos. Tras un intento sin respuesta el número se
+conserva, porque ese envío pudo registrarlo. El rechazo por comprobante ya registrado tras un
+intento sin respuesta significa que el primer envío sí llegó, y se da por aceptado.
+"""
+import re
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .fact_client import submit_fact_document
+from .models import InvoiceOutbox, InvoiceSequence
+
+# Tipo de comprobante -> función de api_FACT que arma el documento (se importa al enviar)
+INVOICE_BUILDERS = {
+    '1': 'apps.accounting.api_FACT.build_bill_4_fact',
+    '2': 'apps.accounting.api_FACT.build_receipt_4_fact',
+}
+INVOICE_PREFIXES = {'1': 'F', '2': 'B'}
+
+INVOICE_MAX_ATTEMPTS = 8
+# Espera antes del reintento n: INVOICE_RETRY_DELAY * 2 ** (n - 1)
+INVOICE_RETRY_DELAY = timedelta(seconds=15)
+# Una fila enviándose por más tiempo se considera abandonada (worker detenido) y vuelve a la cola
+INVOICE_SEND_TIMEOUT = timedelta(minutes=10)
+# Mensaje del proveedor al rechazar un serie-número que ya tiene registrado
+INVOICE_DUPLICATE_MESSAGE = re.compile(r'ya (?:existe|fue|est[aá]|se encuentra)|duplicad|registrad[oa] anteriormente', re.I)
+
+
+def get_invoice_key(order_id, document_type):
+    return f'{document_type}:{order_id}'
+
+
+def enqueue_invoice(order_id, document_type, product_type='bien', key=None):
+    """
+    Registra el comprobante de la orden por enviar y devuelve (fila, creada).
+    Debe llamarse dentro de la transacción que guarda la orden: si la venta se revierte, el
+    comprobante también. Con la misma llave se devuelve la fila existente.
+    """
+    key = key or get_invoice_key(order_id, document_type)
+    try:
+        with transaction.atomic():
+            return InvoiceOutbox.objects.get_or_create(key=key, defaults={
+                'order_id': order_id, 'document_type': document_type, 'product_type': product_type,
+            })
+    except IntegrityError:
+        # Otra solicitud con la misma llave la creó al mismo tiempo
+        return InvoiceOutbox.objects.get(key=key), False
+
+
+def requeue_stale_invoices():
+    """Devuelve a la cola las filas que superaron INVOICE_SEND_TIMEOUT enviándose"""
+    return InvoiceOutbox.objects.filter(
+        status='R', started_at__lt=timezone.now() - INVOICE_SEND_TIMEOUT
+    ).update(status='P', started_at=None)
+
+
+def claim_invoices(limit):
+    """
+    Toma hasta limit comprobantes listos para enviarse, en orden de llegada, y los marca enviando.
+    El cambio de estado es condicional, así dos workers nunca envían la misma fila a la vez.
+    """
+    claimed = []
+    ready = InvoiceOutbox.objects.filter(
+        status='P', next_attempt_at__lte=timezone.now()
+    ).order_by('id').values_list('id', flat=True)[:limit]
+    for entry_id in ready:
+        if InvoiceOutbox.objects.filter(id=entry_id, status='P').update(
+                status='R', started_at=timezone.now(), attempts=F('attempts') + 1):
+            claimed.append(entry_id)
+    return claimed
+
+
+def take_released_correlative(serial, document_type):
+    """Toma el menor número liberado de la serie por un comprobante fallido, o None si no hay"""
+    released = InvoiceOutbox.objects.filter(
+        serial=serial, document_type=document_type, released=True
+    ).order_by('correlative').values_list('id', 'correlative')[:10]
+    for entry_id, correlative in released:
+        # Cambio condicional: dos workers nunca toman el mismo número
+        if InvoiceOutbox.objects.filter(id=entry_id, released=True).update(
+                released=False, serial=None, correlative=None):
+            return correlative
+    return None
+
+
+def assign_correlative(entry):
+    """Fija la serie y el número del comprobante antes de su primer envío (primero los liberados)"""
+    from .api_FACT import get_new_correlative
+    from ..sales.models import Order
+
+    if entry.correlative is not None:
+        return
+    entry.serial = Order.objects.filter(
+        id=entry.order_id
+    ).values_list('subsidiary__serial', flat=True).first() or ''
+    entry.correlative = take_released_correlative(entry.serial, entry.document_type)
+    if entry.correlative is None:
+        entry.correlative = get_new_correlative(entry.serial, entry.document_type)
+    entry.save(update_fields=['serial', 'correlative'])
+
+
+def release_correlative(entry):
+    """
+    Devuelve el número de un comprobante que no se registró ante el proveedor. En un reintento no
+    se devuelve: todo reintento sigue a un envío sin respuesta, que pudo registrar ese número.
+    """
+    if entry.correlative is None or entry.attempts > 1:
+        return
+    if InvoiceSequence.release(entry.serial, entry.document_type, entry.correlative, 1):
+        InvoiceOutbox.objects.filter(id=entry.id).update(serial=None, correlative=None)
+    else:
+        # Ya se reservaron números después: lo usa el siguiente comprobante de la serie
+        InvoiceOutbox.objects.filter(id=entry.id).update(released=True)
+
+
+def is_duplicate_rejection(entry, result):
+    """
+    El proveedor rechazó el serie-número por estar ya registrado y un intento anterior quedó
+    sin respuesta: ese intento sí registró el comprobante
+    """
+    return entry.attempts > 1 and bool(INVOICE_DUPLICATE_MESSAGE.search(result.get('provider_message') or ''))
+
+
+def _retry_or_fail(entry, message):
+    if entry.attempts >= INVOICE_MAX_ATTEMPTS:
+        _finish_invoice(entry.id, 'F', message=message)
+        return 'F'
+    InvoiceOutbox.objects.filter(id=entry.id).update(
+        status='P', message=message, started_at=None,
+        next_attempt_at=timezone.now() + INVOICE_RETRY_DELAY * 2 ** (entry.attempts - 1)
+    )
+    return 'P'
+
+
+def _finish_invoice(entry_id, status, message=None, operation_id=None):
+    InvoiceOutbox.objects.filter(id=entry_id).update(
+        status=status, message=message, operation_id=operation_id, finished_at=timezone.now()
+    )
+
+
+def send_invoice(entry_id):
+    """Envía un comprobante ya tomado (en un hilo del pool de run_invoice_outbox); devuelve su nuevo estado"""
+    from ..sales.models import Order
+
+    try:
+        entry = InvoiceOutbox.objects.get(id=entry_id)
+        assign_correlative(entry)
+        try:
+            build = import_string(INVOICE_BUILDERS[entry.document_type])
+            document = build(entry.order_id, entry.product_type, entry.correlative)
+        except Exception as e:
+            release_correlative(entry)
+            _finish_invoice(entry_id, 'F', message=f'Error al armar el comprobante: {str(e)}')
+            return 'F'
+        if isinstance(document, dict):
+            # La orden no es válida para el comprobante: reintentar no cambia nada
+            release_correlative(entry)
+            _finish_invoice(entry_id, 'F', message=document['error'])
+            return 'F'
+
+        result = submit_fact_document(document)
+        if 'error' in result:
+            # Fallo de comunicación con el proveedor: el comprobante pudo registrarse, se conserva el número
+            return _retry_or_fail(entry, result['error'])
+        if not result.get('success'):
+            if is_duplicate_rejection(entry, result):
+                result = {
+                    'serie': f'{INVOICE_PREFIXES[entry.document_type]}{entry.serial}',
+                    'numero': entry.correlative,
+                    'message': 'Comprobante registrado en un intento anterior sin respuesta',
+                }
+            else:
+                if not INVOICE_DUPLICATE_MESSAGE.search(result.get('provider_message') or ''):
+                    # Rechazado sin registrarse; un número ya registrado por otro comprobante no se reutiliza
+                    release_correlative(entry)
+                message = result.get('message')
+                if result.get('provider_message'):
+                    message = f"{message}: {result['provider_message']}"
+                _finish_invoice(entry_id, 'F', message=message)
+                return 'F'
+
+        with transaction.atomic():
+            Order.objects.filter(id=entry.order_id).update(
+                bill_type=entry.document_type, bill_serial=result['serie'], bill_number=result['numero']
+            )
+            _finish_invoice(entry_id, 'D', message=result.get('message'), operation_id=result.get('operationId'))
+        return 'D'
+    finally:
+        # Cada hilo del pool tiene su propia conexión
+        connection.close()
+
+
+def invoice_outbox_dict(entry):
+    prefix = INVOICE_PREFIXES.get(entry.document_type, '')
+    return {
+        'id': entry.id,
+        'order_id': entry.order_id,
+        'document_type': entry.document_type,
+        'status': entry.status,
+        'status_display': entry.get_status_display(),
+        'serial': f'{prefix}{entry.serial}' if entry.correlative is not None and not entry.released else None,
+        'correlative': entry.correlative,
+        'operation_id': entry.operation_id,
+        'attempts': entry.attempts,
+        'message': entry.message,
+        'created_at': entry.created_at,
+        'finished_at': entry.finished_at,
+    }
@@ -0,0 +1,84 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+
+from apps.accounting.cashflow_summary import get_cashflow_summary
+from apps.accounting.models import Cash, CashFlow
+from apps.hrm.models import Subsidiary
+
+
+def legacy_summary(cashflows):
+    """Totales como se calculaban antes en cashflow_list: un aggregate por total y por tipo de gasto"""
+    total_income = cashflows.filter(type__in=['E', 'A']).aggregate(total=Sum('total'))['total'] or 0
+    total_expenses = cashflows.filter(type='S').aggregate(total=Sum('total'))['total'] or 0
+    expense_totals = {}
+    for expense_code, expense_name in CashFlow.TYPE_EXPENSE:
+        expense_totals[expense_code] = cashflows.filter(type__in=['S', 'A'], type_expense=expense_code).aggregate(
+            total=Sum('total')
+        )['total'] or 0
+    return {
+        'total_income': total_income,
+        'total_expenses': total_expenses,
+        'net_balance': total_income - total_expenses,
+        'expense_totals': expense_totals,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Mide consultas y tiempo del resumen de caja sobre un año de movimientos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000, help='Movimientos creados en el año')
+        parser.add_argument('--repeat', type=int, default=5, help='Ejecuciones medidas')
+
+    def handle(self, *args, **options):
+        random.seed(options['rows'])
+
+        # Todo se ejecuta dentro de una transacción que se revierte al final
+        with transaction.atomic():
+            cash = self._seed(options['rows'])
+            cashflows = CashFlow.objects.filter(
+                cash=cash, transaction_date__gte=date(2024, 1, 1), transaction_date__lte=date(2024, 12, 31)
+            )
+            self.stdout.write(f"{'versión':>10} {'consultas':>10} {'ms prom.':>10}")
+            legacy = self._measure('anterior', options['repeat'], lambda: legacy_summary(cashflows))
+            summary = self._measure('resumen', options['repeat'], lambda: get_cashflow_summary(cashflows))
+            transaction.set_rollback(True)
+
+        for key in ('total_income', 'total_expenses', 'net_balance', 'expense_totals'):
+            if legacy[key] != summary[key]:
+                raise CommandError(f'El resumen no coincide en {key}: {legacy[key]} != {summary[key]}')
+        self.stdout.write(self.style.SUCCESS('Los totales coinciden con el cálculo anterior'))
+
+    def _seed(self, rows):
+        subsidiary = Subsidiary.objects.create(name='BENCHMARK SUBSIDIARY')
+        cash = Cash.objects.create(name='BENCHMARK CASH', subsidiary=subsidiary)
+        CashFlow.objects.bulk_create([
+            CashFlow(
+                transaction_date=date(2024, 1, 1) + timedelta(days=random.randint(0, 365)),
+                description=f'BENCHMARK {i}',
+                type=random.choice(('A', 'C', 'E', 'S', 'S', 'S', 'D')),
+                total=Decimal(random.randint(100, 100000)) / 100,
+                cash=cash,
+                type_expense=random.choice(CashFlow.TYPE_EXPENSE)[0],
+                way_to_pay=random.choice(CashFlow.TYPE_CHOICES_PAYMENT)[0],
+                subsidiary=subsidiary,
+            ) for i in range(rows)
+        ], batch_size=500)
+        return cash
+
+    def _measure(self, label, repeat, fn):
+        elapsed = 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                result = fn()
+                elapsed += time.perf_counter() - start
+        self.stdout.write(f'{label:>10} {len(context.captured_queries):>10} {elapsed * 1000 / repeat:>10.2f}')
+        return result
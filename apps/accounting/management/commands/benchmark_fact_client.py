@@ -0,0 +1,134 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.core.management.base import BaseCommand
+
+from apps.accounting.fact_client import FactClient, FactDocument, submit_fact_document, submit_fact_documents
+
+_ALIASED_FIELD = re.compile(r'(?:(\w+)\s*:\s*)?\b(registerSale)\s*\(')
+
+
+class StubGraphQLHandler(BaseHTTPRequestHandler):
+    """Proveedor FACT de prueba: responde registerSale (con o sin alias) tras una latencia fija"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        # Cada conexión nueva paga el costo del saludo TLS del proveedor real
+        self.server.connections += 1
+        time.sleep(self.server.handshake)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests += 1
+        time.sleep(self.server.latency)
+        if random.random() < self.server.fail_rate:
+            return self._send(503, {'message': 'Servicio no disponible'})
+        data = {}
+        for alias, field in _ALIASED_FIELD.findall(payload['query']):
+            self.server.documents += 1
+            data[alias or field] = {
+                'success': True, 'message': 'Comprobante registrado', 'operationId': self.server.documents
+            }
+        self._send(200, {'data': data})
+
+    def _send(self, status, body):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def sample_document(number, lines):
+    """Boleta de ejemplo con la misma forma que la de build_receipt_4_fact"""
+    items = ', '.join(
+        f'{{producto: "PRODUCTO {i}", cantidad: 1, precioBase: 8.474576, codigoSunat: "10000000", '
+        f'codigoProducto: "0000", codigoUnidad: "NIU", tipoIgvCodigo: "10"}}'
+        for i in range(lines)
+    )
+    query = f'''
+    mutation RegisterSale {{
+        registerSale(
+            cliente: {{razonSocialNombres: "CLIENTE {number}", numeroDocumento: "00000000",
+                       codigoTipoEntidad: 1, clienteDireccion: ""}},
+            venta: {{serie: "B001", numero: "{number}", fechaEmision: "2024-01-01", horaEmision: "08:00:00",
+                     monedaId: 1, formaPagoId: 1, totalImporte: {10 * lines}, tipoDocumentoCodigo: "03"}},
+            items: [{items}]
+        ) {{
+            message
+            success
+            operationId
+        }}
+    }}
+    '''
+
+    def parse(result):
+        data = (result.get('data') or {}).get('registerSale') or {}
+        return {'success': bool(data.get('success')), 'numero': number}
+    return FactDocument(query, None, 'token', parse)
+
+
+class Command(BaseCommand):
+    help = 'Compara el envío de comprobantes FACT con conexión nueva, sesión compartida y lotes contra un proveedor local'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=200, help='Comprobantes enviados por escenario')
+        parser.add_argument('--lines', type=int, default=5, help='Ítems por comprobante')
+        parser.add_argument('--latency-ms', type=float, default=20, help='Latencia del proveedor por solicitud')
+        parser.add_argument('--handshake-ms', type=float, default=30, help='Costo de cada conexión nueva')
+        parser.add_argument('--fail-rate', type=float, default=0.05,
+                            help='Fracción de respuestas 503 del proveedor (se reintentan)')
+        parser.add_argument('--batch-size', type=int, default=20, help='Comprobantes por mutación en lotes')
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubGraphQLHandler)
+        server.daemon_threads = True
+        server.latency = options['latency_ms'] / 1000
+        server.handshake = options['handshake_ms'] / 1000
+        server.fail_rate = options['fail_rate']
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_address[1]}/graphql'
+        documents = [sample_document(number, options['lines']) for number in range(1, options['documents'] + 1)]
+
+        def fresh_connection(document):
+            # Como antes: requests.post sin sesión, sin tiempo límite ni reintentos
+            try:
+                response = requests.post(url, json={'query': document.query},
+                                         headers={'Content-Type': 'application/json', 'token': document.token})
+                response.raise_for_status()
+                return document.parse(response.json())
+            except requests.exceptions.RequestException as e:
+                return {'error': str(e)}
+
+        client = FactClient(url=url, backoff=0.01)
+        scenarios = (
+            ('antes: requests.post por comprobante', lambda: [fresh_connection(d) for d in documents]),
+            ('sesión compartida con reintentos', lambda: [submit_fact_document(d, client) for d in documents]),
+            (f"lotes de {options['batch_size']}",
+             lambda: submit_fact_documents(documents, options['batch_size'], client)),
+        )
+        try:
+            for label, run in scenarios:
+                server.connections = server.requests = server.documents = 0
+                start = time.perf_counter()
+                results = run()
+                elapsed = time.perf_counter() - start
+                ok = sum(1 for result in results if result.get('success'))
+                self.stdout.write(
+                    f'{label}: {elapsed:.2f} s, {ok}/{len(results)} registrados, '
+                    f'{server.requests} solicitudes, {server.connections} conexiones'
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,122 @@
+import decimal
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.accounting.fact_client import encode_payload
+from apps.accounting.fact_payloads import client_input, sale_items, sale_payload
+from .check_fact_payloads import SAMPLE_CLIENT, payload_form, sample_sale_lines
+
+
+def legacy_receipt_payload(client_name, client_address, lines):
+    """Boleta como se armaba antes en api_FACT: ítems y cliente interpolados en la consulta"""
+    items = []
+    sub_total = total = igv_total = decimal.Decimal(0)
+    client_name = str(client_name).replace('"', "'")
+    client_address = str(client_address).replace('"', "'")
+    for product, quantity, price_unit in lines:
+        product_name = str(product).replace('"', "'")
+        quantity = decimal.Decimal(quantity or 0)
+        if quantity == 0:
+            continue
+        base_total = quantity * decimal.Decimal(price_unit or 0)
+        base_amount = base_total / decimal.Decimal(1.1800)
+        igv = base_total - base_amount
+        sub_total = sub_total + decimal.Decimal(base_amount)
+        total = total + base_total
+        igv_total = igv_total + decimal.Decimal(igv)
+        _base_amount_v = (base_amount / quantity).quantize(decimal.Decimal('0.000001'))
+        items.append({
+            "codigoUnidad": 'NIU', "codigoProducto": "0000", "codigoSunat": "10000000",
+            "producto": product_name, "cantidad": quantity, "precioBase": _base_amount_v, "tipoIgvCodigo": "10"
+        })
+    items_graphql = ", ".join(
+        f"""{{
+                codigoUnidad: "{item['codigoUnidad']}",
+                codigoProducto: "{item['codigoProducto']}",
+                codigoSunat: "{item['codigoSunat']}",
+                producto: "{item['producto']}",
+                cantidad: {item['cantidad']},
+                precioBase: {item['precioBase']},
+                tipoIgvCodigo: "{item['tipoIgvCodigo']}"
+            }}"""
+        for item in items
+    )
+    query = f"""
+        mutation RegisterSale  {{
+            registerSale(
+                cliente: {{
+                    razonSocialNombres: "{client_name}",
+                    numeroDocumento: "45678912",
+                    codigoTipoEntidad: 1,
+                    clienteDireccion: "{client_address}"
+                }},
+                venta: {{
+                    serie: "B001",
+                    numero: "1024",
+                    fechaEmision: "2024-03-15",
+                    horaEmision: "09:30:00",
+                    fechaVencimiento: "",
+                    monedaId: 1,
+                    formaPagoId: 1,
+                    totalGravada: {float(sub_total)},
+                    totalDescuentoGlobalPorcentaje: 0,
+                    totalDescuentoGlobal: 0,
+                    totalIgv: {float(igv_total)},
+                    totalExonerada: 0,
+                    totalInafecta: 0,
+                    totalImporte: {float(total.quantize(decimal.Decimal('0.01')))},
+                    totalAPagar: {float(total.quantize(decimal.Decimal('0.01')))},
+                    totalDetraction: 0.0,
+                    tipoDocumentoCodigo: "03",
+                    nota: " "
+                }},
+                items: [{items_graphql}]
+            ) {{
+                message
+                success
+                operationId
+            }}
+        }}
+        """
+    return query, None
+
+
+def compiled_receipt_payload(client_name, client_address, lines):
+    return sale_payload('receipt', client_input(client_name, '45678912', 1, client_address), 'B001', 1024,
+                        '2024-03-15', '09:30:00', sale_items(lines))
+
+
+class Command(BaseCommand):
+    help = 'Compara el armado de la consulta GraphQL de una boleta con cientos de líneas: interpolación vs sale_payload'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=300, help='Líneas de la orden')
+        parser.add_argument('--repeat', type=int, default=200, help='Comprobantes armados por escenario')
+
+    def handle(self, *args, **options):
+        lines = sample_sale_lines(options['lines'])
+        name, address = SAMPLE_CLIENT
+        scenarios = (
+            ('antes: interpolación en la consulta', legacy_receipt_payload, True),
+            ('ahora: sale_payload con variables', compiled_receipt_payload, True),
+            ('ahora: sale_payload con literales escapados', compiled_receipt_payload, False),
+        )
+        timings = {label: [] for label, build, graphql_variables in scenarios}
+        sizes = {}
+        # Los escenarios se alternan para que el ruido de la máquina afecte a todos por igual
+        for _ in range(options['repeat']):
+            for label, build, graphql_variables in scenarios:
+                with payload_form(graphql_variables):
+                    start = time.perf_counter()
+                    query, variables = build(name, address, lines)
+                    # El cuerpo que envía FactClient
+                    body = encode_payload({'query': query, 'variables': variables})
+                    timings[label].append(time.perf_counter() - start)
+                sizes[label] = len(body)
+        for label, build, graphql_variables in scenarios:
+            self.stdout.write(
+                f'{label}: {statistics.median(timings[label]) * 1000:.2f} ms por comprobante (mediana), '
+                f'{sizes[label] / 1024:.1f} KB enviados'
+            )
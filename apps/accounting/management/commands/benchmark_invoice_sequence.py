@@ -0,0 +1,80 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.accounting.models import InvoiceSequence
+
+SERIAL = 'T999'
+
+
+class Command(BaseCommand):
+    help = 'Prueba de concurrencia de la reserva de correlativos: muchos hilos reservando a la vez, sin duplicados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Hilos reservando en paralelo')
+        parser.add_argument('--allocations', type=int, default=200, help='Reservas por hilo')
+        parser.add_argument('--block', type=int, default=25, help='Tamaño de bloque en la prueba de reserva por bloques')
+
+    def _run(self, threads, allocations, count):
+        numbers, timings, errors = [], [], []
+        lock = threading.Lock()
+
+        def allocator():
+            local_numbers, local_timings = [], []
+            try:
+                for _ in range(allocations):
+                    start = time.perf_counter()
+                    first = InvoiceSequence.allocate(SERIAL, '2', count)
+                    local_timings.append(time.perf_counter() - start)
+                    local_numbers.extend(range(first, first + count))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+            with lock:
+                numbers.extend(local_numbers)
+                timings.append(local_timings)
+
+        workers = [threading.Thread(target=allocator) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        if errors:
+            raise CommandError(f'Error al reservar: {errors[0]}')
+        return numbers, timings, elapsed
+
+    def _report(self, label, numbers, timings, elapsed, expected_first):
+        expected = list(range(expected_first, expected_first + len(numbers)))
+        if len(set(numbers)) != len(numbers):
+            raise CommandError(f'{label}: se entregaron {len(numbers) - len(set(numbers))} números duplicados')
+        if sorted(numbers) != expected:
+            raise CommandError(f'{label}: los números no son consecutivos')
+        # Latencia de la primera y la última cuarta parte de las reservas de cada hilo
+        quarter = max(1, len(timings[0]) // 4)
+        first = [t for thread in timings for t in thread[:quarter]]
+        last = [t for thread in timings for t in thread[-quarter:]]
+        self.stdout.write(
+            f'{label}: {len(numbers)} números sin duplicados ni huecos en {elapsed:.2f} s; '
+            f'latencia mediana primeras/últimas reservas: '
+            f'{statistics.median(first) * 1000:.2f} / {statistics.median(last) * 1000:.2f} ms'
+        )
+
+    def handle(self, *args, **options):
+        threads, allocations = max(1, options['threads']), max(1, options['allocations'])
+        InvoiceSequence.objects.filter(serial=SERIAL).delete()
+        try:
+            numbers, timings, elapsed = self._run(threads, allocations, 1)
+            self._report(f'{threads} hilos x {allocations} reservas', numbers, timings, elapsed, 1)
+
+            block = max(1, options['block'])
+            numbers, timings, elapsed = self._run(threads, max(1, allocations // block), block)
+            self._report(f'{threads} hilos en bloques de {block}', numbers, timings, elapsed,
+                         threads * allocations + 1)
+        finally:
+            InvoiceSequence.objects.filter(serial=SERIAL).delete()
@@ -0,0 +1,55 @@
+import statistics
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand
+
+# Cada escenario corre en un proceso nuevo, como el arranque de un worker
+SCENARIOS = (
+    ('django.setup()', ''),
+    ('antes: importar las vistas PDF registrando todas las fuentes y estilos', '''
+import apps.accounting.views_pdf
+from apps.hrm.pdf_resources import FONT_FILES, get_font, get_stylesheet
+for name in FONT_FILES:
+    get_font(name)
+styles = get_stylesheet()
+for name in list(styles.byName):
+    styles[name]
+'''),
+    ('ahora: importar las vistas PDF', '''
+import apps.accounting.views_pdf
+import apps.hrm.pdf_resources
+'''),
+    ('ahora: primer reporte (hoja de estilos + fuentes usadas)', '''
+import apps.accounting.views_pdf
+from apps.hrm.pdf_resources import get_stylesheet
+styles = get_stylesheet()
+styles['Report_Title'], styles['Report_Cell'], styles['Heading2'], styles['narrow_justify']
+'''),
+)
+
+SNIPPET = '''
+import time
+start = time.perf_counter()
+import django
+django.setup()
+{code}
+print(time.perf_counter() - start)
+'''
+
+
+class Command(BaseCommand):
+    help = 'Mide el arranque de Django con la carga de fuentes y estilos PDF al importar y bajo demanda'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Procesos medidos por escenario')
+
+    def handle(self, *args, **options):
+        for label, code in SCENARIOS:
+            timings = []
+            for _ in range(options['repeat']):
+                output = subprocess.run(
+                    [sys.executable, '-c', SNIPPET.format(code=code)], check=True, capture_output=True, text=True
+                ).stdout
+                timings.append(float(output.strip().splitlines()[-1]))
+            self.stdout.write(f'{label}: {statistics.median(timings) * 1000:.1f} ms (mediana de {len(timings)})')
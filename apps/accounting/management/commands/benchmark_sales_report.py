@@ -0,0 +1,98 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounting.models import CashFlow
+from apps.accounting.sales_report import group_sales_cashflows, ADVANCE, FULL_PAYMENT
+
+
+class DetailSet:
+    """Detalles de orden precargados, como los deja prefetch_related"""
+
+    def __init__(self, details):
+        self.details = details
+
+    def all(self):
+        return self.details
+
+
+def build_day(orders, report_date):
+    """
+    Movimientos de un día con la forma que devuelve fetch_report_cashflows:
+    órdenes del día con adelantos y/o pagos totales, pagos de órdenes anteriores, aperturas y gastos.
+    """
+    user = get_user_model()(username='benchmark', first_name='BENCHMARK')
+    subsidiary = SimpleNamespace(serial='B001')
+    cashflows = []
+    for order_id in range(1, orders + 1):
+        is_previous = random.random() < 0.2
+        order = SimpleNamespace(
+            id=order_id,
+            total=Decimal(random.randint(5000, 50000)) / 100,
+            status=random.choice(('P', 'C')),
+            register_date=report_date - timedelta(days=random.randint(1, 30)) if is_previous else report_date,
+            subsidiary_id=1,
+            subsidiary=subsidiary,
+            correlative=order_id,
+            client=None,
+            user=user,
+            user_id=user.pk,
+            observation=None,
+            orderdetail_set=DetailSet([
+                SimpleNamespace(product_name=f'PRODUCTO {order_id}-{i}') for i in range(random.randint(0, 3))
+            ]),
+        )
+        entries = ['T'] if is_previous else random.choice((['A'], ['A', 'A'], ['T'], ['A', 'T']))
+        for entry in entries:
+            cashflow = CashFlow(
+                transaction_date=report_date, type='E', total=Decimal(random.randint(100, 10000)) / 100,
+                way_to_pay=random.choice(CashFlow.TYPE_CHOICES_PAYMENT)[0], user=user,
+            )
+            cashflow.order = order
+            cashflow.order_id = order_id
+            cashflow.order_type_entry = entry
+            cashflows.append(cashflow)
+    for i in range(orders // 10):
+        cashflow = CashFlow(transaction_date=report_date, type=random.choice(('A', 'S', 'S')),
+                            total=Decimal(random.randint(100, 10000)) / 100, user=user)
+        cashflow.order = None
+        cashflow.order_id = None
+        cashflows.append(cashflow)
+    return cashflows
+
+
+class Command(BaseCommand):
+    help = 'Mide la agrupación en memoria del reporte diario de ventas para un día con muchas órdenes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=2000, help='Órdenes con movimientos en el día')
+        parser.add_argument('--repeat', type=int, default=5, help='Ejecuciones medidas')
+
+    def handle(self, *args, **options):
+        random.seed(options['orders'])
+        report_date = date(2024, 6, 1)
+        cashflows = build_day(options['orders'], report_date)
+        orders_of_day = {cf.order_id for cf in cashflows if cf.order_id and cf.order.register_date == report_date}
+
+        elapsed = 0
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            report = group_sales_cashflows(cashflows, report_date)
+            elapsed += time.perf_counter() - start
+
+        grouped = {item.order_id for item in report.income}
+        if grouped != orders_of_day:
+            raise CommandError(f'Se agruparon {len(grouped)} órdenes del día de {len(orders_of_day)}')
+
+        # Antes: 1 consulta de órdenes + detalles, y por orden hasta 4 consultas de adelantos/pagos
+        legacy_queries = 2 + 4 * len(orders_of_day) + 3
+        self.stdout.write(f'Movimientos: {len(cashflows)}  Órdenes del día: {len(orders_of_day)}')
+        self.stdout.write(f'Adelantos: {len(report.income_of(ADVANCE))}  Pagos totales: {len(report.income_of(FULL_PAYMENT))}  '
+                          f'Pagos anteriores: {len(report.previous_payments)}  Gastos: {len(report.expenses)}')
+        self.stdout.write(f'Consultas: hasta {legacy_queries} antes, 2 ahora (movimientos + detalles de orden)')
+        self.stdout.write(self.style.SUCCESS(f'Agrupación: {elapsed * 1000 / options["repeat"]:.2f} ms prom.'))
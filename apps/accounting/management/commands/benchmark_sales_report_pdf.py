@@ -0,0 +1,79 @@
+import os
+import random
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from reportlab.lib.pagesizes import letter, landscape
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Paragraph
+
+from apps.accounting.pdf_export import PdfReport, paragraph_cell
+from apps.accounting.sales_report import group_sales_cashflows, OrderIncome, Payment, FULL_PAYMENT
+from apps.accounting.views_pdf import sales_report_story
+
+
+def build_report(rows):
+    """Reporte del día con rows órdenes pagadas; una de cada diez con descripción larga"""
+    report = group_sales_cashflows([], date(2024, 6, 1))
+    income = []
+    for order_id in range(1, rows + 1):
+        total = Decimal(random.randint(5000, 50000)) / 100
+        products = f'PRODUCTO {order_id}'
+        if order_id % 10 == 0:
+            products = ' | '.join(f'PRODUCTO {order_id}-{i} CON DESCRIPCIÓN EXTENDIDA' for i in range(4))
+        income.append(OrderIncome(
+            FULL_PAYMENT, order_id, f'B001-{order_id:03d}', 'CLIENTE VARIOS', products, total, Decimal('0'),
+            (Payment('BENCHMARK', 'E', 'EFECTIVO', total),), total
+        ))
+    return report._replace(income=tuple(income))
+
+
+def count_paragraphs(story):
+    count = 0
+    for flowable in story:
+        for row in getattr(flowable, '_cellvalues', ()):
+            count += sum(isinstance(value, Paragraph) for value in row)
+    return count
+
+
+class Command(BaseCommand):
+    help = 'Compara el PDF del reporte de ventas como se generaba antes (una tabla, Paragraph en cada texto, en disco) y ahora'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Filas de la tabla de ingresos')
+
+    def handle(self, *args, **options):
+        random.seed(options['rows'])
+        sales_report = build_report(options['rows'])
+        heading = 'TIENDA: TODAS - DÍA: 01-06-2024'
+
+        # Antes: una sola tabla con Paragraph en todas las celdas de productos y descripciones,
+        # escrita a un archivo
+        start = time.perf_counter()
+        story = sales_report_story(sales_report, heading, cell=paragraph_cell, chunk_rows=options['rows'] + 10)
+        paragraphs_before = count_paragraphs(story)
+        fd, filepath = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        try:
+            SimpleDocTemplate(filepath, pagesize=landscape(letter), leftMargin=0.5*inch, rightMargin=0.5*inch,
+                              topMargin=0.5*inch, bottomMargin=0.5*inch).build(story)
+            size_before = os.path.getsize(filepath)
+        finally:
+            os.remove(filepath)
+        before = time.perf_counter() - start
+
+        # Ahora: Paragraph solo si el texto no cabe, tablas en bloques, renderizado en memoria
+        start = time.perf_counter()
+        report = PdfReport(pagesize=landscape(letter), margin=0.5*inch)
+        report.append(*sales_report_story(sales_report, heading))
+        paragraphs_after = count_paragraphs(report.story)
+        size_after = len(report.render().getbuffer())
+        after = time.perf_counter() - start
+
+        self.stdout.write(f'Filas de ingresos: {options["rows"]}')
+        self.stdout.write(f'Antes: {before * 1000:.0f} ms, {paragraphs_before} Paragraph, {size_before / 1024:.0f} KB en disco')
+        self.stdout.write(f'Ahora: {after * 1000:.0f} ms, {paragraphs_after} Paragraph, {size_after / 1024:.0f} KB en memoria')
+        self.stdout.write(self.style.SUCCESS(f'Mejora: {before / after:.2f}x'))
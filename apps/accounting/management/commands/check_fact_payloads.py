@@ -0,0 +1,105 @@
+import difflib
+import json
+import os
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounting import fact_payloads
+from apps.accounting.fact_payloads import client_input, credit_note_items, credit_note_payload, sale_items, \
+    sale_payload
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'fact_golden')
+# Sufijo del archivo de referencia de cada forma de la consulta (FACT_GRAPHQL_VARIABLES)
+PAYLOAD_FORMS = (('', True), ('.literal', False))
+
+# Textos con comillas, saltos de línea, barras y tildes: antes había que reemplazarlos en la consulta
+SAMPLE_CLIENT = ('Comercial "El Sol" S.A.C.\nSucursal Ñaña', 'Av. Los Álamos 123 \\ Int. 4')
+SAMPLE_LINES = (
+    ('Arroz "extra" 50kg', Decimal('2'), Decimal('120.50')),
+    ('Servicio de flete', Decimal('1.5'), Decimal('33.33')),
+    ('Línea sin cantidad', Decimal('0'), Decimal('10')),
+)
+SAMPLE_RETURNS = (
+    ('ARROZ "EXTRA" 50KG', 'P-001', '1', '120.50'),
+    ('ACEITE 1L', 'P-014', '3', '9.90'),
+)
+
+
+def sample_sale_lines(count):
+    """count líneas de venta repitiendo las de ejemplo con cantidad"""
+    lines = [line for line in SAMPLE_LINES if line[1]]
+    return [(f'{lines[i % len(lines)][0]} {i}',) + lines[i % len(lines)][1:] for i in range(count)]
+
+
+@contextmanager
+def payload_form(graphql_variables):
+    """Arma los comprobantes con variables GraphQL o con argumentos literales"""
+    previous = fact_payloads.FACT_GRAPHQL_VARIABLES
+    fact_payloads.FACT_GRAPHQL_VARIABLES = graphql_variables
+    try:
+        yield
+    finally:
+        fact_payloads.FACT_GRAPHQL_VARIABLES = previous
+
+
+def sample_payloads():
+    name, address = SAMPLE_CLIENT
+    return {
+        'bill': sale_payload(
+            'bill', client_input(name, '20123456789', 6, address), 'F001', 57, '2024-03-15', '09:30:00',
+            sale_items(SAMPLE_LINES), payment=9, total_detraction=Decimal('12.345')
+        ),
+        'receipt': sale_payload(
+            'receipt', client_input(name, '45678912', 1, address), 'B001', 1024, '2024-03-15', '09:30:00',
+            sale_items(SAMPLE_LINES, 'ZZ')
+        ),
+        'credit_note': credit_note_payload(
+            client_input(name, '45678912', 1, address), 'BN01', 8, '2024-03-16', '17:05:00',
+            credit_note_items(SAMPLE_RETURNS), 'DEVOLUCION PARCIAL', 'B001', 1024, '03'
+        ),
+    }
+
+
+def dump_payload(query, variables):
+    return json.dumps({'query': query, 'variables': variables}, indent=2, ensure_ascii=False) + '\n'
+
+
+class Command(BaseCommand):
+    help = ('Compara la serialización de cada tipo de comprobante FACT, con variables y con argumentos literales, '
+            'con sus archivos de referencia (fact_golden/)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--update', action='store_true', help='Reescribe los archivos de referencia')
+
+    def handle(self, *args, **options):
+        failed = []
+        for suffix, graphql_variables in PAYLOAD_FORMS:
+            with payload_form(graphql_variables):
+                payloads = sample_payloads()
+            for kind, (query, variables) in payloads.items():
+                name = f'{kind}{suffix}'
+                path = os.path.join(GOLDEN_DIR, f'{name}.json')
+                current = dump_payload(query, variables)
+                if options['update']:
+                    with open(path, 'w', encoding='utf-8') as golden:
+                        golden.write(current)
+                    self.stdout.write(f'{name}: actualizado')
+                    continue
+
+                try:
+                    with open(path, encoding='utf-8') as golden:
+                        expected = golden.read()
+                except FileNotFoundError:
+                    expected = ''
+                if json.loads(expected or 'null') == json.loads(current):
+                    self.stdout.write(self.style.SUCCESS(f'{name}: OK'))
+                    continue
+                failed.append(name)
+                self.stdout.writelines(difflib.unified_diff(
+                    expected.splitlines(True), current.splitlines(True), f'fact_golden/{name}.json', name
+                ))
+
+        if failed:
+            raise CommandError(f"La serialización cambió: {', '.join(failed)}")
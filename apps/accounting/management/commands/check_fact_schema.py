@@ -0,0 +1,101 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounting.fact_client import GRAPHQL_URL, FactClient, FactError
+from apps.accounting.fact_payloads import DOCUMENT_SPECS, FACT_INPUT_TYPES, FACT_GRAPHQL_VARIABLES
+
+# Argumentos y campos de respuesta de las mutaciones del proveedor
+INTROSPECTION_QUERY = '''
+query FactSchema {
+  __schema {
+    mutationType {
+      fields {
+        name
+        args { name type { ...TypeRef } }
+        type { ...TypeRef fields { name } }
+      }
+    }
+  }
+}
+fragment TypeRef on __Type {
+  kind name ofType { kind name ofType { kind name ofType { kind name } } }
+}
+'''
+
+
+def type_name(type_ref):
+    """Tipo GraphQL como se escribe en la consulta, p. ej. [ItemInput]!"""
+    if type_ref['kind'] == 'NON_NULL':
+        return f"{type_name(type_ref['ofType'])}!"
+    if type_ref['kind'] == 'LIST':
+        return f"[{type_name(type_ref['ofType'])}]"
+    return type_ref['name']
+
+
+def return_fields(type_ref):
+    while type_ref.get('ofType') and not type_ref.get('fields'):
+        type_ref = type_ref['ofType']
+    return {field['name'] for field in type_ref.get('fields') or []}
+
+
+def check_schema(schema):
+    """Diferencias entre DOCUMENT_SPECS / FACT_INPUT_TYPES y el esquema del proveedor"""
+    mutations = {field['name']: field for field in (schema['mutationType'] or {}).get('fields') or []}
+    problems = []
+    for kind, spec in DOCUMENT_SPECS.items():
+        field = mutations.get(spec.field)
+        if field is None:
+            problems.append(f'{kind}: el esquema no tiene la mutación {spec.field}')
+            continue
+        arguments = {argument['name']: type_name(argument['type']) for argument in field['args']}
+        for name in spec.arguments:
+            if name not in arguments:
+                problems.append(f'{kind}: {spec.field} no tiene el argumento {name}')
+            elif arguments[name] != FACT_INPUT_TYPES[name]:
+                problems.append(f'{kind}: {spec.field}.{name} es {arguments[name]}, FACT_INPUT_TYPES dice '
+                                f'{FACT_INPUT_TYPES[name]}')
+        available = return_fields(field['type'])
+        for name in spec.selection:
+            if name not in available:
+                problems.append(f'{kind}: la respuesta de {spec.field} no tiene el campo {name}')
+    return problems
+
+
+class Command(BaseCommand):
+    help = ('Verifica las mutaciones, argumentos y tipos de entrada de fact_payloads contra el esquema GraphQL '
+            'del proveedor FACT (introspección o un JSON de __schema guardado)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=GRAPHQL_URL, help='Endpoint GraphQL del proveedor')
+        parser.add_argument('--token', default='', help='Token del emisor, si el proveedor lo pide para introspección')
+        parser.add_argument('--schema', help='Resultado guardado de la introspección (JSON) en lugar de consultarla')
+        parser.add_argument('--save', help='Guarda el resultado de la introspección en este archivo')
+
+    def handle(self, *args, **options):
+        if options['schema']:
+            with open(options['schema'], encoding='utf-8') as f:
+                result = json.load(f)
+        else:
+            try:
+                result = FactClient(url=options['url']).execute(INTROSPECTION_QUERY, token=options['token'])
+            except FactError as e:
+                raise CommandError(str(e))
+            if options['save']:
+                with open(options['save'], 'w', encoding='utf-8') as f:
+                    json.dump(result, f, indent=2, ensure_ascii=False)
+                    f.write('\n')
+        if result.get('errors') or not (result.get('data') or {}).get('__schema'):
+            raise CommandError(f"El proveedor no devolvió el esquema: {json.dumps(result.get('errors'))}")
+
+        problems = check_schema(result['data']['__schema'])
+        if problems:
+            for problem in problems:
+                self.stderr.write(problem)
+            if FACT_GRAPHQL_VARIABLES:
+                self.stderr.write('Corrija FACT_INPUT_TYPES o envíe argumentos literales con '
+                                  'FACT_GRAPHQL_VARIABLES = False en fact_payloads')
+            raise CommandError(f'{len(problems)} diferencias con el esquema del proveedor')
+        self.stdout.write(self.style.SUCCESS('Mutaciones y tipos de entrada de fact_payloads verificados'))
+        if not FACT_GRAPHQL_VARIABLES:
+            self.stdout.write('Puede volver a las variables GraphQL con FACT_GRAPHQL_VARIABLES = True en fact_payloads')
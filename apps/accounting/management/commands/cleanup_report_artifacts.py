@@ -0,0 +1,38 @@
+import shutil
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.accounting.report_artifacts import iter_report_artifacts
+
+
+class Command(BaseCommand):
+    help = 'Elimina de la caché de reportes los archivos sin uso reciente y los más antiguos si se supera el tamaño máximo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=float, default=30,
+                            help='Elimina los archivos no entregados en esta cantidad de días')
+        parser.add_argument('--max-size-mb', type=float, default=500, help='Tamaño máximo total de la caché')
+        parser.add_argument('--dry-run', action='store_true', help='Solo muestra lo que se eliminaría')
+
+    def handle(self, *args, **options):
+        oldest_access = time.time() - options['max_age_days'] * 86400
+        max_size = options['max_size_mb'] * 1024 * 1024
+
+        # Del menos al más recientemente entregado
+        artifacts = sorted(iter_report_artifacts(), key=lambda artifact: artifact[1])
+        total_size = sum(size for path, accessed, size in artifacts)
+        removed = freed = 0
+        for path, accessed, size in artifacts:
+            if accessed >= oldest_access and total_size <= max_size:
+                break
+            if not options['dry_run']:
+                shutil.rmtree(path, ignore_errors=True)
+            total_size -= size
+            removed += 1
+            freed += size
+            self.stdout.write(f'Eliminado: {path}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archivos eliminados: {removed} ({freed / 1024 / 1024:.1f} MB); en caché: {total_size / 1024 / 1024:.1f} MB'
+        ))
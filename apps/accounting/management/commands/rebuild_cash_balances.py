@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.accounting.models import Cash, CashFlow, CashDailyBalance
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el libro diario (saldos y cierres por día) de las cajas desde sus movimientos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cash', type=int, action='append', dest='cash_ids',
+                            help='Id de la caja a reconstruir (se puede repetir). Todas por defecto')
+
+    def handle(self, *args, **options):
+        cash_set = Cash.objects.all()
+        if options['cash_ids']:
+            cash_set = cash_set.filter(id__in=options['cash_ids'])
+
+        for cash_id in cash_set.order_by('id').values_list('id', flat=True).iterator():
+            with transaction.atomic():
+                CashFlow.lock_cash(cash_id)
+                CashDailyBalance.rebuild(cash_id)
+            self.stdout.write(f'Caja {cash_id}: OK')
+
+        self.stdout.write(self.style.SUCCESS('Libro diario de cajas reconstruido'))
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.accounting.models import Cash, CashFlow, CashFlowMonthlyCube
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el cubo mensual de movimientos por caja (pensado para ejecutarse cada noche)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cash', type=int, action='append', dest='cash_ids',
+                            help='Id de la caja a reconstruir (se puede repetir). Todas por defecto')
+        parser.add_argument('--month', help='Mes a reconstruir (AAAA-MM). Todos por defecto')
+
+    def handle(self, *args, **options):
+        month = None
+        if options['month']:
+            try:
+                month = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('El mes debe tener el formato AAAA-MM')
+
+        cash_ids = list(Cash.objects.order_by('id').values_list('id', flat=True))
+        if options['cash_ids']:
+            cash_ids = [cash_id for cash_id in cash_ids if cash_id in options['cash_ids']]
+        elif CashFlow.objects.filter(cash__isnull=True).exists() or \
+                CashFlowMonthlyCube.objects.filter(cash__isnull=True).exists():
+            # Movimientos sin caja
+            cash_ids.append(None)
+
+        for cash_id in cash_ids:
+            with transaction.atomic():
+                CashFlow.lock_cash(cash_id)
+                CashFlowMonthlyCube.rebuild(cash_id, month)
+            self.stdout.write(f'Caja {cash_id or "sin caja"}: OK')
+
+        self.stdout.write(self.style.SUCCESS('Cubo mensual de movimientos reconstruido'))
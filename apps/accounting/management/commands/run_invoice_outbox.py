@@ -0,0 +1,51 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from django.core.management.base import BaseCommand
+
+from apps.accounting.invoice_outbox import claim_invoices, requeue_stale_invoices, send_invoice
+
+
+class Command(BaseCommand):
+    help = 'Envía al proveedor FACT los comprobantes de la bandeja de salida con un pool de hilos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Comprobantes enviados en paralelo')
+        parser.add_argument('--poll', type=float, default=1, help='Segundos entre revisiones de la bandeja')
+        parser.add_argument('--once', action='store_true', help='Envía los comprobantes listos y termina')
+
+    def handle(self, *args, **options):
+        threads = max(1, options['threads'])
+        requeued = requeue_stale_invoices()
+        if requeued:
+            self.stdout.write(f'Comprobantes abandonados devueltos a la bandeja: {requeued}')
+
+        pool = ThreadPoolExecutor(max_workers=threads)
+        running = {}
+        self.stdout.write(f'Enviando comprobantes con {threads} hilos')
+        try:
+            while True:
+                free = threads - len(running)
+                if free:
+                    for entry_id in claim_invoices(free):
+                        running[pool.submit(send_invoice, entry_id)] = entry_id
+
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    entry_id = running.pop(future)
+                    try:
+                        status = future.result()
+                    except Exception as e:
+                        # La fila vuelve a la bandeja al superar INVOICE_SEND_TIMEOUT
+                        self.stdout.write(self.style.ERROR(f'Comprobante {entry_id}: error {str(e)}'))
+                        continue
+                    style = self.style.SUCCESS if status == 'D' else self.style.ERROR
+                    self.stdout.write(style(f'Comprobante {entry_id}: {status}'))
+        finally:
+            pool.shutdown(wait=True)
@@ -0,0 +1,59 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.accounting.report_jobs import claim_report_jobs, finish_report_job, requeue_stale_report_jobs
+from apps.accounting.report_worker import init_report_worker, run_report_job
+
+
+class Command(BaseCommand):
+    help = 'Procesa la cola de reportes en segundo plano con un pool de procesos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                            help='Reportes generados en paralelo')
+        parser.add_argument('--poll', type=float, default=2, help='Segundos entre revisiones de la cola')
+        parser.add_argument('--once', action='store_true', help='Procesa los pendientes y termina')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        requeued = requeue_stale_report_jobs()
+        if requeued:
+            self.stdout.write(f'Trabajos abandonados devueltos a la cola: {requeued}')
+
+        # Procesos nuevos (spawn): no heredan las conexiones a la base de datos de este proceso
+        connections.close_all()
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=init_report_worker)
+        running = {}
+        self.stdout.write(f'Procesando reportes con {workers} procesos')
+        try:
+            while True:
+                free = workers - len(running)
+                if free:
+                    for job_id in claim_report_jobs(free):
+                        running[pool.submit(run_report_job, job_id)] = job_id
+
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        status = future.result()
+                    except Exception as e:
+                        # El proceso murió antes de registrar el resultado
+                        finish_report_job(job_id, 'F', message=f'Error al generar el reporte: {str(e)}')
+                        status = 'F'
+                    style = self.style.SUCCESS if status == 'D' else self.style.ERROR
+                    self.stdout.write(style(f'Reporte {job_id}: {status}'))
+        finally:
+            pool.shutdown(wait=True)
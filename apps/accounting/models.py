@@ -1,5 +1,10 @@
+from datetime import timedelta
+from decimal import Decimal
+
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
 
 
 # Create your models here.
@@ -24,6 +29,10 @@ class Cash(models.Model):
     currency_type = models.CharField('Tipo de moneda', max_length=1, choices=CURRENCY_TYPE_CHOICES, default='S')
     account_type = models.CharField('Tipo de cuenta', max_length=1, choices=ACCOUNT_TYPE_CHOICES, default='C')
 
+    def get_balance(self, balance_date=None):
+        """Saldo acumulado de la caja al cierre de una fecha (hoy si no se indica)"""
+        return CashDailyBalance.get_balance_at(self.id, balance_date)
+
     def __str__(self):
         return str(self.name)
 
@@ -37,6 +46,8 @@ class CashFlow(models.Model):
     TYPE_ENTRY_ORDER_CHOICES = (('A', 'ADELANTO'), ('T', 'PAGO TOTAL'),)
     transaction_date = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(null=True, blank=True)
+    # Sello de versión de los reportes ya generados (ver report_artifacts)
+    updated_at = models.DateTimeField('Actualizado', auto_now=True, null=True)
     description = models.CharField('Descripcion', max_length=100, null=True, blank=True)
     serial = models.CharField('Serie', max_length=5, null=True, blank=True)
     n_receipt = models.IntegerField('Numero de Comprobante', default=0, null=True, blank=True)
@@ -56,5 +67,392 @@ class CashFlow(models.Model):
     order_type_entry = models.CharField('Tipo entrada de orden', max_length=1, choices=TYPE_ENTRY_ORDER_CHOICES, default='T')
     subsidiary = models.ForeignKey('hrm.Subsidiary', on_delete=models.SET_NULL, null=True, blank=True)
 
+    # Entradas: tipo 'E' (Entrada) + tipo 'A' (Apertura); Salidas: tipo 'S' (Salida)
+    INCOME_TYPES = ('E', 'A')
+    EXPENSE_TYPES = ('S',)
+
+    @staticmethod
+    def lock_cash(*cash_ids):
+        """Bloquea las cajas (en orden) para serializar las escrituras de su libro diario"""
+        cash_ids = sorted(set(cash_id for cash_id in cash_ids if cash_id))
+        list(Cash.objects.select_for_update().filter(id__in=cash_ids).order_by('id').values_list('id', flat=True))
+
+    @staticmethod
+    def invalidate_caches():
+        """Al confirmarse la transacción, invalida la caché de la grilla y de los reportes que dependen de su versión"""
+        # cashflow_grid importa este módulo
+        from .cashflow_grid import invalidate_cashflow_grid
+        transaction.on_commit(invalidate_cashflow_grid)
+
+    def save(self, *args, **kwargs):
+        """Guarda el movimiento y recalcula el libro diario de la caja desde la fecha afectada y el cubo del mes"""
+        # La fecha puede llegar como texto desde los formularios
+        self.transaction_date = self._meta.get_field('transaction_date').to_python(self.transaction_date)
+        with transaction.atomic():
+            previous = None
+            if self.id is not None:
+                previous = CashFlow.objects.filter(id=self.id).values('cash_id', 'transaction_date').first()
+            self.lock_cash(self.cash_id, previous and previous['cash_id'])
+            super().save(*args, **kwargs)
+
+            # Fechas desde las que cambia el libro de cada caja afectada
+            changes = {}
+            affected = [(self.cash_id, self.transaction_date)]
+            if previous:
+                affected.append((previous['cash_id'], previous['transaction_date']))
+            for cash_id, transaction_date in affected:
+                if cash_id and transaction_date:
+                    changes[cash_id] = min(changes.get(cash_id, transaction_date), transaction_date)
+            for cash_id, since_date in sorted(changes.items()):
+                CashDailyBalance.rebuild(cash_id, since_date)
+
+            # Meses del cubo afectados (también los movimientos sin caja)
+            months = set()
+            for cash_id, transaction_date in affected:
+                if transaction_date:
+                    months.add((cash_id or 0, CashFlowMonthlyCube.month_of(transaction_date)))
+            for cash_id, month in sorted(months):
+                CashFlowMonthlyCube.rebuild(cash_id or None, month)
+            self.invalidate_caches()
+
+    def delete(self, *args, **kwargs):
+        """Elimina el movimiento y recalcula el libro diario de la caja desde su fecha y el cubo del mes"""
+        with transaction.atomic():
+            self.lock_cash(self.cash_id)
+            cash_id, transaction_date = self.cash_id, self.transaction_date
+            result = super().delete(*args, **kwargs)
+            if transaction_date:
+                CashDailyBalance.rebuild(cash_id, transaction_date)
+                CashFlowMonthlyCube.rebuild(cash_id, transaction_date)
+            self.invalidate_caches()
+        return result
+
+    def __str__(self):
+        return str(self.pk)
+
+    class Meta:
+        indexes = [
+            # Listados por rango de fechas y tipo (gastos, reportes diarios y mensuales)
+            models.Index(fields=['transaction_date', 'type']),
+            # Filtros por caja, usuario o tipo de gasto dentro de un rango de fechas
+            models.Index(fields=['cash', 'transaction_date', 'type']),
+            models.Index(fields=['user', 'transaction_date']),
+            models.Index(fields=['type_expense', 'transaction_date']),
+        ]
+
+
+class CashDailyBalance(models.Model):
+    """
+    Libro diario por caja: totales del día por tipo y saldo acumulado al cierre, mantenido en
+    cada escritura de CashFlow. Los días sin movimientos no tienen fila: el saldo en una fecha es
+    el de la última fila en o antes de esa fecha. Los movimientos sin fecha no se consideran.
+    El saldo acumulado solo suma entradas y resta salidas: la apertura (A) y el cierre (C) son
+    el conteo declarado del efectivo que ya está en la caja, no dinero nuevo, y se comparan con
+    el cuadre del día en get_closing_difference.
+    """
+    cash = models.ForeignKey(Cash, on_delete=models.CASCADE, related_name='daily_balances', verbose_name='Caja')
+    date = models.DateField('Fecha')
+    opening_amount = models.DecimalField('Apertura', max_digits=30, decimal_places=15, default=0)
+    income_amount = models.DecimalField('Entradas', max_digits=30, decimal_places=15, default=0)
+    expense_amount = models.DecimalField('Salidas', max_digits=30, decimal_places=15, default=0)
+    closing_amount = models.DecimalField('Cierre declarado', max_digits=30, decimal_places=15, default=0)
+    has_closing = models.BooleanField('Tiene cierre', default=False)
+    movement_count = models.PositiveIntegerField('Movimientos', default=0)
+    closing_balance = models.DecimalField('Saldo al cierre', max_digits=30, decimal_places=15, default=0)
+
+    def get_expected_closing(self):
+        """Cuadre del día: apertura + entradas - salidas"""
+        return self.opening_amount + self.income_amount - self.expense_amount
+
+    def get_closing_difference(self):
+        """Diferencia entre el cierre declarado y el cuadre del día (None si no hubo cierre)"""
+        if not self.has_closing:
+            return None
+        return self.closing_amount - self.get_expected_closing()
+
+    @classmethod
+    def rebuild(cls, cash_id, since_date=None):
+        """Recalcula el libro diario de una caja desde `since_date` (o desde el inicio) con una consulta agrupada"""
+        if not cash_id:
+            return
+        cashflows = CashFlow.objects.filter(cash_id=cash_id, transaction_date__isnull=False)
+        daily_balances = cls.objects.filter(cash_id=cash_id)
+        balance = Decimal('0')
+        if since_date:
+            cashflows = cashflows.filter(transaction_date__gte=since_date)
+            daily_balances = daily_balances.filter(date__gte=since_date)
+            previous_balance = cls.objects.filter(cash_id=cash_id, date__lt=since_date).order_by(
+                '-date'
+            ).values_list('closing_balance', flat=True).first()
+            balance = previous_balance if previous_balance is not None else Decimal('0')
+
+        days = cashflows.order_by().values('transaction_date').annotate(
+            opening=models.Sum('total', filter=models.Q(type='A')),
+            income=models.Sum('total', filter=models.Q(type='E')),
+            expense=models.Sum('total', filter=models.Q(type__in=CashFlow.EXPENSE_TYPES)),
+            closing=models.Sum('total', filter=models.Q(type='C')),
+            closing_count=models.Count('id', filter=models.Q(type='C')),
+            count=models.Count('id'),
+        ).order_by('transaction_date')
+
+        rows = []
+        for day in days:
+            row = cls(
+                cash_id=cash_id,
+                date=day['transaction_date'],
+                opening_amount=day['opening'] or Decimal('0'),
+                income_amount=day['income'] or Decimal('0'),
+                expense_amount=day['expense'] or Decimal('0'),
+                closing_amount=day['closing'] or Decimal('0'),
+                has_closing=day['closing_count'] > 0,
+                movement_count=day['count'],
+            )
+            # Las aperturas no se acumulan: repiten el saldo con que cerró la caja
+            balance += row.income_amount - row.expense_amount
+            row.closing_balance = balance
+            rows.append(row)
+
+        daily_balances.delete()
+        cls.objects.bulk_create(rows, batch_size=500)
+
+    @classmethod
+    def get_balance_at(cls, cash_id, balance_date=None):
+        """Saldo acumulado de una caja al cierre de `balance_date` (el último si no se indica)"""
+        daily_balances = cls.objects.filter(cash_id=cash_id)
+        if balance_date:
+            daily_balances = daily_balances.filter(date__lte=balance_date)
+        balance = daily_balances.order_by('-date').values_list('closing_balance', flat=True).first()
+        return balance if balance is not None else Decimal('0')
+
+    @classmethod
+    def closing_balance_subquery(cls, balance_date=None, cash_ref='pk'):
+        """Subconsulta para anotar un queryset de Cash con su saldo al cierre de `balance_date`"""
+        daily_balances = cls.objects.filter(cash_id=models.OuterRef(cash_ref))
+        if balance_date:
+            daily_balances = daily_balances.filter(date__lte=balance_date)
+        return models.Subquery(
+            daily_balances.order_by('-date').values('closing_balance')[:1],
+            output_field=models.DecimalField(max_digits=30, decimal_places=15)
+        )
+
+    @classmethod
+    def get_net_between(cls, cash_id, start_date, end_date):
+        """Entradas menos salidas de una caja en un rango de fechas, con dos búsquedas por índice"""
+        return cls.get_balance_at(cash_id, end_date) - cls.get_balance_at(cash_id, start_date - timedelta(days=1))
+
     def __str__(self):
-        return str(self.pk)
\ No newline at end of file
+        return f'{self.cash} - {self.date}: {self.closing_balance}'
+
+    class Meta:
+        verbose_name = 'Saldo diario de caja'
+        verbose_name_plural = 'Saldos diarios de caja'
+        ordering = ['cash', 'date']
+        unique_together = ('cash', 'date')
+
+
+class CashFlowMonthlyCube(models.Model):
+    """
+    Cubo mensual de movimientos: total y cantidad por (mes, caja, dimensión, código), con la sucursal
+    de la caja. Se recalcula para el mes y la caja afectados en cada escritura de CashFlow, y
+    completo cada noche con el comando rebuild_cashflow_cube (p. ej. si una caja cambia de sucursal).
+    Las dimensiones son las de los resúmenes de cashflow_summary: tipo de transacción, tipo de gasto
+    (salidas y aperturas) y forma de pago (entradas y aperturas).
+    """
+    DIMENSION_CHOICES = (('T', 'Tipo de transacción'), ('G', 'Tipo de gasto'), ('P', 'Forma de pago'))
+    month = models.DateField('Mes')
+    cash = models.ForeignKey(Cash, on_delete=models.CASCADE, null=True, blank=True, related_name='monthly_cubes',
+                             verbose_name='Caja')
+    subsidiary = models.ForeignKey('hrm.Subsidiary', on_delete=models.SET_NULL, null=True, blank=True,
+                                   verbose_name='Sucursal')
+    dimension = models.CharField('Dimensión', max_length=1, choices=DIMENSION_CHOICES)
+    key = models.CharField('Código', max_length=1)
+    total = models.DecimalField('Total', max_digits=30, decimal_places=15, default=0)
+    movement_count = models.PositiveIntegerField('Movimientos', default=0)
+
+    # Movimientos que cuentan en cada dimensión, igual que en cashflow_summary
+    DIMENSION_FIELDS = (
+        ('T', 'type', None),
+        ('G', 'type_expense', ('S', 'A')),
+        ('P', 'way_to_pay', CashFlow.INCOME_TYPES),
+    )
+
+    @staticmethod
+    def month_of(value):
+        return value.replace(day=1)
+
+    @classmethod
+    def rebuild(cls, cash_id, month=None):
+        """
+        Recalcula el cubo de una caja (None: movimientos sin caja) para un mes o para todos,
+        con una consulta agrupada por mes, tipo, tipo de gasto y forma de pago
+        """
+        cashflows = CashFlow.objects.filter(cash_id=cash_id, transaction_date__isnull=False)
+        cubes = cls.objects.filter(cash_id=cash_id)
+        if month:
+            month = cls.month_of(month)
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            cashflows = cashflows.filter(transaction_date__gte=month, transaction_date__lt=next_month)
+            cubes = cubes.filter(month=month)
+
+        groups = cashflows.order_by().annotate(month=TruncMonth('transaction_date')).values(
+            'month', 'type', 'type_expense', 'way_to_pay'
+        ).annotate(total=models.Sum('total'), count=models.Count('id'))
+
+        cells = {}
+        for group in groups:
+            for dimension, field, types in cls.DIMENSION_FIELDS:
+                if types is None or group['type'] in types:
+                    cell = cells.setdefault((group['month'], dimension, group[field]), [Decimal('0'), 0])
+                    cell[0] += group['total'] or Decimal('0')
+                    cell[1] += group['count']
+
+        subsidiary_id = Cash.objects.filter(id=cash_id).values_list('subsidiary_id', flat=True).first() \
+            if cash_id else None
+        cubes.delete()
+        cls.objects.bulk_create([
+            cls(month=cube_month, cash_id=cash_id, subsidiary_id=subsidiary_id, dimension=dimension, key=key,
+                total=total, movement_count=count)
+            for (cube_month, dimension, key), (total, count) in cells.items()
+        ], batch_size=500)
+
+    def __str__(self):
+        return f'{self.month:%Y-%m} {self.cash} {self.get_dimension_display()} {self.key}: {self.total}'
+
+    class Meta:
+        verbose_name = 'Cubo mensual de movimientos'
+        verbose_name_plural = 'Cubos mensuales de movimientos'
+        unique_together = ('month', 'cash', 'dimension', 'key')
+        indexes = [
+            models.Index(fields=['month', 'subsidiary']),
+        ]
+
+
+class ReportJob(models.Model):
+    """
+    Cola de exportaciones en segundo plano, procesada por el comando run_report_jobs.
+    Solo puede haber un trabajo pendiente o en proceso por llave (tipo + parámetros):
+    las solicitudes iguales mientras tanto reciben el mismo trabajo.
+    """
+    STATUS_CHOICES = (('P', 'PENDIENTE'), ('R', 'EN PROCESO'), ('D', 'TERMINADO'), ('F', 'FALLIDO'))
+    ACTIVE_STATUSES = ('P', 'R')
+    REPORT_TYPE_CHOICES = (
+        ('sales_excel', 'Ventas y gastos (Excel)'),
+        ('sales_by_user_excel', 'Ventas y gastos por usuario (Excel)'),
+        ('enrollments_excel', 'Matrículas (Excel)'),
+        ('students_excel', 'Alumnos (Excel)'),
+        ('pending_payments_excel', 'Pagos pendientes (Excel)'),
+        ('sales_pdf', 'Ventas y gastos (PDF)'),
+        ('sales_by_user_pdf', 'Ventas y gastos por usuario (PDF)'),
+    )
+    report_type = models.CharField('Tipo de reporte', max_length=30, choices=REPORT_TYPE_CHOICES)
+    params = models.TextField('Parámetros (JSON)', default='{}')
+    key = models.CharField('Llave', max_length=64, db_index=True)
+    status = models.CharField('Estado', max_length=1, choices=STATUS_CHOICES, default='P')
+    file_url = models.CharField('Archivo', max_length=255, null=True, blank=True)
+    filename = models.CharField('Nombre de archivo', max_length=150, null=True, blank=True)
+    message = models.TextField('Mensaje', null=True, blank=True)
+    user = models.ForeignKey('users.CustomUser', verbose_name='Usuario', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField('Creado', auto_now_add=True)
+    started_at = models.DateTimeField('Iniciado', null=True, blank=True)
+    finished_at = models.DateTimeField('Terminado', null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.get_report_type_display()} #{self.pk}: {self.get_status_display()}'
+
+    class Meta:
+        verbose_name = 'Reporte en segundo plano'
+        verbose_name_plural = 'Reportes en segundo plano'
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=models.Q(status__in=('P', 'R')),
+                                    name='unique_active_report_job'),
+        ]
+
+
+class InvoiceOutbox(models.Model):
+    """
+    Comprobantes electrónicos por enviar al proveedor FACT, procesados por el comando
+    run_invoice_outbox. La venta registra la fila en su misma transacción; la llave de
+    idempotencia (tipo de documento + orden) impide emitir dos comprobantes para la misma venta.
+    """
+    STATUS_CHOICES = (('P', 'PENDIENTE'), ('R', 'ENVIANDO'), ('D', 'ACEPTADO'), ('F', 'FALLIDO'))
+    DOCUMENT_TYPE_CHOICES = (('1', 'FACTURA'), ('2', 'BOLETA'))
+    PRODUCT_TYPE_CHOICES = (('bien', 'BIEN'), ('servicio', 'SERVICIO'))
+    # La orden vive en la app de ventas: se guarda su id
+    order_id = models.IntegerField('Orden', db_index=True)
+    document_type = models.CharField('Tipo de comprobante', max_length=1, choices=DOCUMENT_TYPE_CHOICES)
+    product_type = models.CharField('Tipo de producto', max_length=10, choices=PRODUCT_TYPE_CHOICES, default='bien')
+    key = models.CharField('Llave de idempotencia', max_length=64, unique=True)
+    status = models.CharField('Estado', max_length=1, choices=STATUS_CHOICES, default='P')
+    # Serie y número fijados antes del primer envío: los reintentos repiten el mismo comprobante
+    serial = models.CharField('Serie', max_length=5, null=True, blank=True)
+    correlative = models.IntegerField('Número', null=True, blank=True)
+    # El comprobante falló sin llegar a registrarse y su número queda para el siguiente de la serie
+    released = models.BooleanField('Número liberado', default=False)
+    operation_id = models.CharField('Operación del proveedor', max_length=50, null=True, blank=True)
+    attempts = models.PositiveIntegerField('Intentos', default=0)
+    next_attempt_at = models.DateTimeField('Próximo intento', default=timezone.now)
+    message = models.TextField('Mensaje', null=True, blank=True)
+    created_at = models.DateTimeField('Creado', auto_now_add=True)
+    started_at = models.DateTimeField('Iniciado', null=True, blank=True)
+    finished_at = models.DateTimeField('Terminado', null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.get_document_type_display()} orden {self.order_id}: {self.get_status_display()}'
+
+    class Meta:
+        verbose_name = 'Comprobante por enviar'
+        verbose_name_plural = 'Comprobantes por enviar'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+
+class InvoiceSequence(models.Model):
+    """
+    Último correlativo emitido por serie y tipo de comprobante.
+    Cada reserva incrementa la fila dentro de una transacción: el UPDATE bloquea la fila hasta el
+    commit, así dos ventas simultáneas nunca reciben el mismo número y el costo no crece con la
+    cantidad de comprobantes emitidos.
+    """
+    DOCUMENT_TYPE_CHOICES = (('1', 'FACTURA'), ('2', 'BOLETA'), ('3', 'NOTA DE CRÉDITO'))
+    serial = models.CharField('Serie', max_length=5)
+    document_type = models.CharField('Tipo de comprobante', max_length=1, choices=DOCUMENT_TYPE_CHOICES)
+    last_number = models.PositiveIntegerField('Último número', default=0)
+
+    def __str__(self):
+        return f'{self.get_document_type_display()} {self.serial}: {self.last_number}'
+
+    @classmethod
+    def allocate(cls, serial, document_type, count=1, initial=None):
+        """
+        Reserva count números consecutivos y devuelve el primero.
+        initial() da el último número ya emitido cuando la serie aún no tiene fila (solo la primera vez).
+        """
+        sequence = cls.objects.filter(serial=serial, document_type=document_type)
+        with transaction.atomic():
+            if not sequence.update(last_number=models.F('last_number') + count):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(serial=serial, document_type=document_type,
+                                           last_number=initial() if initial else 0)
+                except IntegrityError:
+                    # Otra reserva creó la fila al mismo tiempo
+                    pass
+                sequence.update(last_number=models.F('last_number') + count)
+            last_number = sequence.values_list('last_number', flat=True).get()
+        return last_number - count + 1
+
+    @classmethod
+    def release(cls, serial, document_type, first, count):
+        """Devuelve los números sin usar del final de un bloque, si nadie reservó después"""
+        return bool(cls.objects.filter(
+            serial=serial, document_type=document_type, last_number=first + count - 1
+        ).update(last_number=first - 1))
+
+    class Meta:
+        verbose_name = 'Correlativo de comprobantes'
+        verbose_name_plural = 'Correlativos de comprobantes'
+        unique_together = ('serial', 'document_type')
@@ -0,0 +1,101 @@
+"""
+Motor de exportación a PDF en memoria (reportlab platypus).
+El documento se arma en un BytesIO y se entrega directamente como descarga; solo se escribe en
+MEDIA_ROOT/reports cuando se pide la URL del archivo. Las celdas de texto son cadenas simples,
+que la tabla dibuja sin calcular ajustes de línea, y solo se usa Paragraph cuando el texto no
+cabe en el ancho de la columna. Las tablas largas se arman en bloques de filas: reportlab vuelve a
+medir todas las filas restantes de una tabla cada vez que la parte en una página nueva.
+"""
+import io
+import os
+from http import HTTPStatus
+from xml.sax.saxutils import escape
+
+from django.http import FileResponse, JsonResponse
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Table
+
+from farm import settings
+
+# Relleno horizontal por defecto de las celdas de Table (6 puntos a cada lado)
+CELL_PADDING = 12
+# Filas por bloque de las tablas largas (algo más de una página)
+TABLE_CHUNK_ROWS = 50
+
+
+def paragraph_cell(text, style, width=None):
+    """Celda con ajuste de línea; el texto se escapa porque Paragraph interpreta marcado XML"""
+    return Paragraph(escape(text), style)
+
+
+def text_cell(text, style, width):
+    """Texto de celda: cadena simple si cabe en una línea del ancho de la columna, si no Paragraph"""
+    if '\n' in text or stringWidth(text, style.fontName, style.fontSize) > width - CELL_PADDING:
+        return paragraph_cell(text, style)
+    return text
+
+
+def chunked_table(data, style_commands, chunk_rows=TABLE_CHUNK_ROWS, **kwargs):
+    """
+    Tabla larga como una lista de tablas consecutivas de chunk_rows filas, que se ven como una sola.
+    Los comandos de estilo usan las filas de la tabla completa (se admiten índices negativos) y se
+    trasladan a cada bloque.
+    """
+    total = len(data)
+    tables = []
+    for offset in range(0, total, chunk_rows):
+        rows = data[offset:offset + chunk_rows]
+        last = offset + len(rows) - 1
+        commands = []
+        for name, (first_col, first_row), (last_col, last_row), *args in style_commands:
+            first_row, last_row = max(first_row % total, offset), min(last_row % total, last)
+            if first_row <= last_row:
+                commands.append((name, (first_col, first_row - offset), (last_col, last_row - offset), *args))
+        tables.append(Table(rows, style=commands, **kwargs))
+    return tables
+
+
+class PdfReport:
+    """Documento PDF: se agregan flowables y se renderiza una sola vez en memoria"""
+
+    def __init__(self, pagesize=letter, margin=inch):
+        self.pagesize = pagesize
+        self.margin = margin
+        self.story = []
+
+    def append(self, *flowables):
+        self.story.extend(flowables)
+
+    def render(self):
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=self.pagesize,
+                                leftMargin=self.margin, rightMargin=self.margin,
+                                topMargin=self.margin, bottomMargin=self.margin)
+        doc.build(self.story)
+        buffer.seek(0)
+        return buffer
+
+    def save(self, filename):
+        """Escribe el PDF en MEDIA_ROOT/reports y devuelve su URL"""
+        filepath = os.path.join(settings.MEDIA_ROOT, 'reports', filename)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'wb') as pdf:
+            pdf.write(self.render().getbuffer())
+        return f"{settings.MEDIA_URL}reports/{filename}"
+
+    def stream(self, filename):
+        """Descarga directa desde memoria, sin archivos en disco"""
+        return FileResponse(self.render(), as_attachment=True, filename=filename)
+
+    def response(self, request, filename, message='Reporte PDF generado exitosamente'):
+        """Respuesta de las vistas de exportación: descarga directa si se pide 'download', si no la URL del archivo"""
+        if request.POST.get('download') in ('1', 'true'):
+            return self.stream(filename)
+        return JsonResponse({
+            'success': True,
+            'message': message,
+            'file_url': self.save(filename),
+            'filename': filename
+        }, status=HTTPStatus.OK)
@@ -0,0 +1,193 @@
+"""
+Caché de archivos de reportes direccionada por contenido.
+La llave de cada archivo es el tipo de reporte + sus parámetros + el sello de versión de los
+datos que usa (movimientos de caja del día y sus órdenes, ver get_sales_report_version): mientras
+esos datos no cambien se entrega el archivo ya generado, y un día cerrado no se vuelve a generar.
+El sello es el mismo que usa la caché de datos de sales_report, así al generar un archivo nuevo
+la vista nunca lee datos en caché de un sello anterior. Los archivos viven en MEDIA_ROOT/reports/cache/<llave>/ y el comando
+cleanup_report_artifacts los elimina por antigüedad y tamaño total.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from datetime import datetime
+from functools import wraps
+from http import HTTPStatus
+
+from django.http import FileResponse, JsonResponse
+
+from farm import settings
+from .sales_report import get_sales_report_version
+
+# Tipo de reporte -> parámetros POST que lo definen
+REPORT_PARAMS = {
+    'sales_excel': ('report_date', 'subsidiary', 'cash_account'),
+    'sales_by_user_excel': ('report_date', 'user'),
+    'enrollments_excel': ('report_month', 'subsidiary'),
+    'students_excel': ('subsidiary',),
+    'pending_payments_excel': ('subsidiary',),
+    'sales_pdf': ('report_date', 'subsidiary', 'cash_account'),
+    'sales_by_user_pdf': ('report_date', 'user'),
+}
+# Reportes que se guardan en caché -> parámetro con el día de datos de ventas que leen
+REPORT_DATA_DATES = {
+    'sales_excel': 'report_date',
+    'sales_by_user_excel': 'report_date',
+    'sales_pdf': 'report_date',
+    'sales_by_user_pdf': 'report_date',
+}
+
+REPORT_CACHE_DIR = os.path.join('reports', 'cache')
+
+ReportArtifact = namedtuple('ReportArtifact', 'path url filename')
+
+
+def get_report_params(report_type, data):
+    """Parámetros del reporte tomados de data; los vacíos se omiten para que la llave sea estable"""
+    if report_type not in REPORT_PARAMS:
+        raise ValueError(f'Tipo de reporte inválido: {report_type}')
+    return {name: str(data.get(name)) for name in REPORT_PARAMS[report_type] if data.get(name) not in (None, '')}
+
+
+def get_report_data_version(report_type, params):
+    """Sello de los datos que lee el reporte, o None si el reporte no se guarda en caché"""
+    date_param = REPORT_DATA_DATES.get(report_type)
+    if not date_param or not params.get(date_param):
+        return None
+    try:
+        report_date = datetime.strptime(params[date_param], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+    return get_sales_report_version(report_date)
+
+
+def get_report_artifact_key(report_type, params):
+    version = get_report_data_version(report_type, params)
+    if version is None:
+        return None
+    payload = json.dumps([report_type, params, version], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _artifact_dir(key):
+    return os.path.join(settings.MEDIA_ROOT, REPORT_CACHE_DIR, key)
+
+
+def _artifact(key, filename):
+    return ReportArtifact(
+        os.path.join(_artifact_dir(key), filename), f"{settings.MEDIA_URL}reports/cache/{key}/{filename}", filename
+    )
+
+
+def find_report_artifact(key):
+    """Archivo ya generado para la llave; se actualiza su fecha de acceso para la limpieza"""
+    directory = _artifact_dir(key)
+    try:
+        filenames = [name for name in os.listdir(directory) if not name.startswith('.')]
+    except FileNotFoundError:
+        return None
+    if not filenames:
+        return None
+    os.utime(directory)
+    return _artifact(key, filenames[0])
+
+
+def save_report_response(response, directory):
+    """
+    Guarda en directory el archivo de la respuesta de una vista de exportación y devuelve su nombre.
+    Las descargas directas (FileResponse) se copian por bloques; las respuestas JSON apuntan a
+    un archivo escrito en reports/, que se mueve.
+    """
+    os.makedirs(directory, exist_ok=True)
+    if isinstance(response, FileResponse):
+        filename = response.filename
+        # Se escribe en un temporal del mismo directorio y se renombra: nunca se ve un archivo a medias
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.')
+        try:
+            with os.fdopen(fd, 'wb') as artifact:
+                for chunk in response.streaming_content:
+                    artifact.write(chunk)
+            os.replace(tmp_path, os.path.join(directory, filename))
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        finally:
+            response.close()
+        return filename
+
+    result = json.loads(response.content)
+    if not result.get('success'):
+        raise RuntimeError(result.get('message') or f'Respuesta {response.status_code}')
+    filename = result['filename']
+    shutil.move(os.path.join(settings.MEDIA_ROOT, 'reports', filename), os.path.join(directory, filename))
+    return filename
+
+
+def store_report_artifact(key, response):
+    filename = save_report_response(response, _artifact_dir(key))
+    return _artifact(key, filename)
+
+
+def report_artifact_response(request, artifact, message='Reporte exportado exitosamente'):
+    """Misma respuesta que las vistas de exportación, servida desde el archivo en caché"""
+    if request.POST.get('download') in ('1', 'true'):
+        response = FileResponse(open(artifact.path, 'rb'), as_attachment=True, filename=artifact.filename)
+        # Los trabajos en segundo plano registran la URL del archivo en caché en lugar de copiarlo
+        response.report_artifact = artifact
+        return response
+    return JsonResponse({
+        'success': True,
+        'message': message,
+        'file_url': artifact.url,
+        'filename': artifact.filename
+    }, status=HTTPStatus.OK)
+
+
+def cached_report(report_type):
+    """
+    Decorador de vistas de exportación: si ya existe el archivo para los mismos parámetros y
+    datos se entrega sin generarlo; si no, la vista lo genera una vez en la caché.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'POST':
+                return view(request, *args, **kwargs)
+            key = get_report_artifact_key(report_type, get_report_params(report_type, request.POST))
+            if key is None:
+                return view(request, *args, **kwargs)
+
+            artifact = find_report_artifact(key)
+            if artifact is None:
+                # La vista entrega el archivo directamente, sin escribirlo en reports/
+                post = request.POST
+                request.POST = post.copy()
+                request.POST['download'] = '1'
+                try:
+                    response = view(request, *args, **kwargs)
+                finally:
+                    request.POST = post
+                if response.status_code != HTTPStatus.OK:
+                    return response
+                try:
+                    artifact = store_report_artifact(key, response)
+                except RuntimeError:
+                    return response
+            return report_artifact_response(request, artifact)
+        return wrapper
+    return decorator
+
+
+def iter_report_artifacts():
+    """(directorio, último acceso, tamaño en bytes) de cada archivo en caché"""
+    root = os.path.join(settings.MEDIA_ROOT, REPORT_CACHE_DIR)
+    if not os.path.isdir(root):
+        return
+    for entry in os.scandir(root):
+        if not entry.is_dir():
+            continue
+        size = sum(item.stat().st_size for item in os.scandir(entry.path) if item.is_file())
+        yield entry.path, entry.stat().st_mtime, size
@@ -0,0 +1,155 @@
+"""
+Exportaciones en segundo plano: las vistas encolan un ReportJob y responden de inmediato;
+el comando run_report_jobs los toma de la base de datos y los ejecuta en un pool de procesos.
+Cada trabajo llama a la vista de exportación existente con una petición armada a partir de
+sus parámetros; el archivo queda en la caché de report_artifacts o, para los reportes que no
+se guardan en caché, en MEDIA_ROOT/reports/jobs/<id>/.
+"""
+import hashlib
+import json
+import os
+from datetime import timedelta
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import IntegrityError, transaction
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from farm import settings
+from .models import ReportJob
+from .report_artifacts import get_report_params, get_report_artifact_key, find_report_artifact, \
+    save_report_response
+
+# Tipo de reporte -> vista de exportación (parámetros en report_artifacts.REPORT_PARAMS)
+REPORT_JOB_VIEWS = {
+    'sales_excel': 'apps.accounting.views_excel.export_sales_report_excel',
+    'sales_by_user_excel': 'apps.accounting.views_excel.export_subscriptions_report_excel',
+    'enrollments_excel': 'apps.accounting.views_excel.export_enrollments_report_excel',
+    'students_excel': 'apps.accounting.views_excel.export_students_report_excel',
+    'pending_payments_excel': 'apps.accounting.views_excel.export_pending_payments_report_excel',
+    'sales_pdf': 'apps.accounting.views_pdf.export_sales_report_pdf',
+    'sales_by_user_pdf': 'apps.accounting.views_pdf.export_sales_report_by_user_pdf',
+}
+
+# Un trabajo en proceso por más tiempo se considera abandonado (worker detenido) y vuelve a la cola
+REPORT_JOB_TIMEOUT = timedelta(minutes=30)
+
+
+def get_report_job_key(report_type, params):
+    payload = json.dumps([report_type, params], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def enqueue_report_job(report_type, data, user=None):
+    """
+    Encola una exportación y devuelve (trabajo, creado).
+    Si ya hay un trabajo pendiente o en proceso con el mismo tipo y parámetros se devuelve ese;
+    si el archivo ya está en caché para los datos actuales el trabajo se crea terminado.
+    """
+    params = get_report_params(report_type, data)
+    key = get_report_job_key(report_type, params)
+    active_jobs = ReportJob.objects.filter(key=key, status__in=ReportJob.ACTIVE_STATUSES)
+    job = active_jobs.first()
+    if job is not None:
+        return job, False
+
+    artifact_key = get_report_artifact_key(report_type, params)
+    artifact = find_report_artifact(artifact_key) if artifact_key else None
+    if artifact is not None:
+        now = timezone.now()
+        job = ReportJob.objects.create(
+            report_type=report_type, params=json.dumps(params, sort_keys=True), key=key, status='D',
+            message='Reporte generado exitosamente', file_url=artifact.url, filename=artifact.filename,
+            user=user if user is not None and user.is_authenticated else None, started_at=now, finished_at=now
+        )
+        return job, True
+    try:
+        with transaction.atomic():
+            job = ReportJob.objects.create(
+                report_type=report_type, params=json.dumps(params, sort_keys=True), key=key,
+                user=user if user is not None and user.is_authenticated else None
+            )
+        return job, True
+    except IntegrityError:
+        # Otra solicitud igual lo creó al mismo tiempo (restricción unique_active_report_job)
+        return active_jobs.get(), False
+
+
+def requeue_stale_report_jobs():
+    """Devuelve a la cola los trabajos en proceso que superaron REPORT_JOB_TIMEOUT"""
+    return ReportJob.objects.filter(
+        status='R', started_at__lt=timezone.now() - REPORT_JOB_TIMEOUT
+    ).update(status='P', started_at=None)
+
+
+def claim_report_jobs(limit):
+    """
+    Toma hasta limit trabajos pendientes, en orden de llegada, y los marca en proceso.
+    El cambio de estado es condicional, así dos workers nunca toman el mismo trabajo.
+    """
+    claimed = []
+    pending = ReportJob.objects.filter(status='P').order_by('id').values_list('id', flat=True)[:limit]
+    for job_id in pending:
+        if ReportJob.objects.filter(id=job_id, status='P').update(status='R', started_at=timezone.now()):
+            claimed.append(job_id)
+    return claimed
+
+
+def finish_report_job(job_id, status, message=None, file_url=None, filename=None):
+    ReportJob.objects.filter(id=job_id).update(
+        status=status, message=message, file_url=file_url, filename=filename, finished_at=timezone.now()
+    )
+
+
+def _job_request(job):
+    request = HttpRequest()
+    request.method = 'POST'
+    request.POST = QueryDict(mutable=True)
+    request.POST.update(json.loads(job.params))
+    # Las exportaciones devuelven el archivo directamente en lugar de escribirlo en reports/
+    request.POST['download'] = '1'
+    request.user = job.user or AnonymousUser()
+    return request
+
+
+def _save_job_response(job, response):
+    """Registra el archivo en caché o guarda el generado en MEDIA_ROOT/reports/jobs/<id>/; devuelve (url, nombre)"""
+    artifact = getattr(response, 'report_artifact', None)
+    if artifact is not None:
+        response.close()
+        return artifact.url, artifact.filename
+    filename = save_report_response(response, os.path.join(settings.MEDIA_ROOT, 'reports', 'jobs', str(job.id)))
+    return f"{settings.MEDIA_URL}reports/jobs/{job.id}/{filename}", filename
+
+
+def run_report_job(job_id):
+    """Ejecuta un trabajo ya tomado (en un proceso del pool, ver report_worker)"""
+    job = ReportJob.objects.select_related('user').get(id=job_id)
+    try:
+        view = import_string(REPORT_JOB_VIEWS[job.report_type])
+        file_url, filename = _save_job_response(job, view(_job_request(job)))
+    except RuntimeError as e:
+        # La vista respondió con error: se guarda su mensaje
+        finish_report_job(job_id, 'F', message=str(e))
+        return 'F'
+    except Exception as e:
+        finish_report_job(job_id, 'F', message=f'Error al generar el reporte: {str(e)}')
+        return 'F'
+    finish_report_job(job_id, 'D', message='Reporte generado exitosamente', file_url=file_url, filename=filename)
+    return 'D'
+
+
+def report_job_dict(job):
+    return {
+        'id': job.id,
+        'report_type': job.report_type,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'message': job.message,
+        'file_url': job.file_url,
+        'filename': job.filename,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
@@ -0,0 +1,15 @@
+"""
+Funciones que ejecutan los procesos del pool de run_report_jobs.
+Los procesos se crean con spawn y cargan este módulo antes de configurar Django,
+por eso no importa modelos al cargarse.
+"""
+import django
+
+
+def init_report_worker():
+    django.setup()
+
+
+def run_report_job(job_id):
+    from .report_jobs import run_report_job
+    return run_report_job(job_id)
@@ -0,0 +1,244 @@
+"""
+Datos del reporte diario de ventas y gastos, compartidos por los reportes en Excel y PDF.
+Los movimientos del día se leen en una sola consulta (más el prefetch de detalles de orden),
+se agrupan en memoria y el resultado se guarda en caché como tuplas inmutables, sin instancias
+de modelos, por (fecha, sucursal, caja, usuario) y sello de los datos del día. La caché de
+archivos de report_artifacts usa el mismo sello, así un archivo nunca se genera con datos de
+una versión anterior a la de su llave.
+"""
+import hashlib
+import json
+from collections import namedtuple
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import CashFlow
+
+# Estados de orden que se consideran ventas
+SALE_ORDER_STATUSES = ('P', 'C')
+SALES_REPORT_CACHE_TIMEOUT = 60 * 5
+
+PAYMENT_TYPES = {'E': 'EFECTIVO', 'Y': 'YAPE', 'D': 'DEPÓSITO'}
+EXPENSE_TYPES = {'V': 'VARIABLE', 'F': 'FIJO', 'P': 'PERSONAL', 'O': 'OTRO'}
+
+# Grupos de ingresos del día, en el orden en que se muestran
+ADVANCE = 'advance'  # Orden del día con solo adelantos
+FULL_PAYMENT = 'full_payment'  # Orden del día pagada en el día (adelantos y pagos totales)
+CANCELLATION = 'cancellation'  # Pago total del usuario sobre una orden registrada por otro usuario
+INCOME_KINDS = (ADVANCE, FULL_PAYMENT, CANCELLATION)
+
+Payment = namedtuple('Payment', 'user_name way_to_pay payment_type total')
+OrderIncome = namedtuple('OrderIncome', 'kind order_id number client products order_total balance payments total')
+PreviousPayment = namedtuple(
+    'PreviousPayment',
+    'number register_date description order_user_name products user_name way_to_pay payment_type total'
+)
+Expense = namedtuple('Expense', 'description expense_type user_name total')
+SalesReportTotals = namedtuple('SalesReportTotals', [
+    'opening', 'income', 'income_cash', 'income_yape', 'income_deposit',
+    'previous_payments', 'previous_cash', 'previous_yape', 'previous_deposit',
+    'expenses', 'cash', 'yape', 'deposit', 'general', 'final',
+])
+
+
+class SalesReport(namedtuple('SalesReport', 'report_date subsidiary_id cash_id user_id income previous_payments expenses totals')):
+    __slots__ = ()
+
+    def income_of(self, kind):
+        return tuple(item for item in self.income if item.kind == kind)
+
+
+def get_order_products(order):
+    """Descripción de los productos de una orden (usa los detalles precargados)"""
+    details = list(order.orderdetail_set.all())
+    if not details:
+        return None
+    return " | ".join([detail.product_name or "Producto Manual" for detail in details])
+
+
+def _user_name(user):
+    return user.first_name or user.username or '-'
+
+
+def _order_number(order):
+    return f"{order.subsidiary.serial}-{order.correlative:03d}"
+
+
+def _payment(cashflow):
+    return Payment(
+        _user_name(cashflow.user), cashflow.way_to_pay, PAYMENT_TYPES.get(cashflow.way_to_pay, ""), Decimal(cashflow.total)
+    )
+
+
+def _order_income(kind, order, cashflows):
+    payments = tuple(_payment(cashflow) for cashflow in cashflows)
+    total = sum((payment.total for payment in payments), Decimal('0'))
+    return OrderIncome(
+        kind=kind,
+        order_id=order.id,
+        number=_order_number(order),
+        client=order.client.full_name if order.client else '-',
+        products=get_order_products(order) or order.observation or "ORDEN DE SERVICIO",
+        order_total=Decimal(order.total),
+        balance=Decimal(order.total) - total if kind == ADVANCE else Decimal('0'),
+        payments=payments,
+        total=total,
+    )
+
+
+def _previous_payment(cashflow):
+    order = cashflow.order
+    payment = _payment(cashflow)
+    return PreviousPayment(
+        number=_order_number(order),
+        register_date=order.register_date,
+        description=cashflow.description or "PAGO TOTAL",
+        order_user_name=_user_name(order.user),
+        products=get_order_products(order),
+        user_name=payment.user_name,
+        way_to_pay=payment.way_to_pay,
+        payment_type=payment.payment_type,
+        total=payment.total,
+    )
+
+
+def _totals_by_way(payments):
+    totals = {code: Decimal('0') for code in PAYMENT_TYPES}
+    for payment in payments:
+        if payment.way_to_pay in totals:
+            totals[payment.way_to_pay] += payment.total
+    return totals
+
+
+def _normalize_id(value):
+    return int(value) if value and str(value) != '0' else None
+
+
+def fetch_report_cashflows(report_date, subsidiary_id=None, cash_id=None, user_id=None):
+    """Movimientos del día con todo lo que necesita el reporte, en una sola consulta"""
+    cashflows = CashFlow.objects.filter(transaction_date=report_date)
+    if subsidiary_id:
+        cashflows = cashflows.filter(cash__subsidiary_id=subsidiary_id)
+    if cash_id:
+        cashflows = cashflows.filter(cash_id=cash_id)
+    if user_id:
+        cashflows = cashflows.filter(user_id=user_id)
+    return list(cashflows.select_related(
+        'cash', 'user', 'cash__subsidiary', 'order', 'order__client', 'order__subsidiary', 'order__user'
+    ).prefetch_related('order__orderdetail_set').order_by('order_id', 'id'))
+
+
+def group_sales_cashflows(cashflows, report_date, subsidiary_id=None, cash_id=None, user_id=None):
+    """
+    Agrupa los movimientos del día (ordenados por orden e id) sin consultar la base de datos:
+    - income: órdenes del día con adelantos, pagos totales y, por usuario, cancelaciones
+    - previous_payments: pagos totales del día de órdenes de fechas anteriores
+    - expenses: salidas sin orden
+    """
+    orders = {}
+    previous_payments = []
+    expenses = []
+    opening = Decimal('0')
+
+    for cashflow in cashflows:
+        if cashflow.type == 'A':
+            opening += Decimal(cashflow.total)
+        if cashflow.order_id is None:
+            if cashflow.type == 'S':
+                expenses.append(Expense(
+                    cashflow.description or '-', EXPENSE_TYPES.get(cashflow.type_expense, ""),
+                    _user_name(cashflow.user), Decimal(cashflow.total)
+                ))
+            continue
+        if cashflow.type != 'E':
+            continue
+
+        order = cashflow.order
+        if cashflow.order_type_entry == 'T' and order.register_date < report_date:
+            previous_payments.append(_previous_payment(cashflow))
+        elif order.register_date == report_date and order.status in SALE_ORDER_STATUSES and \
+                (not subsidiary_id or order.subsidiary_id == subsidiary_id):
+            group = orders.setdefault(order.id, {'order': order, 'A': [], 'T': []})
+            if cashflow.order_type_entry in ('A', 'T'):
+                group[cashflow.order_type_entry].append(cashflow)
+
+    income = []
+    for order_id in sorted(orders):
+        group = orders[order_id]
+        order = group['order']
+        if group['T']:
+            if user_id and order.user_id != user_id:
+                income.extend(_order_income(CANCELLATION, order, [cashflow]) for cashflow in group['T'])
+            else:
+                income.append(_order_income(FULL_PAYMENT, order, group['A'] + group['T']))
+        elif group['A']:
+            income.append(_order_income(ADVANCE, order, group['A']))
+    income.sort(key=lambda item: INCOME_KINDS.index(item.kind))
+
+    income_by_way = _totals_by_way(payment for item in income for payment in item.payments)
+    previous_by_way = _totals_by_way(previous_payments)
+    total_expenses = sum((expense.total for expense in expenses), Decimal('0'))
+    cash, yape, deposit = (income_by_way[code] + previous_by_way[code] for code in ('E', 'Y', 'D'))
+    general = cash + yape + deposit + opening
+    totals = SalesReportTotals(
+        opening=opening,
+        income=sum((item.total for item in income), Decimal('0')),
+        income_cash=income_by_way['E'],
+        income_yape=income_by_way['Y'],
+        income_deposit=income_by_way['D'],
+        previous_payments=sum((payment.total for payment in previous_payments), Decimal('0')),
+        previous_cash=previous_by_way['E'],
+        previous_yape=previous_by_way['Y'],
+        previous_deposit=previous_by_way['D'],
+        expenses=total_expenses,
+        cash=cash,
+        yape=yape,
+        deposit=deposit,
+        general=general,
+        final=general - total_expenses,
+    )
+    return SalesReport(
+        report_date, subsidiary_id, cash_id, user_id,
+        tuple(income), tuple(previous_payments), tuple(expenses), totals
+    )
+
+
+def get_sales_report_version(report_date):
+    """
+    Sello de los datos que lee el reporte del día: movimientos de caja (cantidad, último id y
+    última modificación) y las órdenes y detalles a los que apuntan, cuyo estado, total o
+    productos pueden cambiar sin tocar los movimientos
+    """
+    from ..sales.models import Order, OrderDetail
+
+    row = CashFlow.objects.filter(transaction_date=report_date).aggregate(
+        count=Count('id'), last_id=Max('id'), last_update=Max('updated_at')
+    )
+    orders = Order.objects.filter(cashflow__transaction_date=report_date).distinct().order_by('id').values_list(
+        'id', 'status', 'total', 'register_date', 'subsidiary_id', 'client_id', 'user_id', 'observation'
+    )
+    details = OrderDetail.objects.filter(
+        order__cashflow__transaction_date=report_date
+    ).distinct().order_by('id').values_list('id', 'order_id', 'product_name')
+    payload = json.dumps([list(orders), list(details)], default=str)
+    last_update = row['last_update'].isoformat() if row['last_update'] else ''
+    return f"{row['count']}:{row['last_id'] or 0}:{last_update}:{hashlib.sha1(payload.encode()).hexdigest()}"
+
+
+def build_sales_report(report_date, subsidiary_id=None, cash_id=None, user_id=None):
+    """
+    Datos del reporte diario por (fecha, sucursal, caja, usuario); '0' o vacío no filtra.
+    Se guardan en caché con el sello de los datos del día, así el Excel y el PDF del mismo
+    día consultan la base de datos una sola vez.
+    """
+    subsidiary_id, cash_id, user_id = _normalize_id(subsidiary_id), _normalize_id(cash_id), _normalize_id(user_id)
+    version = get_sales_report_version(report_date)
+    key = f"sales_report:{version}:{report_date.isoformat()}:{subsidiary_id}:{cash_id}:{user_id}"
+    report = cache.get(key)
+    if report is None:
+        cashflows = fetch_report_cashflows(report_date, subsidiary_id, cash_id, user_id)
+        report = group_sales_cashflows(cashflows, report_date, subsidiary_id, cash_id, user_id)
+        cache.set(key, report, SALES_REPORT_CACHE_TIMEOUT)
+    return report
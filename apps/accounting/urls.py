@@ -15,6 +15,7 @@ urlpatterns = [
     
     # URLs para gestión de gastos (cashflow)
     path('cashflow/', login_required(cashflow_list), name='cashflow_list'),
+    path('cashflow/grid/', login_required(cashflow_grid), name='cashflow_grid'),
     path('cashflow/create/', login_required(cashflow_create), name='cashflow_create'),
     path('cashflow/save/', login_required(cashflow_save), name='cashflow_save'),
     path('cashflow/get/', login_required(cashflow_get), name='cashflow_get'),
@@ -22,6 +23,13 @@ urlpatterns = [
     path('cashflow/update/', login_required(cashflow_update), name='cashflow_update'),
     path('cashflow/delete/', login_required(cashflow_delete), name='cashflow_delete'),
     
+    # URLs para reportes en segundo plano
+    path('reports/jobs/create/', login_required(report_job_create), name='report_job_create'),
+    path('reports/jobs/<int:job_id>/', login_required(report_job_status), name='report_job_status'),
+
+    # URLs para la bandeja de comprobantes electrónicos
+    path('invoices/outbox/<int:order_id>/', login_required(invoice_outbox_status), name='invoice_outbox_status'),
+
     # URLs auxiliares
     path('get-cash-accounts/', login_required(get_cash_accounts_by_subsidiary), name='get_cash_accounts_by_subsidiary'),
 
@@ -38,6 +38,11 @@ from django.db.models import F
 
 from ..users.models import CustomUser
 from ..hrm.models import Subsidiary
+from .cashflow_summary import get_monthly_summary, get_monthly_summary_by_subsidiary
+from .cashflow_grid import get_cashflow_filters, filter_cashflows, get_cashflow_grid_page, get_cashflow_totals, \
+    parse_cashflow_cursor, CASHFLOW_GRID_PAGE_SIZE, CASHFLOW_GRID_MAX_PAGE_SIZE
+from .report_jobs import enqueue_report_job, report_job_dict
+from .invoice_outbox import invoice_outbox_dict
 
 
 # =============================================================================
@@ -422,12 +427,12 @@ def cashflow_list(request):
         # Filtrar cajas según permisos del usuario
         if is_admin:
             # Usuario admin puede ver todas las cajas
-            cash_accounts = Cash.objects.all().order_by('subsidiary_id')
+            cash_accounts = Cash.objects.select_related('subsidiary').order_by('subsidiary_id')
             # Buscar la primera cuenta de tipo 'E' de cualquier sucursal
             first_cash_account = Cash.objects.filter(account_type='E').first()
         else:
             # Usuario normal solo ve cajas de su sucursal
-            cash_accounts = Cash.objects.filter(subsidiary=user_subsidiary)
+            cash_accounts = Cash.objects.filter(subsidiary=user_subsidiary).select_related('subsidiary')
             # Buscar la primera cuenta de tipo 'E' de la sucursal del usuario
             if user_subsidiary:
                 first_cash_account = Cash.objects.filter(
@@ -456,42 +461,9 @@ def cashflow_list(request):
         })
     elif request.method == 'POST':
         try:
-            # Filtrar gastos según parámetros
-            cash_id = request.POST.get('cash_account')
-            start_date = request.POST.get('start_date')
-            end_date = request.POST.get('end_date')
-            expense_type = request.POST.get('expense_type')
-            
-            cashflows = CashFlow.objects.filter(type__in=['S', 'A'])
-        
-            # Verificar permisos del usuario
-            is_admin = hasattr(request.user, 'has_access_to_all') and request.user.has_access_to_all
-            
-            # Si no es admin, solo mostrar sus propios gastos
-            if not is_admin:
-                cashflows = cashflows.filter(user=request.user)
-        
-            if cash_id and cash_id != '0':
-                cashflows = cashflows.filter(cash_id=cash_id)
-            
-            # Filtro por tipo de gasto (solo para admins)
-            if is_admin and expense_type and expense_type != '0':
-                cashflows = cashflows.filter(type_expense=expense_type)
-
-            # Filtro por rango de fechas
-            # Por defecto, si no se especifica, usar la fecha de hoy
-            if not start_date and not end_date:
-                # Si no se proporcionan fechas, usar la fecha de hoy
-                peru_tz = pytz.timezone("America/Lima")
-                today = datetime.now(peru_tz).date()
-                cashflows = cashflows.filter(transaction_date=today)
-            else:
-                # Si se proporciona fecha de inicio, filtrar desde esa fecha
-                if start_date:
-                    cashflows = cashflows.filter(transaction_date__gte=start_date)
-                # Si se proporciona fecha de fin, filtrar hasta esa fecha
-                if end_date:
-                    cashflows = cashflows.filter(transaction_date__lte=end_date)
+            # Filtrar gastos según parámetros y permisos del usuario
+            filters = get_cashflow_filters(request.POST, request.user)
+            cashflows = filter_cashflows(filters)
 
             # Ordenar: aperturas primero, luego por id
             cashflows = cashflows.select_related('cash', 'user', 'cash__subsidiary').order_by(
@@ -499,29 +471,16 @@ def cashflow_list(request):
                 'id'
             )
 
-            # Calcular totales
-            # Entradas: tipo 'E' (Entrada) + tipo 'A' (Apertura)
-            total_income = cashflows.filter(type__in=['E', 'A']).aggregate(total=Sum('total'))['total'] or 0
-            # Salidas: tipo 'S' (Salida)
-            total_expenses = cashflows.filter(type='S').aggregate(total=Sum('total'))['total'] or 0
-            # Balance: Entradas - Salidas
-            net_balance = total_income - total_expenses
-
-            # Totales por tipo de gasto
-            expense_totals = {}
-            for expense_code, expense_name in CashFlow.TYPE_EXPENSE:
-                total = cashflows.filter(type__in=['S', 'A'], type_expense=expense_code).aggregate(
-                    total=Sum('total')
-                )['total'] or 0
-                expense_totals[expense_code] = total
+            # Totales (entradas, salidas, balance y por tipo de gasto) en una sola consulta y en caché
+            summary = get_cashflow_totals(filters)
 
             tpl = loader.get_template('accounting/cashflow_list_grid.html')
             context = {
                 'cashflows': cashflows,
-                'total_income': total_income,
-                'total_expenses': total_expenses,
-                'net_balance': net_balance,
-                'expense_totals': expense_totals,
+                'total_income': summary['total_income'],
+                'total_expenses': summary['total_expenses'],
+                'net_balance': summary['net_balance'],
+                'expense_totals': summary['expense_totals'],
                 # 'date_now': date_now,
             }
 
@@ -536,10 +495,44 @@ def cashflow_list(request):
             }, status=HTTPStatus.INTERNAL_SERVER_ERROR)
 
 
+def cashflow_grid(request):
+    """Página de la grilla de gastos en JSON (filas + totales), paginada por cursor y en caché"""
+    if request.method == 'GET':
+        try:
+            cursor = request.GET.get('cursor', '')
+            if cursor:
+                parse_cashflow_cursor(cursor)
+            limit = min(int(request.GET.get('limit', CASHFLOW_GRID_PAGE_SIZE)), CASHFLOW_GRID_MAX_PAGE_SIZE)
+            if limit < 1:
+                raise ValueError(limit)
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Parámetros de paginación inválidos'
+            }, status=HTTPStatus.BAD_REQUEST)
+
+        try:
+            filters = get_cashflow_filters(request.GET, request.user)
+            page = get_cashflow_grid_page(filters, cursor or None, limit)
+            return JsonResponse(dict(page, success=True), status=HTTPStatus.OK)
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Filtros inválidos'
+            }, status=HTTPStatus.BAD_REQUEST)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Error al cargar los gastos: {str(e)}'
+            }, status=HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    return JsonResponse({'message': 'Error de petición.'}, status=HTTPStatus.BAD_REQUEST)
+
+
 def cashflow_create(request):
     """Vista para crear nuevo gasto"""
     if request.method == 'GET':
-        cash_accounts = Cash.objects.all()
+        cash_accounts = Cash.objects.select_related('subsidiary')
         document_types = CashFlow.DOCUMENT_TYPE_ATTACHED_CHOICES
         transaction_types = [('A', 'Apertura'), ('C', 'Cierre'), ('E', 'Entrada'), ('S', 'Salida')]  # Apertura, cierre, entrada y salida
         expense_types = CashFlow.TYPE_EXPENSE
@@ -647,7 +640,7 @@ def cashflow_edit(request, cashflow_id):
     """Vista para editar gasto existente"""
     try:
         cashflow_obj = CashFlow.objects.select_related('cash', 'user', 'cash__subsidiary').get(id=cashflow_id)
-        cash_accounts = Cash.objects.all()
+        cash_accounts = Cash.objects.select_related('subsidiary')
         document_types = CashFlow.DOCUMENT_TYPE_ATTACHED_CHOICES
         transaction_types = [('A', 'Apertura'), ('C', 'Cierre'), ('E', 'Entrada'), ('S', 'Salida')]  # Apertura, cierre, entrada y salida
         expense_types = CashFlow.TYPE_EXPENSE
@@ -770,7 +763,10 @@ def get_cash_accounts_by_subsidiary(request):
         subsidiary_id = request.GET.get('subsidiary', '')
         if subsidiary_id:
             try:
-                cash_accounts = Cash.objects.filter(subsidiary_id=int(subsidiary_id)).order_by('name')
+                # Saldo actual desde el libro diario, en la misma consulta
+                cash_accounts = Cash.objects.filter(subsidiary_id=int(subsidiary_id)).annotate(
+                    balance=CashDailyBalance.closing_balance_subquery()
+                ).order_by('name')
                 accounts_list = []
                 
                 for account in cash_accounts:
@@ -779,7 +775,7 @@ def get_cash_accounts_by_subsidiary(request):
                         'name': account.name,
                         'currency': account.get_currency_type_display(),
                         'account_type': account.account_type,
-                        # 'balance': float(account.initial)
+                        'balance': float(account.balance or 0),
                     })
                 
                 return JsonResponse({
@@ -872,12 +868,10 @@ def monthly_report(request):
             # Filtrar datos por sucursal si se especifica
             subsidiary_obj = None
             enrollments_filter = {}
-            cashflows_filter = {}
             
             if subsidiary_id and subsidiary_id != '0':
                 subsidiary_obj = Subsidiary.objects.get(id=int(subsidiary_id))
                 enrollments_filter = {'subsidiary_id': subsidiary_id}
-                cashflows_filter = {'cash__subsidiary_id': subsidiary_id}
             
             # 1. INSCRIPCIONES DEL MES
             enrollments_month = Enrollment.objects.filter(
@@ -945,25 +939,12 @@ def monthly_report(request):
                 total=Sum('remaining')
             )['total'] or Decimal('0')
             
-            # 11. INGRESOS GENERALES DEL MES (CashFlow tipo 'E')
-            monthly_income = CashFlow.objects.filter(
-                transaction_date__gte=start_date,
-                transaction_date__lt=end_date,
-                type='E',
-                **cashflows_filter
-            ).select_related('cash', 'cash__subsidiary')
-            
-            monthly_income_total = monthly_income.aggregate(Sum('total'))['total__sum'] or Decimal('0')
-            
-            # 12. GASTOS DEL MES
-            monthly_expenses = CashFlow.objects.filter(
-                transaction_date__gte=start_date,
-                transaction_date__lt=end_date,
-                type='S',
-                **cashflows_filter
-            ).select_related('cash', 'cash__subsidiary')
-            
-            monthly_expenses_total = monthly_expenses.aggregate(Sum('total'))['total__sum'] or Decimal('0')
+            # 11. INGRESOS GENERALES (CashFlow tipo 'E') Y 12. GASTOS DEL MES (tipo 'S')
+            # Leídos del cubo mensual (pocas filas por mes) en lugar de agrupar los movimientos
+            monthly_summary = get_monthly_summary(start_date, subsidiary_obj and subsidiary_obj.id)
+            monthly_income_total = monthly_summary['type_totals']['E']
+            monthly_expenses_total = monthly_summary['type_totals']['S']
+            monthly_by_subsidiary = get_monthly_summary_by_subsidiary(start_date, subsidiary_obj and subsidiary_obj.id)
             
             # 13. INSCRIPCIONES POR DÍA DEL MES
             daily_enrollments = enrollments_month.extra(
@@ -1029,16 +1010,14 @@ def monthly_report(request):
                     }
                     for item in daily_enrollments
                 ],
-                'income_by_subsidiary': list(
-                    monthly_income.values('cash__subsidiary__name')
-                    .annotate(total=Sum('total'))
-                    .order_by('-total')
-                ),
-                'expenses_by_subsidiary': list(
-                    monthly_expenses.values('cash__subsidiary__name')
-                    .annotate(total=Sum('total'))
-                    .order_by('-total')
-                ),
+                'income_by_subsidiary': sorted([
+                    {'cash__subsidiary__name': item['key'], 'total': item['type_totals']['E']}
+                    for item in monthly_by_subsidiary if item['type_totals']['E']
+                ], key=lambda item: -item['total']),
+                'expenses_by_subsidiary': sorted([
+                    {'cash__subsidiary__name': item['key'], 'total': item['type_totals']['S']}
+                    for item in monthly_by_subsidiary if item['type_totals']['S']
+                ], key=lambda item: -item['total']),
             }
             
             return JsonResponse({
@@ -1064,5 +1043,64 @@ def monthly_report(request):
             }, status=HTTPStatus.INTERNAL_SERVER_ERROR)
 
 
+# =============================================================================
+# VISTAS PARA REPORTES EN SEGUNDO PLANO
+# =============================================================================
+
+def report_job_create(request):
+    """Encola una exportación; las solicitudes iguales en curso comparten el mismo trabajo"""
+    if request.method == 'POST':
+        try:
+            job, created = enqueue_report_job(request.POST.get('report_type', ''), request.POST, request.user)
+            return JsonResponse({
+                'success': True,
+                'message': 'Reporte en cola' if created else 'El reporte ya se está generando',
+                'created': created,
+                'job': report_job_dict(job)
+            }, status=HTTPStatus.ACCEPTED)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'message': str(e)
+            }, status=HTTPStatus.BAD_REQUEST)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Error al encolar el reporte: {str(e)}'
+            }, status=HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    return JsonResponse({'message': 'Error de petición.'}, status=HTTPStatus.BAD_REQUEST)
+
+
+def report_job_status(request, job_id):
+    """Estado de un reporte en segundo plano; al terminar incluye la URL del archivo"""
+    if request.method == 'GET':
+        try:
+            job = ReportJob.objects.get(id=job_id)
+            return JsonResponse({
+                'success': True,
+                'job': report_job_dict(job)
+            }, status=HTTPStatus.OK)
+        except ReportJob.DoesNotExist:
+            return JsonResponse({
+                'success': False,
+                'message': 'Reporte no encontrado'
+            }, status=HTTPStatus.NOT_FOUND)
+
+    return JsonResponse({'message': 'Error de petición.'}, status=HTTPStatus.BAD_REQUEST)
 
 
+# =============================================================================
+# VISTAS PARA LA BANDEJA DE COMPROBANTES ELECTRÓNICOS
+# =============================================================================
+
+def invoice_outbox_status(request, order_id):
+    """Estado del envío de los comprobantes de una orden"""
+    if request.method == 'GET':
+        entries = InvoiceOutbox.objects.filter(order_id=order_id).order_by('id')
+        return JsonResponse({
+            'success': True,
+            'invoices': [invoice_outbox_dict(entry) for entry in entries]
+        }, status=HTTPStatus.OK)
+
+    return JsonResponse({'message': 'Error de petición.'}, status=HTTPStatus.BAD_REQUEST)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Product, ServiceType, Plot, CropType, Crop, CropCycleCost, InventoryTransaction
+from .models import Product, ServiceType, Plot, CropType, Crop, CropCycleCost, InventoryTransaction, \
+    ProductStockSnapshot, ProductDailyStock, CostCategoryRule, CropCostRollup
 
 
 @admin.register(Product)
@@ -48,6 +49,10 @@ class ProductAdmin(admin.ModelAdmin):
                 ('Commercial Information', {
                     'fields': ('unit', 'unit_price')
                 }),
+                ('Unit Conversion', {
+                    'fields': ('density', 'pack_size', 'pack_unit'),
+                    'description': 'Used to convert applications in KG, G, bags, sacks or containers to liters'
+                }),
                 ('Dates', {
                     'fields': ('created_at',),
                     'classes': ('collapse',)
@@ -66,6 +71,10 @@ class ProductAdmin(admin.ModelAdmin):
                 ('Commercial Information', {
                     'fields': ('unit', 'unit_price')
                 }),
+                ('Unit Conversion', {
+                    'fields': ('density', 'pack_size', 'pack_unit'),
+                    'description': 'Only for products: used to convert applications in KG, G, bags, sacks or containers to liters'
+                }),
                 ('Dates', {
                     'fields': ('created_at',),
                     'classes': ('collapse',)
@@ -151,15 +160,15 @@ class CropAdmin(admin.ModelAdmin):
 
 @admin.register(CropCycleCost)
 class CropCycleCostAdmin(admin.ModelAdmin):
-    list_display = ('product', 'crop', 'application_date', 'quantity', 'unit', 'application_cost', 'total_cost', 'responsible', 'created_at')
-    list_filter = ('application_date', 'product__product_type', 'crop__plot', 'responsible')
+    list_display = ('product', 'crop', 'application_date', 'quantity', 'unit', 'application_cost', 'total_cost', 'category', 'responsible', 'created_at')
+    list_filter = ('application_date', 'product__product_type', 'category', 'crop__plot', 'responsible')
     search_fields = ('product__name', 'crop__crop_name', 'crop__crop_type', 'crop__plot__name',
                     'application_method', 'observations')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('category', 'created_at', 'updated_at')
     date_hierarchy = 'application_date'
     fieldsets = (
         ('Basic Information', {
-            'fields': ('crop', 'product', 'application_date', 'responsible')
+            'fields': ('crop', 'product', 'category', 'application_date', 'responsible')
         }),
         ('Application', {
             'fields': ('quantity', 'unit', 'dosage', 'application_method')
@@ -177,12 +186,28 @@ class CropCycleCostAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(CostCategoryRule)
+class CostCategoryRuleAdmin(admin.ModelAdmin):
+    list_display = ('priority', 'keyword', 'service_type', 'category', 'active')
+    list_display_links = ('keyword',)
+    list_editable = ('priority', 'category', 'active')
+    list_filter = ('category', 'service_type', 'active')
+    search_fields = ('keyword',)
+    fieldsets = (
+        ('Rule', {
+            'fields': ('keyword', 'service_type', 'category', 'priority', 'active'),
+            'description': 'Only services are classified by rules. After changing rules run '
+                           '"manage.py reclassify_crop_costs" to update existing costs.'
+        }),
+    )
+
+
 @admin.register(InventoryTransaction)
 class InventoryTransactionAdmin(admin.ModelAdmin):
     list_display = ('product', 'entry_date', 'entry_quantity', 'exit_date', 'crop', 'exit_quantity', 'balance', 'created_at')
     list_filter = ('product', 'entry_date', 'exit_date', 'crop', 'created_at')
     search_fields = ('product__name', 'crop__crop_name', 'crop__crop_type', 'observations')
-    readonly_fields = ('balance', 'created_at', 'updated_at')
+    readonly_fields = ('balance', 'crop_cycle_cost', 'created_at', 'updated_at')
     date_hierarchy = 'created_at'
     fieldsets = (
         ('Product Information', {
@@ -193,7 +218,7 @@ class InventoryTransactionAdmin(admin.ModelAdmin):
             'fields': ('entry_date', 'entry_quantity')
         }),
         ('Exit Information', {
-            'fields': ('exit_date', 'crop', 'exit_quantity')
+            'fields': ('exit_date', 'crop', 'exit_quantity', 'crop_cycle_cost')
         }),
         ('Balance', {
             'fields': ('balance',)
@@ -218,3 +243,28 @@ class InventoryTransactionAdmin(admin.ModelAdmin):
                 product_category__isnull=False
             )
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+@admin.register(ProductStockSnapshot)
+class ProductStockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('product', 'balance', 'last_movement_date', 'transaction_count', 'updated_at')
+    search_fields = ('product__name',)
+    readonly_fields = ('product', 'balance', 'last_transaction', 'last_movement_date', 'transaction_count', 'updated_at')
+
+
+@admin.register(ProductDailyStock)
+class ProductDailyStockAdmin(admin.ModelAdmin):
+    list_display = ('product', 'date', 'entry_quantity', 'exit_quantity', 'closing_balance')
+    list_filter = ('product', 'date')
+    search_fields = ('product__name',)
+    readonly_fields = ('product', 'date', 'entry_quantity', 'exit_quantity', 'closing_balance')
+    date_hierarchy = 'date'
+
+
+@admin.register(CropCostRollup)
+class CropCostRollupAdmin(admin.ModelAdmin):
+    list_display = ('crop', 'category', 'month', 'total_cost', 'cost_count', 'updated_at')
+    list_filter = ('category', 'month', 'crop__plot')
+    search_fields = ('crop__crop_name', 'crop__crop_type', 'crop__plot__name')
+    readonly_fields = ('crop', 'category', 'month', 'total_cost', 'cost_count', 'updated_at')
+    date_hierarchy = 'month'
@@ -0,0 +1,252 @@
+import csv
+import io
+import os
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from apps.users.models import CustomUser
+from .models import Product, Crop, CropCycleCost, CostCategoryRule, CropCostRollup, InventoryTransaction, \
+    UNIT_CHOICES
+from .units import to_inventory_quantity
+
+# Header names accepted in the first row of the file (case insensitive, any order)
+COLUMNS = ('crop_id', 'product', 'application_date', 'quantity', 'unit', 'application_method', 'dosage',
+           'responsible', 'weather_conditions', 'observations', 'application_cost', 'total_cost')
+REQUIRED_COLUMNS = ('product', 'application_date', 'quantity', 'unit')
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y')
+BATCH_SIZE = 500
+
+
+def read_rows(file, filename):
+    """Yield (row_number, {column: value}) from an xlsx or csv file without loading it whole"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.xlsx':
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+    elif extension == '.csv':
+        rows = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    else:
+        raise ValueError('Formato no soportado, use .xlsx o .csv')
+
+    header = None
+    for row_number, values in enumerate(rows, start=1):
+        if header is None:
+            header = [str(value or '').strip().lower() for value in values]
+            missing = [column for column in REQUIRED_COLUMNS if column not in header]
+            if missing:
+                raise ValueError(f'Faltan columnas requeridas: {", ".join(missing)}')
+            continue
+        if not any(value not in (None, '') for value in values):
+            continue
+        yield row_number, {column: value for column, value in zip(header, values) if column in COLUMNS}
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _decimal(value, places, label):
+    try:
+        return Decimal(str(value).strip().replace(',', '.')).quantize(Decimal(1).scaleb(-places))
+    except InvalidOperation:
+        raise ValueError(f'{label} inválido: {value}')
+
+
+def _date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), date_format).date()
+        except ValueError:
+            pass
+    raise ValueError(f'Fecha de aplicación inválida: {value}')
+
+
+class CropCostImporter:
+    """
+    Validate crop cycle cost rows in a single streaming pass and insert them in bulk together
+    with the inventory exits they generate. Each affected product is rebalanced once.
+    """
+
+    def __init__(self, crop_id=None, responsible=None):
+        self.default_crop_id = crop_id
+        self.default_responsible = responsible
+        self.crops = {crop.id: crop for crop in Crop.objects.filter(active=True)}
+        self.products_by_id = {}
+        self.products_by_name = {}
+        for product in Product.objects.filter(active=True):
+            self.products_by_id[product.id] = product
+            self.products_by_name.setdefault(product.name.strip().upper(), []).append(product)
+        self.users = None
+        self.units = {value for value, label in UNIT_CHOICES}
+        self.rules = CostCategoryRule.get_rules()
+        self.costs = []
+        self.exits = []
+        self.skipped_exits = 0
+        self.errors = []
+
+    def get_product(self, value):
+        value = _text(value)
+        if value is None:
+            raise ValueError('Producto es requerido')
+        if value.isdigit() and int(value) in self.products_by_id:
+            return self.products_by_id[int(value)]
+        products = self.products_by_name.get(value.upper(), [])
+        if len(products) != 1:
+            raise ValueError(f'Producto "{value}" no encontrado' if not products else f'Producto "{value}" ambiguo')
+        return products[0]
+
+    def get_responsible_id(self, value):
+        value = _text(value)
+        if value is None:
+            return self.default_responsible.id if self.default_responsible else None
+        if self.users is None:
+            self.users = dict(CustomUser.objects.filter(is_active=True).values_list('username', 'id'))
+        if value not in self.users:
+            raise ValueError(f'Responsable "{value}" no encontrado')
+        return self.users[value]
+
+    def add_row(self, row_number, row):
+        errors = []
+
+        def check(parse, *args):
+            try:
+                return parse(*args)
+            except ValueError as e:
+                errors.append(str(e))
+            return None
+
+        crop_id = _text(row.get('crop_id')) or self.default_crop_id
+        crop = None
+        try:
+            crop = self.crops.get(int(Decimal(str(crop_id)))) if crop_id else None
+        except (InvalidOperation, ValueError):
+            pass
+        if crop is None:
+            errors.append('Cultivo no encontrado' if crop_id else 'Cultivo es requerido')
+
+        product = check(self.get_product, row.get('product'))
+        application_date = None
+        if row.get('application_date') in (None, ''):
+            errors.append('Fecha de aplicación es requerida')
+        else:
+            application_date = check(_date, row.get('application_date'))
+
+        quantity = None
+        if row.get('quantity') in (None, ''):
+            errors.append('Cantidad es requerida')
+        else:
+            quantity = check(_decimal, row.get('quantity'), 4, 'Cantidad')
+            if quantity is not None and quantity <= 0:
+                errors.append('La cantidad debe ser mayor a cero')
+
+        unit = (_text(row.get('unit')) or '').upper()
+        if unit not in self.units:
+            errors.append(f'Unidad inválida: {unit}' if unit else 'Unidad es requerida')
+
+        application_cost = total_cost = None
+        if row.get('application_cost') not in (None, ''):
+            application_cost = check(_decimal, row.get('application_cost'), 2, 'Costo de aplicación')
+            if application_cost is not None and application_cost < 0:
+                errors.append('El costo de aplicación no puede ser negativo')
+        if row.get('total_cost') not in (None, ''):
+            total_cost = check(_decimal, row.get('total_cost'), 2, 'Costo total')
+            if total_cost is not None and total_cost < 0:
+                errors.append('El costo total no puede ser negativo')
+
+        responsible_id = check(self.get_responsible_id, row.get('responsible'))
+
+        if errors:
+            self.errors.append({'row': row_number, 'errors': errors})
+            return
+
+        cost = CropCycleCost(
+            crop=crop,
+            product=product,
+            application_date=application_date,
+            quantity=quantity,
+            unit=unit,
+            application_method=_text(row.get('application_method')),
+            dosage=_text(row.get('dosage')),
+            responsible_id=responsible_id,
+            weather_conditions=_text(row.get('weather_conditions')),
+            observations=_text(row.get('observations')),
+            application_cost=application_cost,
+            total_cost=total_cost,
+            category=CostCategoryRule.resolve(product, self.rules),
+        )
+        self.costs.append(cost)
+
+        # Same rule as create_crop_cycle_cost: inventory products generate an exit in liters
+        if product.product_type == Product.PRODUCT and product.has_inventory():
+            exit_quantity = to_inventory_quantity(product, unit, quantity)
+            if exit_quantity is not None and exit_quantity > 0:
+                self.exits.append((cost, InventoryTransaction(
+                    product=product,
+                    exit_date=application_date,
+                    exit_quantity=exit_quantity.quantize(Decimal('0.01')),
+                    crop=crop,
+                    observations=cost.get_inventory_observations(),
+                )))
+            else:
+                self.skipped_exits += 1
+
+    def save(self):
+        exits_by_product = OrderedDict()
+        for cost, inventory_transaction in self.exits:
+            exits_by_product.setdefault(inventory_transaction.product_id, []).append(inventory_transaction)
+
+        with transaction.atomic():
+            CropCycleCost.objects.bulk_create(self.costs, batch_size=BATCH_SIZE)
+            # Link each exit to its cost (primary keys are returned by bulk_create on PostgreSQL)
+            for cost, inventory_transaction in self.exits:
+                inventory_transaction.crop_cycle_cost = cost
+
+            InventoryTransaction.lock_products(*exits_by_product)
+            # New exits are appended at the end of each kardex, after everything already committed
+            started = timezone.now()
+            for product_id, transactions in exits_by_product.items():
+                balance = InventoryTransaction.get_balance_before(product_id, started, 0)
+                for inventory_transaction in transactions:
+                    balance += inventory_transaction.get_movement()
+                    inventory_transaction.balance = balance
+            InventoryTransaction.objects.bulk_create([t for cost, t in self.exits], batch_size=BATCH_SIZE)
+            for product_id, transactions in sorted(exits_by_product.items()):
+                InventoryTransaction.rebalance_product(product_id, started, count_delta=len(transactions))
+
+            # bulk_create skips CropCycleCost.save(), so the rollups of the imported crops are rebuilt here
+            CropCostRollup.rebuild(sorted(set(cost.crop_id for cost in self.costs)))
+
+    def get_report(self, dry_run):
+        return {
+            'success': not self.errors,
+            'dry_run': dry_run,
+            'costs': len(self.costs),
+            'inventory_exits': len(self.exits),
+            'skipped_inventory_exits': self.skipped_exits,
+            'errors': self.errors,
+        }
+
+
+def import_crop_cycle_costs(file, filename, crop_id=None, responsible=None, dry_run=False):
+    """
+    Import crop cycle costs from an xlsx/csv file. Nothing is written when any row has errors
+    or in dry-run mode; the report lists the errors per row either way.
+    """
+    importer = CropCostImporter(crop_id, responsible)
+    for row_number, row in read_rows(file, filename):
+        importer.add_row(row_number, row)
+    if not dry_run and not importer.errors and importer.costs:
+        importer.save()
+    return importer.get_report(dry_run)
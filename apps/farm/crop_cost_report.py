@@ -0,0 +1,106 @@
+from decimal import Decimal
+
+from .models import Product, CropCycleCost
+
+# Order in which categories are shown in the summary; FERTILIZANTES has its own table
+CATEGORY_ORDER = ['JORNALES', 'AGROQUIMICOS', 'ALQUILER', 'TRACTOR', 'ELECTROSTATICA', 'COSECHA', 'OTROS']
+
+
+def is_fertilizer(product):
+    return product.product_type == Product.PRODUCT and product.product_category == Product.FERTILIZER
+
+
+def is_agrochemical_or_service(product):
+    return (product.product_type == Product.PRODUCT and product.product_category == Product.AGROCHEMICAL) or \
+        product.product_type == Product.SERVICE
+
+
+def build_crop_cost_report(crop_id):
+    """
+    Build every dataset of the crop cycle cost page from a single query over the costs of a crop:
+    the agrochemicals/services grid, the fertilizer pivot (products x dates), totals by date,
+    totals by category and the accumulated totals.
+    """
+    zero = Decimal('0.00')
+    all_costs = list(
+        CropCycleCost.objects.filter(crop_id=crop_id).select_related(
+            'product', 'product__service_type'
+        ).order_by('-application_date', 'id')
+    )
+
+    cost_set = []
+    cost_set_agrochemicals_services = []
+    cost_set_fertilizers = []
+    total_all = zero
+    total_accumulated = zero
+    total_accumulated_agrochemicals_services = zero
+    total_accumulated_fertilizers = zero
+    category_totals = {category: zero for category in CATEGORY_ORDER if category != 'OTROS'}
+
+    fertilizer_products = {}
+    fertilizer_date_totals = {}
+
+    for cost in all_costs:
+        product = cost.product
+        total_cost = cost.total_cost or zero
+        total_all += total_cost
+
+        if is_fertilizer(product):
+            cost_set_fertilizers.append(cost)
+            total_accumulated_fertilizers += total_cost
+            fertilizer_date_totals[cost.application_date] = \
+                fertilizer_date_totals.get(cost.application_date, zero) + total_cost
+            product_data = fertilizer_products.get(product.id)
+            if product_data is None:
+                product_data = fertilizer_products[product.id] = {
+                    'id': product.id,
+                    'name': product.name,
+                    'unit': cost.unit,
+                    'quantities': {},
+                    'total_quantity': zero,
+                }
+            # Costs come newest first, so the unit kept is the one of the first application
+            product_data['unit'] = cost.unit
+            product_data['quantities'][cost.application_date] = \
+                product_data['quantities'].get(cost.application_date, zero) + cost.quantity
+            product_data['total_quantity'] += cost.quantity
+            continue
+
+        # Everything that is not a fertilizer belongs to the main cost grid and its summary
+        cost_set.append(cost)
+        total_accumulated += total_cost
+        if is_agrochemical_or_service(product):
+            cost_set_agrochemicals_services.append(cost)
+            total_accumulated_agrochemicals_services += total_cost
+        if cost.total_cost:
+            category = cost.get_category()
+            category_totals[category] = category_totals.get(category, zero) + cost.total_cost
+
+    # Fertilizer pivot: one row per product (by name) and one column per application date
+    fertilizer_dates = sorted(fertilizer_date_totals)
+    fertilizer_table_data = sorted(fertilizer_products.values(), key=lambda x: x['name'])
+    for product_data in fertilizer_table_data:
+        quantities = product_data.pop('quantities')
+        product_data['quantities_list'] = [quantities.get(date) for date in fertilizer_dates]
+    cost_set_fertilizers.sort(key=lambda c: (c.application_date, c.product.name))
+
+    category_list = [(category, category_totals[category]) for category in CATEGORY_ORDER
+                     if category_totals.get(category, zero) > 0]
+    category_list += [(category, amount) for category, amount in category_totals.items()
+                      if category not in CATEGORY_ORDER and amount > 0]
+
+    return {
+        'all_costs': all_costs,
+        'total_all': total_all,
+        'cost_set': cost_set,
+        'cost_set_agrochemicals_services': cost_set_agrochemicals_services,
+        'cost_set_fertilizers': cost_set_fertilizers,
+        'total_accumulated': total_accumulated,
+        'total_accumulated_agrochemicals_services': total_accumulated_agrochemicals_services,
+        'total_accumulated_fertilizers': total_accumulated_fertilizers,
+        'fertilizer_table_data': fertilizer_table_data,
+        'fertilizer_dates': fertilizer_dates,
+        'fertilizer_date_totals': [(date, fertilizer_date_totals[date]) for date in fertilizer_dates],
+        'category_totals': category_totals,
+        'category_list': category_list,
+    }
@@ -0,0 +1,79 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from apps.farm.crop_cost_report import build_crop_cost_report
+from apps.farm.models import Product, ServiceType, Plot, Crop, CropCycleCost
+from apps.farm.views import get_crop_cycle_cost_list
+
+
+class Command(BaseCommand):
+    help = 'Measure queries and time of the crop cycle cost report for a crop with many cost rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Cost rows created for the crop')
+        parser.add_argument('--repeat', type=int, default=5, help='Measured runs')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+        random.seed(rows)
+
+        # Everything runs inside a transaction that is rolled back at the end
+        with transaction.atomic():
+            crop = self._seed(rows)
+            request = RequestFactory().get('/farm/crop_cycle_cost/', {'crop_id': crop.id})
+            request.user = AnonymousUser()
+
+            self.stdout.write(f"{'target':>10} {'queries':>8} {'avg ms':>10}")
+            self._measure('engine', repeat, lambda: build_crop_cost_report(crop.id))
+            self._measure('view', repeat, lambda: get_crop_cycle_cost_list(request))
+            transaction.set_rollback(True)
+
+    def _seed(self, rows):
+        plot = Plot.objects.create(name='BENCHMARK PLOT', area_hectares=Decimal('10.0000'))
+        crop = Crop.objects.create(plot=plot, crop_type='BENCHMARK', planting_date=date(2024, 1, 1),
+                                   planted_area=Decimal('5.0000'))
+        service_type = ServiceType.objects.create(name='BENCHMARK SERVICE')
+        products = [
+            Product.objects.create(name=f'FERTILIZER {i}', product_type=Product.PRODUCT,
+                                   product_category=Product.FERTILIZER, unit='KG', unit_price=Decimal('3.50'))
+            for i in range(20)
+        ] + [
+            Product.objects.create(name=f'AGROCHEMICAL {i}', product_type=Product.PRODUCT,
+                                   product_category=Product.AGROCHEMICAL, unit='L', unit_price=Decimal('12.00'))
+            for i in range(20)
+        ] + [
+            Product.objects.create(name=name, product_type=Product.SERVICE, service_type=service_type,
+                                   unit='UNIT', unit_price=Decimal('50.00'))
+            for name in ('JORNAL', 'TRACTOR', 'ALQUILER', 'COSECHA', 'ELECTROSTATICA', 'FLETE')
+        ]
+        CropCycleCost.objects.bulk_create([
+            CropCycleCost(
+                crop=crop,
+                product=random.choice(products),
+                application_date=date(2024, 1, 1) + timedelta(days=random.randint(0, 180)),
+                quantity=Decimal(random.randint(1, 500)) / 10,
+                unit='KG',
+                total_cost=Decimal(random.randint(100, 50000)) / 100,
+            ) for _ in range(rows)
+        ], batch_size=500)
+        return crop
+
+    def _measure(self, label, repeat, fn):
+        elapsed = 0
+        queries = 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                fn()
+                elapsed += time.perf_counter() - start
+            queries = len(context.captured_queries)
+        self.stdout.write(f'{label:>10} {queries:>8} {elapsed * 1000 / repeat:>10.2f}')
@@ -0,0 +1,77 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.farm.models import Product, InventoryTransaction
+
+
+class Command(BaseCommand):
+    help = 'Measure InventoryTransaction.save() latency as the kardex of a product grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,5000,20000',
+                            help='Comma separated kardex lengths to measure')
+        parser.add_argument('--saves', type=int, default=20, help='Saves measured per kardex length')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+        saves = options['saves']
+
+        # Everything runs inside a transaction that is rolled back at the end
+        with transaction.atomic():
+            product = Product.objects.create(
+                name='BENCHMARK KARDEX',
+                product_type=Product.PRODUCT,
+                product_category=Product.AGROCHEMICAL,
+                unit='L',
+                unit_price=Decimal('1.00'),
+            )
+            self.stdout.write(f"{'rows':>8} {'append ms':>10} {'edit last ms':>13} {'edit first ms':>14}")
+            seeded = 0
+            for size in sizes:
+                seeded = self._seed(product, seeded, size)
+                append_ms = self._measure(saves, lambda: InventoryTransaction(
+                    product=product, exit_date=timezone.now().date(), exit_quantity=Decimal('1.00')
+                ).save())
+                seeded += saves
+
+                last = InventoryTransaction.objects.filter(product=product).order_by('-created_at', '-id').first()
+                edit_last_ms = self._measure(saves, lambda: self._toggle(last))
+
+                first = InventoryTransaction.objects.filter(product=product).order_by('created_at', 'id').first()
+                edit_first_ms = self._measure(1, lambda: self._toggle(first))
+
+                self.stdout.write(f'{seeded:>8} {append_ms:>10.2f} {edit_last_ms:>13.2f} {edit_first_ms:>14.2f}')
+            transaction.set_rollback(True)
+
+    def _seed(self, product, seeded, size):
+        """Bulk insert entries until the kardex has `size` rows, with consistent balances"""
+        if size <= seeded:
+            return seeded
+        balance = InventoryTransaction.objects.filter(product=product).order_by(
+            '-created_at', '-id').values_list('balance', flat=True).first() or Decimal('0.00')
+        rows = []
+        for _ in range(size - seeded):
+            balance += Decimal('10.00')
+            rows.append(InventoryTransaction(product=product, entry_date=timezone.now().date(),
+                                             entry_quantity=Decimal('10.00'), balance=balance))
+        InventoryTransaction.objects.bulk_create(rows, batch_size=500)
+        return size
+
+    @staticmethod
+    def _toggle(transaction_obj):
+        if transaction_obj.entry_quantity:
+            transaction_obj.entry_quantity += Decimal('1.00')
+        else:
+            transaction_obj.exit_quantity += Decimal('0.01')
+        transaction_obj.save()
+
+    @staticmethod
+    def _measure(repetitions, func):
+        start = time.perf_counter()
+        for _ in range(repetitions):
+            func()
+        return (time.perf_counter() - start) * 1000 / repetitions
@@ -0,0 +1,509 @@
+import json
+import logging
+import os
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib import import_module
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from apps.accounting.cashflow_grid import invalidate_cashflow_grid
+from apps.accounting.models import Cash, CashFlow, CashDailyBalance, InvoiceOutbox, ReportJob
+from apps.farm.models import Product, ServiceType, Plot, CropType, Crop, CropCycleCost, CropCostRollup, \
+    InventoryTransaction, ProductStockSnapshot, ProductDailyStock
+from apps.hrm.models import Subsidiary
+from apps.users.models import CustomUser
+
+APPS = ('farm', 'accounting', 'hrm', 'users')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), '..', '..', 'benchmarks', 'view_baseline.json')
+BATCH_SIZE = 500
+
+# Requests made for a URL besides a plain GET without parameters. Each entry is
+# (label, method, kwargs, data); kwargs and data are callables receiving the seeded objects.
+SCENARIOS = {
+    'farm:modal_product_update': [('GET', 'GET', None, lambda s: {'pk': s['product'].id})],
+    'farm:inventory_transaction': [('GET', 'GET', None, lambda s: {'product_id': s['product'].id})],
+    'farm:inventory_transaction_grid': [('GET', 'GET', None, lambda s: {'product_id': s['product'].id})],
+    'farm:get_product_stock': [('GET', 'GET', None, lambda s: {'product_ids': ','.join(
+        str(product.id) for product in s['products'])})],
+    'farm:modal_inventory_entry_create': [('GET', 'GET', None, lambda s: {'product_id': s['product'].id})],
+    'farm:modal_inventory_exit_create': [('GET', 'GET', None, lambda s: {'product_id': s['product'].id})],
+    'farm:modal_inventory_transaction_update': [('GET', 'GET', None, lambda s: {'pk': s['inventory_transaction'].id})],
+    'farm:modal_crop_type_update': [('GET', 'GET', None, lambda s: {'pk': s['crop_type'].id})],
+    'farm:modal_plot_update': [('GET', 'GET', None, lambda s: {'pk': s['plot'].id})],
+    'farm:modal_crop_update': [('GET', 'GET', None, lambda s: {'pk': s['crop'].id})],
+    'farm:modal_crop_cycle_cost_create': [('GET', 'GET', None, lambda s: {'crop_id': s['crop'].id})],
+    'farm:crop_cycle_cost': [('GET', 'GET', None, lambda s: {'crop_id': s['crop'].id})],
+    'farm:crop_cycle_cost_grid': [('GET', 'GET', None, lambda s: {'crop_id': s['crop'].id})],
+    'farm:get_crop_cost_summary': [('GET', 'GET', None, lambda s: {'crop_id': s['crop'].id})],
+    'farm:get_plot_cost_summary': [('GET', 'GET', None, lambda s: {'plot_id': s['plot'].id})],
+    'farm:get_farm_cost_per_hectare': [('GET', 'GET', None, lambda s: {'year': s['year']})],
+    'farm:modal_crop_cycle_cost_update': [('GET', 'GET', None, lambda s: {'pk': s['crop_cycle_cost'].id})],
+    'farm:modal_service_type_update': [('GET', 'GET', None, lambda s: {'pk': s['service_type'].id})],
+    'accounting:cash_list': [('GET', 'GET', None, None), ('POST', 'POST', None, lambda s: {})],
+    'accounting:cash_get': [('POST', 'POST', None, lambda s: {'cash_id': s['cash'].id})],
+    'accounting:cash_edit': [('GET', 'GET', lambda s: {'cash_id': s['cash'].id}, None)],
+    'accounting:cashflow_list': [
+        ('GET', 'GET', None, None),
+        ('POST today', 'POST', None, lambda s: {}),
+        ('POST year', 'POST', None, lambda s: {'start_date': f"{s['year']}-01-01", 'end_date': f"{s['year']}-12-31"}),
+    ],
+    'accounting:cashflow_grid': [
+        ('GET today', 'GET', None, lambda s: {}),
+        ('GET year', 'GET', None, lambda s: {'start_date': f"{s['year']}-01-01", 'end_date': f"{s['year']}-12-31"}),
+    ],
+    'accounting:cashflow_get': [('POST', 'POST', None, lambda s: {'cashflow_id': s['cashflow'].id})],
+    'accounting:cashflow_edit': [('GET', 'GET', lambda s: {'cashflow_id': s['cashflow'].id}, None)],
+    'accounting:get_cash_accounts_by_subsidiary': [
+        ('GET', 'GET', None, lambda s: {'subsidiary': s['subsidiary'].id})],
+    'accounting:report_job_status': [('GET', 'GET', lambda s: {'job_id': s['report_job'].id}, None)],
+    'accounting:invoice_outbox_status': [
+        ('GET', 'GET', lambda s: {'order_id': s['invoice_outbox'].order_id}, None)],
+    'hrm:modal_subsidiary_update': [('GET', 'GET', None, lambda s: {'pk': s['subsidiary'].id})],
+    'hrm:modal_user_update': [('GET', 'GET', None, lambda s: {'pk': s['user'].id})],
+}
+
+
+def _product_form(s):
+    return {'name': 'BENCHMARK NEW PRODUCT', 'product-type': Product.PRODUCT, 'product-category': Product.FERTILIZER,
+            'unit': 'L', 'unit-price': '4.50', 'active': 'true'}
+
+
+def _plot_form(s):
+    return {'name': 'BENCHMARK NEW PLOT', 'area_hectares': '12.5', 'subsidiary_id': s['subsidiary'].id,
+            'active': 'true'}
+
+
+def _crop_form(s):
+    return {'plot_id': s['plot'].id, 'crop_type': s['crop_type'].name, 'crop_name': 'BENCHMARK NEW CROP',
+            'planting_date': f"{s['year']}-02-01", 'planted_area': '3.5', 'active': 'true'}
+
+
+def _crop_cycle_cost_form(s):
+    return {'crop_id': s['crop'].id, 'product_id': s['product'].id, 'application_date': f"{s['year']}-03-01",
+            'quantity': '2.5', 'unit': 'L', 'total_cost': '25.00', 'responsible_id': s['user'].id}
+
+
+def _subsidiary_form(s):
+    return {'name': 'BENCHMARK NEW SUBSIDIARY', 'serial': 'BN01', 'business-name': 'BENCHMARK S.A.C.',
+            'ruc': '20123456789', 'address': 'AV. BENCHMARK 123'}
+
+
+def _cash_form(s):
+    return {'cash_name': 'BENCHMARK NEW CASH', 'subsidiary_id': s['subsidiary'].id, 'account_type': 'C',
+            'currency_type': 'S'}
+
+
+def _cashflow_form(s):
+    # A movement early in the year rebuilds most of the cash box ledger
+    return {'transaction_date': f"{s['year']}-01-15", 'transaction_type': 'S', 'expense_type': 'O',
+            'payment_type': 'E', 'description': 'BENCHMARK NEW CASHFLOW', 'subtotal': '84.75', 'igv': '15.25',
+            'total': '100.00', 'cash_id': s['cash'].id, 'user_id': s['admin'].id}
+
+
+def _crop_cost_file(s):
+    rows = ['product,application_date,quantity,unit,total_cost'] + [
+        f"{s['product'].name},{s['year']}-03-{day % 28 + 1:02d},1.5,L,12.00" for day in range(200)
+    ]
+    return SimpleUploadedFile('costs.csv', '\n'.join(rows).encode(), content_type='text/csv')
+
+
+# Views that only handle POST (a GET returns None) are measured with a valid form
+SCENARIOS.update({
+    'farm:create_product': [('POST', 'POST', None, _product_form)],
+    'farm:update_product': [('POST', 'POST', None, lambda s: dict(_product_form(s), product_id=s['product'].id))],
+    'farm:create_inventory_entry': [('POST', 'POST', None, lambda s: {
+        'product_id': s['product'].id, 'entry_date': f"{s['year']}-03-01", 'entry_quantity': '10'})],
+    'farm:create_inventory_exit': [('POST', 'POST', None, lambda s: {
+        'product_id': s['product'].id, 'crop_id': s['crop'].id, 'exit_date': f"{s['year']}-03-01",
+        'exit_quantity': '1'})],
+    'farm:update_inventory_transaction': [('POST', 'POST', None, lambda s: {
+        'transaction_id': s['inventory_entry'].id, 'product_id': s['product'].id,
+        'entry_date': s['inventory_entry'].entry_date.isoformat(), 'entry_quantity': '1000'})],
+    'farm:create_crop_type': [('POST', 'POST', None, lambda s: {'name': 'BENCHMARK NEW CROP TYPE',
+                                                               'is_active': 'true'})],
+    'farm:update_crop_type': [('POST', 'POST', None, lambda s: {
+        'crop_type_id': s['crop_type'].id, 'name': s['crop_type'].name, 'is_active': 'true'})],
+    'farm:create_plot': [('POST', 'POST', None, _plot_form)],
+    'farm:update_plot': [('POST', 'POST', None, lambda s: dict(_plot_form(s), plot_id=s['plot'].id))],
+    'farm:create_crop': [('POST', 'POST', None, _crop_form)],
+    'farm:update_crop': [('POST', 'POST', None, lambda s: dict(_crop_form(s), crop_id=s['crop'].id))],
+    'farm:create_crop_cycle_cost': [('POST', 'POST', None, _crop_cycle_cost_form)],
+    'farm:update_crop_cycle_cost': [('POST', 'POST', None, lambda s: dict(
+        _crop_cycle_cost_form(s), cost_id=s['crop_cycle_cost'].id))],
+    'farm:import_crop_cycle_costs': [('POST 200 rows', 'POST', None, lambda s: {
+        'crop_id': s['crop'].id, 'file': _crop_cost_file(s)})],
+    'farm:create_service_type': [('POST', 'POST', None, lambda s: {'name': 'BENCHMARK NEW SERVICE',
+                                                                  'active': 'true'})],
+    'farm:update_service_type': [('POST', 'POST', None, lambda s: {
+        'service_type_id': s['service_type'].id, 'name': s['service_type'].name, 'active': 'true'})],
+    'hrm:create_subsidiary': [('POST', 'POST', None, _subsidiary_form)],
+    'hrm:update_subsidiary': [('POST', 'POST', None, lambda s: dict(
+        _subsidiary_form(s), subsidiary_id=s['subsidiary'].id, name=s['subsidiary'].name))],
+    'hrm:create_user': [('POST', 'POST', None, lambda s: {
+        'username': 'benchmark_new_user', 'password': 'benchmark', 'first_name': 'BENCHMARK',
+        'last_name': 'USER', 'email': 'benchmark@example.com', 'document': '45678912',
+        'subsidiary': s['subsidiary'].id})],
+    'hrm:update_user': [('POST', 'POST', None, lambda s: {
+        'user_id': s['user'].id, 'user': s['user'].username, 'first-name': 'BENCHMARK', 'last-name': 'USER',
+        'email': 'benchmark@example.com', 'document': '45678912', 'subsidiary': s['subsidiary'].id})],
+    'accounting:cash_save': [('POST', 'POST', None, _cash_form)],
+    'accounting:cash_update': [('POST', 'POST', None, lambda s: dict(
+        _cash_form(s), cash_id=s['cash'].id, cash_name=s['cash'].name))],
+    'accounting:cashflow_save': [('POST', 'POST', None, _cashflow_form)],
+    'accounting:cashflow_update': [('POST', 'POST', None, lambda s: dict(
+        _cashflow_form(s), cashflow_id=s['cashflow'].id))],
+    'accounting:cashflow_delete': [('POST', 'POST', None, lambda s: {'cashflow_id': s['cashflow'].id})],
+    'accounting:report_job_create': [('POST', 'POST', None, lambda s: {
+        'report_type': 'students_excel', 'subsidiary': s['subsidiary'].id})],
+})
+
+# templates/accounting/*.html are not part of this repository. These stand-ins render the
+# objects each view passes (with the relations a list shows) so the views can be measured;
+# real templates found by the other loaders take precedence.
+_SELECT_OPTIONS = '{% for value, label in CHOICES %}<option value="{{ value }}">{{ label }}</option>{% endfor %}'
+_SUBSIDIARY_OPTIONS = '{% for s in subsidiary_set %}<option value="{{ s.id }}">{{ s.name }}</option>{% endfor %}'
+_CASH_OPTIONS = ('{% for c in cash_accounts %}<option value="{{ c.id }}">{{ c.name }} {{ c.subsidiary.name }}'
+                 '</option>{% endfor %}')
+_USER_OPTIONS = '{% for u in user_set %}<option value="{{ u.id }}">{{ u.get_full_name }}</option>{% endfor %}'
+_CASHFLOW_FORM = (_CASH_OPTIONS + _USER_OPTIONS + _SELECT_OPTIONS.replace('CHOICES', 'document_types')
+                  + _SELECT_OPTIONS.replace('CHOICES', 'transaction_types')
+                  + _SELECT_OPTIONS.replace('CHOICES', 'expense_types'))
+STUB_TEMPLATES = {
+    'accounting/cash_list.html': _SUBSIDIARY_OPTIONS + _SELECT_OPTIONS.replace('CHOICES', 'currency_types'),
+    'accounting/cash_list_grid.html': (
+        '{% for c in cash_accounts %}<tr><td>{{ c.name }}</td><td>{{ c.subsidiary.name }}</td>'
+        '<td>{{ c.account_number }}</td><td>{{ c.get_currency_type_display }}</td></tr>{% endfor %}'),
+    'accounting/cash_create.html': _SUBSIDIARY_OPTIONS + _SELECT_OPTIONS.replace('CHOICES', 'currency_types'),
+    'accounting/cash_edit.html': ('{{ cash.name }} {{ cash.subsidiary.name }}' + _SUBSIDIARY_OPTIONS
+                                  + _SELECT_OPTIONS.replace('CHOICES', 'currency_types')),
+    'accounting/cashflow_list.html': (_CASHFLOW_FORM + _SUBSIDIARY_OPTIONS
+                                      + '{{ date_now }} {{ user_subsidiary.name }} {{ first_cash_account.name }}'),
+    'accounting/cashflow_list_grid.html': (
+        '{% for f in cashflows %}<tr><td>{{ f.transaction_date|date:"d/m/Y" }}</td><td>{{ f.get_type_display }}</td>'
+        '<td>{{ f.description }}</td><td>{{ f.cash.name }}</td><td>{{ f.cash.subsidiary.name }}</td>'
+        '<td>{{ f.user.get_full_name }}</td><td>{{ f.total|floatformat:2 }}</td></tr>{% endfor %}'
+        '{{ total_income }} {{ total_expenses }} {{ net_balance }}'
+        '{% for key, total in expense_totals.items %}{{ key }} {{ total }}{% endfor %}'),
+    'accounting/cashflow_create.html': _CASHFLOW_FORM + '{{ date_now }}',
+    'accounting/cashflow_edit.html': ('{{ cashflow.description }} {{ cashflow.cash.name }} '
+                                      '{{ cashflow.cash.subsidiary.name }} {{ cashflow.user.get_full_name }}'
+                                      + _CASHFLOW_FORM),
+}
+
+
+class QueryCounter:
+    """Database execute wrapper counting queries (the debug query log is capped at 9000 entries)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large dataset and drive every URL of apps/*/urls.py through the test client, recording '
+        'queries, time and peak memory per view. Fails when a view exceeds the stored baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1, help='Multiplier of the seeded dataset size')
+        parser.add_argument('--repeat', type=int, default=3, help='Measured runs per view (median time is kept)')
+        parser.add_argument('--baseline', default=os.path.normpath(DEFAULT_BASELINE))
+        parser.add_argument('--update-baseline', action='store_true', help='Store the results as the new baseline')
+        parser.add_argument('--time-tolerance', type=float, default=1.0,
+                            help='Allowed relative time increase over the baseline')
+        parser.add_argument('--time-floor', type=float, default=50,
+                            help='Milliseconds of time increase always allowed (timer noise)')
+        parser.add_argument('--memory-tolerance', type=float, default=0.5,
+                            help='Allowed relative peak memory increase over the baseline')
+        parser.add_argument('--only', help='Only measure URL names containing this text')
+
+    def handle(self, *args, **options):
+        random.seed(1)
+        setup_test_environment()
+        # Views answering 4xx/5xx are part of the results, not noise for the console
+        logging.disable(logging.ERROR)
+        try:
+            # Everything runs inside a transaction that is rolled back at the end
+            with transaction.atomic(), override_settings(TEMPLATES=self._templates_with_stubs()):
+                seeded = self._seed(options['scale'])
+                client = Client(raise_request_exception=False)
+                client.force_login(seeded['admin'])
+                results = self._run(client, seeded, options)
+                transaction.set_rollback(True)
+        finally:
+            logging.disable(logging.NOTSET)
+            teardown_test_environment()
+
+        if options['update_baseline']:
+            views = results
+            if options['only'] and os.path.exists(options['baseline']):
+                # Only the measured views are replaced
+                with open(options['baseline']) as f:
+                    views = dict(json.load(f)['views'], **results)
+            with open(options['baseline'], 'w') as f:
+                json.dump({'scale': options['scale'], 'views': views}, f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {options["baseline"]}'))
+            return
+
+        regressions = self._compare(results, options)
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(regression)
+            raise CommandError(f'{len(regressions)} views exceeded the baseline')
+        self.stdout.write(self.style.SUCCESS('All views are within the baseline'))
+
+    @staticmethod
+    def _templates_with_stubs():
+        """TEMPLATES with STUB_TEMPLATES as the last loader, after the project's own templates"""
+        engine = dict(settings.TEMPLATES[0], APP_DIRS=False)
+        engine['OPTIONS'] = dict(engine.get('OPTIONS', {}), loaders=[('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+            ('django.template.loaders.locmem.Loader', STUB_TEMPLATES),
+        ])])
+        return [engine] + settings.TEMPLATES[1:]
+
+    def _seed(self, scale):
+        def count(n):
+            return max(1, int(n * scale))
+
+        today = timezone.localdate()
+        year_start = date(today.year, 1, 1)
+
+        subsidiaries = [Subsidiary.objects.create(name=f'BENCHMARK SUBSIDIARY {i}', serial=f'B{i:03d}')
+                        for i in range(5)]
+        user = CustomUser.objects.create_user(username='benchmark_views', password=None, is_superuser=True,
+                                              is_staff=True, has_access_to_all=True, subsidiary=subsidiaries[0])
+        users = [user] + [
+            CustomUser.objects.create_user(username=f'benchmark_user_{i}', password=None,
+                                           subsidiary=random.choice(subsidiaries))
+            for i in range(count(20))
+        ]
+
+        service_type = ServiceType.objects.create(name='BENCHMARK SERVICE')
+        crop_type = CropType.objects.create(name='BENCHMARK CROP TYPE')
+        products = [
+            Product.objects.create(name=f'BENCHMARK FERTILIZER {i}', product_type=Product.PRODUCT,
+                                   product_category=Product.FERTILIZER, unit='L', unit_price=Decimal('3.50'))
+            for i in range(count(50))
+        ] + [
+            Product.objects.create(name=f'BENCHMARK AGROCHEMICAL {i}', product_type=Product.PRODUCT,
+                                   product_category=Product.AGROCHEMICAL, unit='L', unit_price=Decimal('12.00'))
+            for i in range(count(40))
+        ] + [
+            Product.objects.create(name=f'BENCHMARK {name}', product_type=Product.SERVICE,
+                                   service_type=service_type, unit='SERVICE', unit_price=Decimal('50.00'))
+            for name in ('JORNAL', 'TRACTOR', 'ALQUILER', 'COSECHA', 'ELECTROSTATICA', 'FLETE')
+        ]
+        stock_products = [product for product in products if product.product_type == Product.PRODUCT]
+
+        Plot.objects.bulk_create([
+            Plot(name=f'BENCHMARK PLOT {i}', area_hectares=Decimal(random.randint(10, 500)) / 10,
+                 subsidiary=random.choice(subsidiaries))
+            for i in range(count(1000))
+        ], batch_size=BATCH_SIZE)
+        plots = list(Plot.objects.filter(name__startswith='BENCHMARK PLOT'))
+        Crop.objects.bulk_create([
+            Crop(plot=random.choice(plots), crop_type=crop_type.name, crop_name=f'BENCHMARK CROP {i}',
+                 planting_date=year_start + timedelta(days=random.randint(0, 60)),
+                 planted_area=Decimal(random.randint(10, 100)) / 10)
+            for i in range(count(3000))
+        ], batch_size=BATCH_SIZE)
+        crops = list(Crop.objects.filter(crop_name__startswith='BENCHMARK CROP'))
+
+        # A tenth of the costs belong to one crop, the one the crop views are measured with
+        crop = crops[0]
+        CropCycleCost.objects.bulk_create([
+            CropCycleCost(
+                crop=crop if i % 10 == 0 else random.choice(crops),
+                product=random.choice(products),
+                application_date=year_start + timedelta(days=random.randint(0, 300)),
+                quantity=Decimal(random.randint(1, 500)) / 10,
+                unit='L',
+                total_cost=Decimal(random.randint(100, 50000)) / 100,
+                responsible=random.choice(users),
+            ) for i in range(count(20000))
+        ], batch_size=BATCH_SIZE)
+        CropCostRollup.rebuild()
+
+        # Kardex rows with their running balance, half of them on one product
+        product = stock_products[0]
+        balances = {}
+        inventory_transactions = []
+        for i in range(count(20000)):
+            kardex_product = product if i % 2 == 0 else random.choice(stock_products)
+            movement_date = year_start + timedelta(days=i * 300 // count(20000))
+            balance = balances.get(kardex_product.id, Decimal('0.00'))
+            if balance < 100 or random.random() < 0.4:
+                inventory_transaction = InventoryTransaction(
+                    product=kardex_product, entry_date=movement_date,
+                    entry_quantity=Decimal(random.randint(1000, 50000)) / 100)
+            else:
+                inventory_transaction = InventoryTransaction(
+                    product=kardex_product, exit_date=movement_date, crop=random.choice(crops),
+                    exit_quantity=Decimal(random.randint(100, int(balance))) / 2)
+            balance += inventory_transaction.get_movement()
+            inventory_transaction.balance = balances[kardex_product.id] = balance
+            inventory_transactions.append(inventory_transaction)
+        InventoryTransaction.objects.bulk_create(inventory_transactions, batch_size=BATCH_SIZE)
+        for product_id in balances:
+            ProductStockSnapshot.refresh(product_id)
+            ProductDailyStock.rebuild(product_id)
+
+        cash_accounts = [Cash.objects.create(name=f'BENCHMARK CASH {i}', subsidiary=subsidiaries[i % 5],
+                                             account_type='C' if i % 2 else 'B')
+                         for i in range(count(10))]
+        cashflows = []
+        for i in range(count(20000)):
+            transaction_date = year_start + timedelta(days=random.randint(0, (today - year_start).days))
+            total = Decimal(random.randint(100, 100000)) / 100
+            cashflows.append(CashFlow(
+                transaction_date=transaction_date,
+                created_at=timezone.now(),
+                description=f'BENCHMARK CASHFLOW {i}',
+                type=random.choice(('A', 'C', 'E', 'S', 'S', 'S')),
+                subtotal=total / Decimal('1.18'),
+                igv=total - total / Decimal('1.18'),
+                total=total,
+                cash=random.choice(cash_accounts),
+                user=random.choice(users),
+                type_expense=random.choice(CashFlow.TYPE_EXPENSE)[0],
+                subsidiary=random.choice(subsidiaries),
+            ))
+        CashFlow.objects.bulk_create(cashflows, batch_size=BATCH_SIZE)
+        for cash in cash_accounts:
+            CashDailyBalance.rebuild(cash.id)
+        # Pages cached by an earlier run could match the ids reused after its rollback
+        invalidate_cashflow_grid()
+
+        report_job = ReportJob.objects.create(
+            report_type='sales_excel', params=json.dumps({'report_date': today.isoformat()}), key='benchmark',
+            status='D', file_url='/media/reports/benchmark.xlsx', filename='benchmark.xlsx', user=user,
+            finished_at=timezone.now(),
+        )
+        # Sent and retried invoices of one order (the order lives in the sales app, only its id is stored)
+        invoice_outbox = InvoiceOutbox.objects.create(
+            order_id=1, document_type='2', key='benchmark:2', status='D', serial=subsidiaries[0].serial,
+            correlative=1, operation_id='1', attempts=1, finished_at=timezone.now(),
+        )
+        InvoiceOutbox.objects.create(order_id=1, document_type='1', key='benchmark:1', attempts=2,
+                                     message='Error en la solicitud')
+
+        return {
+            'year': year_start.year,
+            'admin': user,
+            'user': users[1],
+            'subsidiary': subsidiaries[0],
+            'service_type': service_type,
+            'crop_type': crop_type,
+            'products': stock_products[:20],
+            'product': product,
+            'inventory_transaction': InventoryTransaction.objects.filter(product=product).last(),
+            'inventory_entry': InventoryTransaction.objects.filter(product=product, entry_quantity__gt=0).last(),
+            'plot': crop.plot,
+            'crop': crop,
+            'crop_cycle_cost': CropCycleCost.objects.filter(crop=crop).last(),
+            'cash': cash_accounts[0],
+            'cashflow': CashFlow.objects.filter(description__startswith='BENCHMARK CASHFLOW').last(),
+            'report_job': report_job,
+            'invoice_outbox': invoice_outbox,
+        }
+
+    def _get_requests(self, seeded, only):
+        for app in APPS:
+            for pattern in import_module(f'apps.{app}.urls').urlpatterns:
+                if not isinstance(pattern, URLPattern) or not pattern.name:
+                    continue
+                name = f'{app}:{pattern.name}'
+                if only and only not in name:
+                    continue
+                for label, method, kwargs, data in SCENARIOS.get(name, [('GET', 'GET', None, None)]):
+                    url = reverse(f'apps.{app}:{pattern.name}', kwargs=kwargs(seeded) if kwargs else None)
+                    yield f'{name} {label}', method, url, data(seeded) if data else {}
+
+    def _run(self, client, seeded, options):
+        results = {}
+        self.stdout.write(f"{'view':<60} {'status':>6} {'queries':>8} {'ms':>10} {'peak KiB':>10}")
+        for key, method, url, data in self._get_requests(seeded, options['only']):
+            send = client.post if method == 'POST' else client.get
+            timings = []
+            queries = QueryCounter()
+            for _ in range(options['repeat']):
+                queries.count = 0
+                self._rewind(data)
+                with transaction.atomic(), connection.execute_wrapper(queries):
+                    start = time.perf_counter()
+                    response = send(url, data)
+                    timings.append(time.perf_counter() - start)
+                    # Views that write must not change what the next run sees
+                    transaction.set_rollback(True)
+
+            # Memory is measured on its own run, tracemalloc slows everything down
+            with transaction.atomic():
+                self._rewind(data)
+                tracemalloc.start()
+                send(url, data)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                transaction.set_rollback(True)
+
+            results[key] = {
+                'status': response.status_code,
+                'queries': queries.count,
+                'time_ms': round(statistics.median(timings) * 1000, 2),
+                'peak_kib': round(peak / 1024, 1),
+            }
+            result = results[key]
+            self.stdout.write(f"{key:<60} {result['status']:>6} {result['queries']:>8} "
+                              f"{result['time_ms']:>10.2f} {result['peak_kib']:>10.1f}")
+        return results
+
+    @staticmethod
+    def _rewind(data):
+        # Uploaded files are read by every request
+        for value in data.values():
+            if hasattr(value, 'seek'):
+                value.seek(0)
+
+    def _compare(self, results, options):
+        if not os.path.exists(options['baseline']):
+            raise CommandError(f'No baseline at {options["baseline"]}, run with --update-baseline first')
+        with open(options['baseline']) as f:
+            baseline = json.load(f)
+        if baseline.get('scale') != options['scale']:
+            raise CommandError(f'The baseline was recorded with --scale {baseline.get("scale")}')
+
+        regressions = []
+        for key, result in results.items():
+            expected = baseline['views'].get(key)
+            if expected is None:
+                self.stdout.write(self.style.WARNING(f'{key} has no baseline'))
+                continue
+            if result['status'] != expected['status']:
+                regressions.append(f'{key}: status {result["status"]}, baseline {expected["status"]}')
+            if result['queries'] > expected['queries']:
+                regressions.append(f'{key}: {result["queries"]} queries, baseline {expected["queries"]}')
+            allowed_time = max(expected['time_ms'] * (1 + options['time_tolerance']),
+                               expected['time_ms'] + options['time_floor'])
+            if result['time_ms'] > allowed_time:
+                regressions.append(f'{key}: {result["time_ms"]} ms, baseline {expected["time_ms"]} ms')
+            if result['peak_kib'] > expected['peak_kib'] * (1 + options['memory_tolerance']):
+                regressions.append(f'{key}: {result["peak_kib"]} KiB peak, baseline {expected["peak_kib"]} KiB')
+        return regressions
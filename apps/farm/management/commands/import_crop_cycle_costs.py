@@ -0,0 +1,41 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.farm.crop_cost_import import import_crop_cycle_costs
+from apps.users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Import crop cycle costs (and their inventory exits) from an xlsx or csv file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path of the .xlsx or .csv file')
+        parser.add_argument('--crop', type=int, help='Crop id used for rows without crop_id')
+        parser.add_argument('--responsible', help='Username used for rows without responsible')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the file and report errors')
+
+    def handle(self, *args, **options):
+        responsible = None
+        if options['responsible']:
+            responsible = CustomUser.objects.filter(username=options['responsible']).first()
+            if responsible is None:
+                raise CommandError(f'User {options["responsible"]} not found')
+
+        with open(options['path'], 'rb') as file:
+            try:
+                report = import_crop_cycle_costs(file, os.path.basename(options['path']), crop_id=options['crop'],
+                                                 responsible=responsible, dry_run=options['dry_run'])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stdout.write(self.style.ERROR(f'Row {error["row"]}: {"; ".join(error["errors"])}'))
+        summary = (f'{report["costs"]} costs, {report["inventory_exits"]} inventory exits, '
+                   f'{report["skipped_inventory_exits"]} exits without unit conversion')
+        if report['errors']:
+            raise CommandError(f'{len(report["errors"])} rows with errors, nothing was imported')
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Dry run OK: {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Imported {summary}'))
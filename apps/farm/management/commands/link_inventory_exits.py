@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.farm.models import CropCycleCost, InventoryTransaction
+from apps.farm.units import to_inventory_quantity
+
+AUTOMATIC_EXIT_TEXT = 'Aplicación automática desde costo de ciclo'
+
+
+class Command(BaseCommand):
+    help = 'Link the inventory exits generated automatically by crop cycle costs to their cost'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many exits would be linked')
+
+    def handle(self, *args, **options):
+        exit_set = InventoryTransaction.objects.filter(
+            crop_cycle_cost__isnull=True,
+            exit_quantity__isnull=False,
+            observations__startswith=AUTOMATIC_EXIT_TEXT,
+        ).order_by('created_at', 'id')
+
+        # Candidate costs grouped by the values the exit was created from
+        linked_cost_ids = set(InventoryTransaction.objects.filter(
+            crop_cycle_cost__isnull=False
+        ).values_list('crop_cycle_cost_id', flat=True))
+        candidates = {}
+        for cost in CropCycleCost.objects.filter(
+            product_id__in=exit_set.values('product_id')
+        ).select_related('product').order_by('created_at', 'id'):
+            if cost.id not in linked_cost_ids:
+                key = (cost.product_id, cost.crop_id, cost.application_date)
+                candidates.setdefault(key, []).append(cost)
+
+        linked = []
+        unmatched = 0
+        for inventory_transaction in exit_set.iterator(chunk_size=options['batch_size']):
+            costs = candidates.get((inventory_transaction.product_id, inventory_transaction.crop_id,
+                                    inventory_transaction.exit_date), [])
+            cost = self._pick(inventory_transaction, costs)
+            if cost is None:
+                unmatched += 1
+                continue
+            costs.remove(cost)
+            inventory_transaction.crop_cycle_cost = cost
+            linked.append(inventory_transaction)
+
+        if not options['dry_run']:
+            with transaction.atomic():
+                InventoryTransaction.objects.bulk_update(linked, ['crop_cycle_cost'],
+                                                         batch_size=options['batch_size'])
+
+        verb = 'would be linked' if options['dry_run'] else 'linked'
+        self.stdout.write(self.style.SUCCESS(f'{len(linked)} exits {verb}, {unmatched} without a matching cost'))
+
+    @staticmethod
+    def _pick(inventory_transaction, costs):
+        """Prefer the cost whose converted quantity equals the exit, then the oldest one"""
+        for cost in costs:
+            quantity = to_inventory_quantity(cost.product, cost.unit, cost.quantity)
+            if quantity is not None and quantity.quantize(inventory_transaction.exit_quantity) == \
+                    inventory_transaction.exit_quantity:
+                return cost
+        return costs[0] if costs else None
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.farm.models import CropCostRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the crop x category x month cost rollups from the raw crop cycle costs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--crop', type=int, action='append', dest='crops',
+                            help='Crop id to rebuild (can be repeated). All crops by default')
+
+    def handle(self, *args, **options):
+        created = CropCostRollup.rebuild(options['crops'])
+        self.stdout.write(self.style.SUCCESS(f'{created} rollup rows rebuilt'))
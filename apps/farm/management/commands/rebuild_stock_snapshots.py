@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.farm.models import Product, InventoryTransaction, ProductStockSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Rebuild current stock snapshots and daily stock closings from the kardex'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, action='append', dest='products',
+                            help='Product id to rebuild (can be repeated). All inventory products by default')
+        parser.add_argument('--rebalance', action='store_true',
+                            help='Recalculate kardex balances before rebuilding the snapshots')
+
+    def handle(self, *args, **options):
+        product_set = Product.objects.filter(product_type=Product.PRODUCT, product_category__isnull=False)
+        if options['products']:
+            product_set = product_set.filter(id__in=options['products'])
+
+        for product_id in product_set.order_by('id').values_list('id', flat=True).iterator():
+            with transaction.atomic():
+                InventoryTransaction.lock_products(product_id)
+                if options['rebalance']:
+                    InventoryTransaction.rebalance_product(product_id)
+                else:
+                    ProductStockSnapshot.refresh(product_id)
+            self.stdout.write(f'Product {product_id}: OK')
+
+        self.stdout.write(self.style.SUCCESS('Stock snapshots rebuilt'))
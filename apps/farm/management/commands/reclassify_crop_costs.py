@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.farm.models import CropCycleCost, CostCategoryRule, CropCostRollup
+
+
+class Command(BaseCommand):
+    help = 'Fill or refresh the stored category of crop cycle costs using the current category rules'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--crop', type=int, action='append', dest='crops',
+                            help='Crop id to reclassify (can be repeated). All crops by default')
+        parser.add_argument('--product', type=int, action='append', dest='products',
+                            help='Product id to reclassify (can be repeated)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many costs would change')
+        parser.add_argument('--seed-default-rules', action='store_true',
+                            help='Store the default keyword rules missing from the rule table')
+
+    def handle(self, *args, **options):
+        if options['seed_default_rules']:
+            keywords = {keyword.upper() for keyword in
+                        CostCategoryRule.objects.exclude(keyword=None).values_list('keyword', flat=True)}
+            created = CostCategoryRule.objects.bulk_create([
+                CostCategoryRule(keyword=keyword, category=category, priority=1000 + (index + 1) * 10)
+                for index, (keyword, category) in enumerate(CostCategoryRule.DEFAULT_RULES)
+                if keyword not in keywords
+            ])
+            self.stdout.write(f'Default category rules created: {len(created)}')
+
+        rules = CostCategoryRule.get_rules()
+        batch_size = options['batch_size']
+        cost_set = CropCycleCost.objects.select_related('product').only(
+            'id', 'crop_id', 'category', 'product__name', 'product__product_type', 'product__product_category',
+            'product__service_type_id'
+        ).order_by('id')
+        if options['crops']:
+            cost_set = cost_set.filter(crop_id__in=options['crops'])
+        if options['products']:
+            cost_set = cost_set.filter(product_id__in=options['products'])
+
+        # The category depends only on the product, so each product is resolved once
+        categories = {}
+        changed_crops = set()
+        changed = []
+        checked = 0
+        updated = 0
+        for cost in cost_set.iterator(chunk_size=batch_size):
+            checked += 1
+            category = categories.get(cost.product_id)
+            if category is None:
+                category = categories[cost.product_id] = CostCategoryRule.resolve(cost.product, rules)
+            if cost.category != category:
+                cost.category = category
+                changed.append(cost)
+                changed_crops.add(cost.crop_id)
+            if len(changed) >= batch_size:
+                updated += self._update(changed, options['dry_run'])
+                changed = []
+        updated += self._update(changed, options['dry_run'])
+        if changed_crops and not options['dry_run']:
+            # bulk_update skips CropCycleCost.save(), so the rollups of the affected crops are rebuilt here
+            CropCostRollup.rebuild(sorted(changed_crops))
+
+        verb = 'would change' if options['dry_run'] else 'updated'
+        self.stdout.write(self.style.SUCCESS(f'{checked} costs checked, {updated} {verb}'))
+
+    @staticmethod
+    def _update(costs, dry_run):
+        if costs and not dry_run:
+            with transaction.atomic():
+                CropCycleCost.objects.bulk_update(costs, ['category'])
+        return len(costs)
@@ -1,12 +1,18 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 from decimal import Decimal
+from datetime import datetime, time, timedelta
 from apps.users.models import CustomUser
 
 UNIT_CHOICES = (
     ('KG', 'Kilograms'), ('L', 'Liters'), ('G', 'Grams'), ('ML', 'Milliliters'), ('BAG', 'Bag'), ('SACK', 'Sack'),
     ('CONTAINER', 'Container'), ('HOUR', 'Hour'), ('DAY', 'Day'), ('SERVICE', 'Service'),
 )
+# Units the content of a pack (BAG, SACK, CONTAINER) can be expressed in
+PACK_UNIT_CHOICES = (('KG', 'Kilograms'), ('L', 'Liters'), ('G', 'Grams'), ('ML', 'Milliliters'))
 
 
 class Product(models.Model):
@@ -84,6 +90,34 @@ class Product(models.Model):
         validators=[MinValueValidator(Decimal('0.00'))]
     )
 
+    # CONVERSIÓN DE UNIDADES (para registrar salidas de inventario en litros)
+    density = models.DecimalField(
+        'Density (kg/L)',
+        max_digits=10,
+        decimal_places=4,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(Decimal('0.0001'))]
+    )
+
+    pack_size = models.DecimalField(
+        'Pack Size',
+        max_digits=10,
+        decimal_places=4,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(Decimal('0.0001'))],
+        help_text='Content of one bag, sack or container, in pack unit'
+    )
+
+    pack_unit = models.CharField(
+        'Pack Unit',
+        max_length=20,
+        choices=PACK_UNIT_CHOICES,
+        null=True,
+        blank=True
+    )
+
     observations = models.TextField(
         null=True,
         blank=True
@@ -207,6 +241,84 @@ class Crop(models.Model):
         ordering = ['-planting_date', 'plot']
 
 
+COST_CATEGORY_CHOICES = (
+    ('JORNALES', 'Jornales'), ('AGROQUIMICOS', 'Agroquímicos'), ('FERTILIZANTES', 'Fertilizantes'),
+    ('ALQUILER', 'Alquiler'), ('TRACTOR', 'Tractor'), ('ELECTROSTATICA', 'Electrostática'),
+    ('COSECHA', 'Cosecha'), ('OTROS', 'Otros'),
+)
+
+
+class CostCategoryRule(models.Model):
+    """
+    Rule to classify service costs into a cost category, matched by service type
+    and/or by a keyword contained in the service name. Rules are evaluated by priority
+    when a CropCycleCost is saved; the first matching rule wins.
+    """
+    # Built-in keyword rules (same keywords the report always used), evaluated after the configured rules.
+    # A configured rule with the same keyword replaces the default one; deactivate it to disable the keyword.
+    DEFAULT_RULES = (
+        ('TRACTOR', 'TRACTOR'),
+        ('ALQUILER', 'ALQUILER'), ('RENT', 'ALQUILER'),
+        ('JORNAL', 'JORNALES'), ('LABOR', 'JORNALES'), ('MANO DE OBRA', 'JORNALES'),
+        ('COSECHA', 'COSECHA'), ('HARVEST', 'COSECHA'),
+        ('ELECTROSTATIC', 'ELECTROSTATICA'),
+    )
+
+    id = models.AutoField(primary_key=True)
+    keyword = models.CharField('Keyword', max_length=100, null=True, blank=True,
+                               help_text='Text contained in the service name (case insensitive)')
+    service_type = models.ForeignKey(ServiceType, on_delete=models.CASCADE, null=True, blank=True,
+                                     related_name='cost_category_rules', verbose_name='Service Type')
+    category = models.CharField('Category', max_length=20, choices=COST_CATEGORY_CHOICES)
+    priority = models.PositiveIntegerField('Priority', default=100, help_text='Lower values are evaluated first')
+    active = models.BooleanField('Active', default=True)
+    created_at = models.DateTimeField('Created At', auto_now_add=True)
+    updated_at = models.DateTimeField('Updated At', auto_now=True)
+
+    def matches(self, product):
+        if self.service_type_id and self.service_type_id != product.service_type_id:
+            return False
+        if self.keyword and self.keyword.upper() not in product.name.upper():
+            return False
+        return bool(self.service_type_id or self.keyword)
+
+    @classmethod
+    def get_rules(cls):
+        """Active rules in evaluation order, followed by the default keyword rules not configured in the table"""
+        configured = list(cls.objects.order_by('priority', 'id'))
+        keywords = {rule.keyword.upper() for rule in configured if rule.keyword}
+        rules = [rule for rule in configured if rule.active]
+        rules.extend(cls(keyword=keyword, category=category, priority=priority)
+                     for priority, (keyword, category) in enumerate(cls.DEFAULT_RULES)
+                     if keyword not in keywords)
+        return rules
+
+    @classmethod
+    def resolve(cls, product, rules=None):
+        """
+        Cost category of a product. Products are classified by their product category;
+        services by the first matching rule. Pass `rules` to classify many costs with one query.
+        """
+        if product.product_category:
+            if product.product_category == Product.AGROCHEMICAL:
+                return 'AGROQUIMICOS'
+            elif product.product_category == Product.FERTILIZER:
+                return 'FERTILIZANTES'
+        elif product.product_type == Product.SERVICE:
+            for rule in cls.get_rules() if rules is None else rules:
+                if rule.matches(product):
+                    return rule.category
+        return 'OTROS'
+
+    def __str__(self):
+        return f"{self.keyword or self.service_type} -> {self.category}"
+
+    class Meta:
+        verbose_name = 'Cost Category Rule'
+        verbose_name_plural = 'Cost Category Rules'
+        ordering = ['priority', 'id']
+
+
 class CropCycleCost(models.Model):
     """
     Model to record the application of products (agrochemicals/fertilizers) to crops
@@ -234,29 +346,57 @@ class CropCycleCost(models.Model):
     total_cost = models.DecimalField('Total Cost', max_digits=12, decimal_places=2, null=True, blank=True,
                                      validators=[MinValueValidator(Decimal('0.00'))],
                                      help_text='Total cost invested in this application')
+    category = models.CharField('Category', max_length=20, choices=COST_CATEGORY_CHOICES, default='OTROS',
+                                help_text='Resolved from CostCategoryRule when the cost is saved')
     created_at = models.DateTimeField('Created At', auto_now_add=True)
     updated_at = models.DateTimeField('Updated At', auto_now=True)
     
     def get_category(self):
-        """Get cost category based on product"""
-        if self.product.product_category:
-            if self.product.product_category == Product.AGROCHEMICAL:
-                return 'AGROQUIMICOS'
-            elif self.product.product_category == Product.FERTILIZER:
-                return 'FERTILIZANTES'
-        elif self.product.product_type == Product.SERVICE:
-            product_name_upper = self.product.name.upper()
-            if 'TRACTOR' in product_name_upper:
-                return 'TRACTOR'
-            elif 'ALQUILER' in product_name_upper or 'RENT' in product_name_upper:
-                return 'ALQUILER'
-            elif 'JORNAL' in product_name_upper or 'LABOR' in product_name_upper or 'MANO DE OBRA' in product_name_upper:
-                return 'JORNALES'
-            elif 'COSECHA' in product_name_upper or 'HARVEST' in product_name_upper:
-                return 'COSECHA'
-            elif 'ELECTROSTATIC' in product_name_upper or 'ELECTROSTATICA' in product_name_upper:
-                return 'ELECTROSTATICA'
-        return 'OTROS'
+        """Get cost category (stored when the cost is saved)"""
+        return self.category
+
+    def get_inventory_observations(self):
+        """Observations of the inventory exit generated automatically for this cost"""
+        obs_text = 'Aplicación automática desde costo de ciclo de cultivo'
+        if self.application_method:
+            obs_text += f' - Método: {self.application_method}'
+        if self.observations:
+            obs_text += f' - Observaciones: {self.observations}'
+        return obs_text
+
+    def get_rollup_key(self):
+        """(crop, category, month) bucket of CropCostRollup this cost is added to"""
+        return self.crop_id, self.category, self.application_date.replace(day=1)
+
+    def save(self, *args, **kwargs):
+        self.category = CostCategoryRule.resolve(self.product)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'category' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['category']
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = CropCycleCost.objects.filter(pk=self.pk).values(
+                    'crop_id', 'category', 'application_date'
+                ).first()
+            super().save(*args, **kwargs)
+            # Refresh the rollup bucket of the cost and, if it moved, the bucket it left
+            keys = {self.get_rollup_key()}
+            if previous:
+                keys.add((previous['crop_id'], previous['category'], previous['application_date'].replace(day=1)))
+            for key in sorted(keys):
+                CropCostRollup.refresh(*key)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # Reverse the automatic inventory exit first so the product kardex is rebalanced
+            related_transaction = InventoryTransaction.objects.filter(crop_cycle_cost=self).first()
+            if related_transaction:
+                related_transaction.delete()
+            key = self.get_rollup_key()
+            result = super().delete(*args, **kwargs)
+            CropCostRollup.refresh(*key)
+        return result
     
     def __str__(self):
         return f"{self.product.name} - {self.crop} ({self.application_date})"
@@ -268,9 +408,69 @@ class CropCycleCost(models.Model):
         indexes = [
             models.Index(fields=['crop', 'application_date']),
             models.Index(fields=['product', 'application_date']),
+            models.Index(fields=['crop', 'category']),
         ]
 
 
+class CropCostRollup(models.Model):
+    """
+    Pre-aggregated crop cycle costs per crop, category and month, kept current on every
+    CropCycleCost write so crop, plot and farm summaries do not scan the raw costs
+    """
+    crop = models.ForeignKey(Crop, on_delete=models.CASCADE, related_name='cost_rollups', verbose_name='Crop')
+    category = models.CharField('Category', max_length=20, choices=COST_CATEGORY_CHOICES)
+    month = models.DateField('Month', help_text='First day of the month')
+    total_cost = models.DecimalField('Total Cost', max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    cost_count = models.PositiveIntegerField('Cost Count', default=0)
+    updated_at = models.DateTimeField('Updated At', auto_now=True)
+
+    @classmethod
+    def refresh(cls, crop_id, category, month):
+        """Recalculate one (crop, category, month) bucket from the raw costs"""
+        with transaction.atomic():
+            # Serialize writers of the same crop so concurrent refreshes do not overwrite each other
+            list(Crop.objects.select_for_update().filter(id=crop_id).values_list('id', flat=True))
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            result = CropCycleCost.objects.filter(
+                crop_id=crop_id, category=category, application_date__gte=month, application_date__lt=next_month
+            ).aggregate(total=models.Sum('total_cost'), count=models.Count('id'))
+            if not result['count']:
+                cls.objects.filter(crop_id=crop_id, category=category, month=month).delete()
+                return
+            cls.objects.update_or_create(crop_id=crop_id, category=category, month=month, defaults={
+                'total_cost': result['total'] or Decimal('0.00'),
+                'cost_count': result['count'],
+            })
+
+    @classmethod
+    def rebuild(cls, crop_ids=None):
+        """Rebuild every bucket (or the buckets of the given crops) with one grouped query"""
+        cost_set = CropCycleCost.objects.all()
+        rollup_set = cls.objects.all()
+        if crop_ids:
+            cost_set = cost_set.filter(crop_id__in=crop_ids)
+            rollup_set = rollup_set.filter(crop_id__in=crop_ids)
+        rows = cost_set.annotate(month=TruncMonth('application_date')).values(
+            'crop_id', 'category', 'month'
+        ).annotate(total=models.Sum('total_cost'), count=models.Count('id')).order_by()
+        with transaction.atomic():
+            rollup_set.delete()
+            return len(cls.objects.bulk_create([
+                cls(crop_id=row['crop_id'], category=row['category'], month=row['month'],
+                    total_cost=row['total'] or Decimal('0.00'), cost_count=row['count'])
+                for row in rows
+            ], batch_size=500))
+
+    def __str__(self):
+        return f"{self.crop_id} - {self.category} - {self.month:%Y-%m}: {self.total_cost}"
+
+    class Meta:
+        verbose_name = 'Crop Cost Rollup'
+        verbose_name_plural = 'Crop Cost Rollups'
+        ordering = ['crop', 'month', 'category']
+        unique_together = ('crop', 'category', 'month')
+
+
 class InventoryTransaction(models.Model):
     """
     Model to record inventory entries and exits (physical kardex)
@@ -294,48 +494,181 @@ class InventoryTransaction(models.Model):
                                         help_text='Quantity in liters')
     balance = models.DecimalField('Balance', max_digits=10, decimal_places=2, default=Decimal('0.00'),
                                   validators=[MinValueValidator(Decimal('0.00'))])
+    crop_cycle_cost = models.OneToOneField(CropCycleCost, on_delete=models.SET_NULL, null=True, blank=True,
+                                           related_name='inventory_transaction',
+                                           verbose_name='Crop Cycle Cost',
+                                           help_text='Crop cycle cost that generated this exit automatically')
     observations = models.TextField('Observations', null=True, blank=True)
     created_at = models.DateTimeField('Created At', auto_now_add=True)
     updated_at = models.DateTimeField('Updated At', auto_now=True)
     
+    def get_movement(self):
+        """Signed quantity this transaction adds to the product balance (entries minus exits)"""
+        movement = Decimal('0.00')
+        if self.entry_quantity:
+            movement += self._as_stored_quantity('entry_quantity')
+        if self.exit_quantity:
+            movement -= self._as_stored_quantity('exit_quantity')
+        return movement
+
+    def _as_stored_quantity(self, field_name):
+        """Value of a quantity field as the database will store it (views assign floats)"""
+        field = self._meta.get_field(field_name)
+        value = field.to_python(getattr(self, field_name))
+        return value.quantize(Decimal(1).scaleb(-field.decimal_places))
+
+    @classmethod
+    def lock_products(cls, *product_ids):
+        """
+        Lock the product rows so concurrent kardex writes for the same product are serialized.
+        Must be called inside a transaction; ids are locked in order to avoid deadlocks.
+        """
+        product_ids = sorted(set(pid for pid in product_ids if pid))
+        list(Product.objects.select_for_update().filter(id__in=product_ids).values_list('id', flat=True))
+
+    @classmethod
+    def get_balance_before(cls, product_id, created_at, transaction_id):
+        """Balance of the kardex row immediately before position (created_at, id) for a product"""
+        balance = cls.objects.filter(product_id=product_id).filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=transaction_id)
+        ).order_by('-created_at', '-id').values_list('balance', flat=True).first()
+        return balance if balance is not None else Decimal('0.00')
+
+    @classmethod
+    def get_kardex_page(cls, product_id, after_created_at=None, after_id=None, limit=100):
+        """
+        One page of the kardex of a product in (created_at, id) order, starting right after
+        the given position (keyset pagination). Returns the rows and whether more rows exist.
+        """
+        transactions = cls.objects.filter(product_id=product_id).select_related('crop__plot', 'product')
+        if after_created_at is not None:
+            transactions = transactions.filter(
+                Q(created_at__gt=after_created_at) | Q(created_at=after_created_at, id__gt=after_id or 0)
+            )
+        rows = list(transactions.order_by('created_at', 'id')[:limit + 1])
+        return rows[:limit], len(rows) > limit
+
+    def get_kardex_cursor(self):
+        """Opaque keyset position of this row, used to request the next page of the kardex"""
+        return f'{self.created_at.isoformat()}|{self.id}'
+
+    @classmethod
+    def parse_kardex_cursor(cls, cursor):
+        """Inverse of get_kardex_cursor; raises ValueError on malformed cursors"""
+        created_at, transaction_id = cursor.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(transaction_id)
+
+    @classmethod
+    def rebalance_product(cls, product_id, created_at=None, transaction_id=None, batch_size=1000, count_delta=0,
+                          rebuild_daily=True):
+        """
+        Recalculate balances for a product from position (created_at, id) to the end of the kardex.
+        Without a position the whole kardex is recalculated.
+        Only rows whose balance actually changes are written, then the stock snapshot is refreshed
+        (the daily closings are left to the caller when rebuild_daily is False).
+        """
+        transactions = cls.objects.filter(product_id=product_id)
+        current_balance = Decimal('0.00')
+        if created_at is not None:
+            current_balance = cls.get_balance_before(product_id, created_at, transaction_id or 0)
+            transactions = transactions.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gte=transaction_id or 0)
+            )
+        transactions = transactions.order_by('created_at', 'id').only(
+            'id', 'entry_quantity', 'exit_quantity', 'balance'
+        )
+
+        transactions_to_update = []
+        for transaction_obj in transactions.iterator(chunk_size=batch_size):
+            if transaction_obj.entry_quantity:
+                current_balance += transaction_obj.entry_quantity
+            if transaction_obj.exit_quantity:
+                current_balance -= transaction_obj.exit_quantity
+
+            # Only update if balance changed
+            if transaction_obj.balance != current_balance:
+                transaction_obj.balance = current_balance
+                transactions_to_update.append(transaction_obj)
+                if len(transactions_to_update) >= batch_size:
+                    cls.objects.bulk_update(transactions_to_update, ['balance'])
+                    transactions_to_update = []
+
+        if transactions_to_update:
+            cls.objects.bulk_update(transactions_to_update, ['balance'])
+        ProductStockSnapshot.refresh(product_id, created_at, count_delta=count_delta, rebuild_daily=rebuild_daily)
+        return current_balance
+
     def save(self, *args, **kwargs):
         """
-        Calculate balance automatically based on previous transactions for the same product
-        Recalculates all balances for the product to ensure consistency
+        Maintain the product balance incrementally.
+        New transactions are appended at the end of the kardex, so their balance is the previous
+        balance plus/minus the quantity. Updates only rewrite the rows after the changed one,
+        and only when the quantity or the product changed.
         Only products (not services) can have inventory transactions
         """
         # Validate that the product is not a service
         if not self.product.has_inventory():
             raise ValueError(f"Product '{self.product.name}' is a service and cannot have inventory transactions. Only PRODUCT type with category can have inventory.")
-        
-        # Save first to get the ID if it's a new transaction
-        is_new = self.id is None
-        super().save(*args, **kwargs)
-        
-        # Recalculate all balances for this product from scratch
-        # This ensures consistency even when transactions are updated
-        all_transactions = InventoryTransaction.objects.filter(
-            product=self.product
-        ).order_by('created_at', 'id')
-        
-        current_balance = Decimal('0.00')
-        transactions_to_update = []
-        
-        for transaction in all_transactions:
-            if transaction.entry_quantity:
-                current_balance += transaction.entry_quantity
-            if transaction.exit_quantity:
-                current_balance -= transaction.exit_quantity
-            
-            # Only update if balance changed
-            if transaction.balance != current_balance:
-                transaction.balance = current_balance
-                transactions_to_update.append(transaction)
-        
-        # Bulk update all transactions that need balance updates
-        if transactions_to_update:
-            InventoryTransaction.objects.bulk_update(transactions_to_update, ['balance'])
-    
+
+        with transaction.atomic():
+            if self.id is None:
+                self.lock_products(self.product_id)
+                # created_at is assigned on insert, so a new row always lands at the tail
+                last_balance = InventoryTransaction.objects.filter(
+                    product_id=self.product_id
+                ).order_by('-created_at', '-id').values_list('balance', flat=True).first()
+                self.balance = (last_balance or Decimal('0.00')) + self.get_movement()
+                super().save(*args, **kwargs)
+                ProductStockSnapshot.record_append(self)
+                return
+
+            previous = InventoryTransaction.objects.filter(id=self.id).values(
+                'product_id', 'entry_quantity', 'exit_quantity', 'created_at'
+            ).first()
+            if previous is None:
+                super().save(*args, **kwargs)
+                self.rebalance_product(self.product_id, self.created_at, self.id, count_delta=1)
+                return
+
+            self.lock_products(self.product_id, previous['product_id'])
+            product_changed = previous['product_id'] != self.product_id
+            movement_changed = (
+                (previous['entry_quantity'] or Decimal('0.00')) - (previous['exit_quantity'] or Decimal('0.00'))
+            ) != self.get_movement()
+
+            super().save(*args, **kwargs)
+
+            if product_changed:
+                # Close the gap left in the old product and insert the row into the new one
+                self.rebalance_product(previous['product_id'], previous['created_at'], self.id, count_delta=-1)
+                self.rebalance_product(self.product_id, self.created_at, self.id, count_delta=1)
+            elif movement_changed:
+                # The daily closings only shift by the change in quantity, no need to re-read the days
+                self.rebalance_product(self.product_id, self.created_at, self.id, rebuild_daily=False)
+                entry_quantity = self._as_stored_quantity('entry_quantity') if self.entry_quantity else Decimal('0.00')
+                exit_quantity = self._as_stored_quantity('exit_quantity') if self.exit_quantity else Decimal('0.00')
+                ProductDailyStock.shift(
+                    self.product_id, timezone.localtime(self.created_at).date(),
+                    entry_quantity - (previous['entry_quantity'] or Decimal('0.00')),
+                    exit_quantity - (previous['exit_quantity'] or Decimal('0.00')),
+                )
+            else:
+                # Balances are unchanged, only the dates shown for the last movement may differ
+                ProductStockSnapshot.objects.filter(
+                    product_id=self.product_id, last_transaction_id=self.id
+                ).update(last_movement_date=self.exit_date or self.entry_date)
+                return
+            self.refresh_from_db(fields=['balance'])
+
+    def delete(self, *args, **kwargs):
+        """Remove the transaction and rewrite only the balances that came after it"""
+        with transaction.atomic():
+            self.lock_products(self.product_id)
+            product_id, created_at, transaction_id = self.product_id, self.created_at, self.id
+            result = super().delete(*args, **kwargs)
+            self.rebalance_product(product_id, created_at, transaction_id, count_delta=-1)
+        return result
+
     def __str__(self):
         if self.entry_quantity:
             return f"{self.product.name} - Entry: {self.entry_quantity}L on {self.entry_date}"
@@ -351,4 +684,176 @@ class InventoryTransaction(models.Model):
         indexes = [
             models.Index(fields=['product', 'created_at']),
             models.Index(fields=['crop']),
-        ]
\ No newline at end of file
+        ]
+
+
+class ProductStockSnapshot(models.Model):
+    """
+    Current stock of a product, kept up to date on every InventoryTransaction write
+    so the stock of many products can be read in a single query
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='stock_snapshot',
+                                   verbose_name='Product')
+    balance = models.DecimalField('Balance', max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    last_transaction = models.ForeignKey(InventoryTransaction, on_delete=models.SET_NULL, null=True, blank=True,
+                                         related_name='+', verbose_name='Last Transaction')
+    last_movement_date = models.DateField('Last Movement Date', null=True, blank=True)
+    transaction_count = models.PositiveIntegerField('Transaction Count', default=0)
+    updated_at = models.DateTimeField('Updated At', auto_now=True)
+
+    @classmethod
+    def refresh(cls, product_id, since=None, count_delta=0, rebuild_daily=True):
+        """
+        Refresh the current stock of a product and its daily closings from `since`
+        (a created_at value of the first changed transaction). Without `since` everything is rebuilt.
+        """
+        last_transaction = InventoryTransaction.objects.filter(product_id=product_id).order_by(
+            '-created_at', '-id'
+        ).only('id', 'balance', 'entry_date', 'exit_date').first()
+
+        snapshot = cls.objects.filter(product_id=product_id).first()
+        if snapshot is None or since is None:
+            snapshot = snapshot or cls(product_id=product_id)
+            snapshot.transaction_count = InventoryTransaction.objects.filter(product_id=product_id).count()
+        else:
+            snapshot.transaction_count = max(snapshot.transaction_count + count_delta, 0)
+
+        if last_transaction:
+            snapshot.balance = last_transaction.balance
+            snapshot.last_transaction = last_transaction
+            snapshot.last_movement_date = last_transaction.exit_date or last_transaction.entry_date
+        else:
+            snapshot.balance = Decimal('0.00')
+            snapshot.last_transaction = None
+            snapshot.last_movement_date = None
+        snapshot.save()
+
+        if rebuild_daily or since is None:
+            ProductDailyStock.rebuild(product_id, timezone.localtime(since).date() if since else None)
+        return snapshot
+
+    @classmethod
+    def record_append(cls, transaction_obj):
+        """
+        Update the snapshot and today's closing in place for a transaction appended at the tail
+        of the kardex, without reading the rest of the kardex. Falls back to a full refresh
+        when the product has no snapshot yet.
+        """
+        entry_quantity = exit_quantity = Decimal('0.00')
+        if transaction_obj.entry_quantity:
+            entry_quantity = transaction_obj._as_stored_quantity('entry_quantity')
+        if transaction_obj.exit_quantity:
+            exit_quantity = transaction_obj._as_stored_quantity('exit_quantity')
+
+        updated = cls.objects.filter(product_id=transaction_obj.product_id).update(
+            balance=transaction_obj.balance,
+            last_transaction=transaction_obj,
+            last_movement_date=transaction_obj.exit_date or transaction_obj.entry_date,
+            transaction_count=F('transaction_count') + 1,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            return cls.refresh(transaction_obj.product_id)
+
+        ProductDailyStock.record_movement(
+            transaction_obj.product_id, timezone.localtime(transaction_obj.created_at).date(),
+            entry_quantity, exit_quantity, transaction_obj.balance
+        )
+
+    def __str__(self):
+        return f"{self.product} - Stock: {self.balance}"
+
+    class Meta:
+        verbose_name = 'Product Stock Snapshot'
+        verbose_name_plural = 'Product Stock Snapshots'
+
+
+class ProductDailyStock(models.Model):
+    """
+    Closing balance of a product per day of the kardex (days are taken from created_at,
+    the same order used to compute balances). Days without movements have no row:
+    the stock on a date is the closing of the last row on or before that date.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_stocks',
+                                verbose_name='Product')
+    date = models.DateField('Date')
+    entry_quantity = models.DecimalField('Entry Quantity (L)', max_digits=12, decimal_places=2,
+                                         default=Decimal('0.00'))
+    exit_quantity = models.DecimalField('Exit Quantity (L)', max_digits=12, decimal_places=2,
+                                        default=Decimal('0.00'))
+    closing_balance = models.DecimalField('Closing Balance', max_digits=10, decimal_places=2,
+                                          default=Decimal('0.00'))
+
+    @classmethod
+    def rebuild(cls, product_id, since_date=None):
+        """Rebuild the daily closings of a product from `since_date` (or from the beginning)"""
+        transactions = InventoryTransaction.objects.filter(product_id=product_id)
+        daily_stocks = cls.objects.filter(product_id=product_id)
+        if since_date:
+            since = timezone.make_aware(datetime.combine(since_date, time.min))
+            transactions = transactions.filter(created_at__gte=since)
+            daily_stocks = daily_stocks.filter(date__gte=since_date)
+
+        rows = {}
+        for created_at, entry_quantity, exit_quantity, balance in transactions.order_by('created_at', 'id').values_list(
+                'created_at', 'entry_quantity', 'exit_quantity', 'balance').iterator():
+            day = timezone.localtime(created_at).date()
+            row = rows.get(day)
+            if row is None:
+                row = rows[day] = cls(product_id=product_id, date=day)
+            row.entry_quantity += entry_quantity or Decimal('0.00')
+            row.exit_quantity += exit_quantity or Decimal('0.00')
+            row.closing_balance = balance
+
+        daily_stocks.delete()
+        cls.objects.bulk_create(rows.values(), batch_size=500)
+
+    @classmethod
+    def record_movement(cls, product_id, day, entry_quantity, exit_quantity, closing_balance):
+        """Add a movement at the tail of the kardex to the closing of `day`"""
+        updated = cls.objects.filter(product_id=product_id, date=day).update(
+            entry_quantity=F('entry_quantity') + entry_quantity,
+            exit_quantity=F('exit_quantity') + exit_quantity,
+            closing_balance=closing_balance,
+        )
+        if not updated:
+            cls.objects.create(product_id=product_id, date=day, entry_quantity=entry_quantity,
+                               exit_quantity=exit_quantity, closing_balance=closing_balance)
+
+    @classmethod
+    def shift(cls, product_id, day, entry_delta, exit_delta):
+        """Apply a change in the quantities of a movement of `day` to that day and the closings after it"""
+        cls.objects.filter(product_id=product_id, date=day).update(
+            entry_quantity=F('entry_quantity') + entry_delta,
+            exit_quantity=F('exit_quantity') + exit_delta,
+        )
+        cls.objects.filter(product_id=product_id, date__gte=day).update(
+            closing_balance=F('closing_balance') + entry_delta - exit_delta
+        )
+
+    @classmethod
+    def get_balance_at(cls, product_id, stock_date):
+        """Stock of a product at the end of `stock_date`"""
+        balance = cls.objects.filter(product_id=product_id, date__lte=stock_date).order_by(
+            '-date'
+        ).values_list('closing_balance', flat=True).first()
+        return balance if balance is not None else Decimal('0.00')
+
+    @classmethod
+    def closing_balance_subquery(cls, stock_date, product_ref='pk'):
+        """Subquery to annotate a Product queryset with its stock at the end of `stock_date`"""
+        return models.Subquery(
+            cls.objects.filter(product_id=models.OuterRef(product_ref), date__lte=stock_date).order_by(
+                '-date'
+            ).values('closing_balance')[:1],
+            output_field=models.DecimalField(max_digits=10, decimal_places=2)
+        )
+
+    def __str__(self):
+        return f"{self.product} - {self.date}: {self.closing_balance}"
+
+    class Meta:
+        verbose_name = 'Product Daily Stock'
+        verbose_name_plural = 'Product Daily Stocks'
+        ordering = ['product', 'date']
+        unique_together = ('product', 'date')
@@ -0,0 +1,95 @@
+from decimal import Decimal
+from functools import lru_cache
+
+from .models import UNIT_CHOICES
+
+# Unit the kardex is kept in
+INVENTORY_UNIT = 'L'
+
+# Dimension of each unit in UNIT_CHOICES and its factor to the base unit of that dimension
+# (L for volume, KG for mass, HOUR for time). Packs depend on each product's pack size.
+VOLUME, MASS, PACK, TIME, SERVICE = 'VOLUME', 'MASS', 'PACK', 'TIME', 'SERVICE'
+UNIT_DIMENSIONS = {
+    'L': (VOLUME, Decimal('1')),
+    'ML': (VOLUME, Decimal('0.001')),
+    'KG': (MASS, Decimal('1')),
+    'G': (MASS, Decimal('0.001')),
+    'BAG': (PACK, None),
+    'SACK': (PACK, None),
+    'CONTAINER': (PACK, None),
+    'HOUR': (TIME, Decimal('1')),
+    'DAY': (TIME, Decimal('24')),
+    'SERVICE': (SERVICE, None),
+}
+
+
+def _build_conversion_matrix():
+    """Factors between every pair of units of UNIT_CHOICES that convert without product data"""
+    matrix = {}
+    for from_unit, _ in UNIT_CHOICES:
+        for to_unit, _ in UNIT_CHOICES:
+            from_dimension, from_factor = UNIT_DIMENSIONS[from_unit]
+            to_dimension, to_factor = UNIT_DIMENSIONS[to_unit]
+            if from_unit == to_unit:
+                matrix[from_unit, to_unit] = Decimal('1')
+            elif from_dimension == to_dimension and from_factor and to_factor:
+                matrix[from_unit, to_unit] = from_factor / to_factor
+    return matrix
+
+
+CONVERSION_MATRIX = _build_conversion_matrix()
+
+
+@lru_cache(maxsize=4096)
+def _get_product_factor(from_unit, to_unit, density, pack_size, pack_unit):
+    """
+    Factor between two units using a product's density (kg/L) and pack size.
+    Cached by value, so products sharing the same data share the entry.
+    """
+    factor = CONVERSION_MATRIX.get((from_unit, to_unit))
+    if factor is not None:
+        return factor
+    from_dimension = UNIT_DIMENSIONS.get(from_unit, (None, None))[0]
+    to_dimension = UNIT_DIMENSIONS.get(to_unit, (None, None))[0]
+
+    # Packs are expanded into the unit of their contents
+    if from_dimension == PACK:
+        if not pack_size or not pack_unit:
+            return None
+        factor = _get_product_factor(pack_unit, to_unit, density, pack_size, pack_unit)
+        return pack_size * factor if factor is not None else None
+    if to_dimension == PACK:
+        factor = _get_product_factor(to_unit, from_unit, density, pack_size, pack_unit)
+        return 1 / factor if factor else None
+
+    # Mass <-> volume through the density
+    if not density:
+        return None
+    if from_dimension == MASS and to_dimension == VOLUME:
+        return CONVERSION_MATRIX[from_unit, 'KG'] / density * CONVERSION_MATRIX['L', to_unit]
+    if from_dimension == VOLUME and to_dimension == MASS:
+        return CONVERSION_MATRIX[from_unit, 'L'] * density * CONVERSION_MATRIX['KG', to_unit]
+    return None
+
+
+def get_conversion_factor(from_unit, to_unit, product=None):
+    """Factor to multiply a quantity in `from_unit` to get it in `to_unit`, or None if not convertible"""
+    if product is None:
+        return CONVERSION_MATRIX.get((from_unit, to_unit))
+    return _get_product_factor(from_unit, to_unit, product.density, product.pack_size, product.pack_unit)
+
+
+def convert(quantity, from_unit, to_unit, product=None):
+    """Convert a quantity between units (see get_conversion_factor); returns None if not convertible"""
+    factor = get_conversion_factor(from_unit, to_unit, product)
+    if factor is None:
+        return None
+    return Decimal(str(quantity)) * factor
+
+
+def to_inventory_quantity(product, unit, quantity):
+    """
+    Convert an applied quantity to the liters registered in the kardex.
+    Returns None when the product lacks the density or pack size the conversion needs.
+    """
+    return convert(quantity, unit, INVENTORY_UNIT, product)
@@ -10,6 +10,7 @@ urlpatterns = [
     path('update_product/', login_required(update_product), name='update_product'),
     path('inventory_transaction/', login_required(get_inventory_transaction_list), name='inventory_transaction'),
     path('inventory_transaction_grid/', login_required(get_inventory_transaction_grid), name='inventory_transaction_grid'),
+    path('get_product_stock/', login_required(get_product_stock), name='get_product_stock'),
     path('modal_product_selection/', login_required(modal_product_selection), name='modal_product_selection'),
     path('modal_inventory_entry_create/', login_required(modal_inventory_entry_create), name='modal_inventory_entry_create'),
     path('modal_inventory_exit_create/', login_required(modal_inventory_exit_create), name='modal_inventory_exit_create'),
@@ -42,10 +43,14 @@ urlpatterns = [
     # Crop Cycle Cost URLs
     path('crop_cycle_cost/', login_required(get_crop_cycle_cost_list), name='crop_cycle_cost'),
     path('crop_cycle_cost_grid/', login_required(get_crop_cycle_cost_grid), name='crop_cycle_cost_grid'),
+    path('get_crop_cost_summary/', login_required(get_crop_cost_summary), name='get_crop_cost_summary'),
+    path('get_plot_cost_summary/', login_required(get_plot_cost_summary), name='get_plot_cost_summary'),
+    path('get_farm_cost_per_hectare/', login_required(get_farm_cost_per_hectare), name='get_farm_cost_per_hectare'),
     path('modal_crop_cycle_cost_create/', login_required(modal_crop_cycle_cost_create), name='modal_crop_cycle_cost_create'),
     path('create_crop_cycle_cost/', login_required(create_crop_cycle_cost), name='create_crop_cycle_cost'),
     path('modal_crop_cycle_cost_update/', login_required(modal_crop_cycle_cost_update), name='modal_crop_cycle_cost_update'),
     path('update_crop_cycle_cost/', login_required(update_crop_cycle_cost), name='update_crop_cycle_cost'),
+    path('import_crop_cycle_costs/', login_required(import_crop_cycle_costs), name='import_crop_cycle_costs'),
     
     # Service Type URLs
     path('modal_service_type_create/', login_required(modal_service_type_create), name='modal_service_type_create'),
@@ -1,12 +1,17 @@
 from datetime import datetime
 from http import HTTPStatus
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from django.template import loader
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
 from django.shortcuts import render
-from django.db.models import Sum, Q
-from .models import Product, ServiceType, InventoryTransaction, Crop, CropType, Plot, CropCycleCost, UNIT_CHOICES
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import Product, ServiceType, InventoryTransaction, Crop, CropType, Plot, CropCycleCost, UNIT_CHOICES, \
+    ProductStockSnapshot, ProductDailyStock, CropCostRollup, PACK_UNIT_CHOICES
+from .crop_cost_report import build_crop_cost_report
+from .units import to_inventory_quantity
+from .crop_cost_import import import_crop_cycle_costs as run_crop_cost_import
 from apps.users.models import CustomUser
 
 
@@ -28,11 +33,35 @@ def modal_product_create(request):
                 'product_type_set': Product.PRODUCT_TYPE_CHOICES,
                 'product_category_set': Product.PRODUCT_CATEGORY_CHOICES,
                 'unit_set': UNIT_CHOICES,
+                'pack_unit_set': PACK_UNIT_CHOICES,
                 'service_type_set': service_type_set,
             }, request),
         })
 
 
+def get_unit_conversion_data(request, product_type):
+    """Density and pack size posted by the product forms (only products use them)"""
+    data = {'density': None, 'pack_size': None, 'pack_unit': None}
+    if product_type != Product.PRODUCT:
+        return data
+    for field, name, label in (('density', 'density', 'La densidad'), ('pack_size', 'pack-size', 'El contenido')):
+        value = request.POST.get(name, '')
+        if value:
+            try:
+                data[field] = Decimal(value)
+            except InvalidOperation:
+                raise ValueError(f'{label} debe ser un número válido')
+            if data[field] <= 0:
+                raise ValueError(f'{label} debe ser mayor a cero')
+    _pack_unit = request.POST.get('pack-unit', '')
+    if _pack_unit and _pack_unit not in dict(PACK_UNIT_CHOICES):
+        raise ValueError('Unidad del contenido inválida')
+    data['pack_unit'] = _pack_unit or None
+    if bool(data['pack_size']) != bool(data['pack_unit']):
+        raise ValueError('Indique el contenido y su unidad para bolsas, sacos o envases')
+    return data
+
+
 @csrf_exempt
 def create_product(request):
     if request.method == 'POST':
@@ -90,6 +119,14 @@ def create_product(request):
                     'message': 'El precio unitario debe ser un número válido'
                 }, status=HTTPStatus.BAD_REQUEST)
             
+            try:
+                unit_conversion = get_unit_conversion_data(request, _product_type)
+            except ValueError as e:
+                return JsonResponse({
+                    'success': False,
+                    'message': str(e)
+                }, status=HTTPStatus.BAD_REQUEST)
+            
             # Create Product object
             product_obj = Product(
                 name=_name,
@@ -101,6 +138,7 @@ def create_product(request):
                 service_type_id=int(_service_type_id) if _product_type == Product.SERVICE and _service_type_id else None,
                 observations=_observations if _observations else None,
                 active=(_active == 'true'),
+                **unit_conversion
             )
             
             # Process expiration date
@@ -138,6 +176,7 @@ def modal_product_update(request):
                     'product_type_set': Product.PRODUCT_TYPE_CHOICES,
                     'product_category_set': Product.PRODUCT_CATEGORY_CHOICES,
                     'unit_set': UNIT_CHOICES,
+                    'pack_unit_set': PACK_UNIT_CHOICES,
                     'service_type_set': service_type_set,
                 }, request),
             })
@@ -205,6 +244,14 @@ def update_product(request):
                     'message': 'El precio unitario debe ser un número válido'
                 }, status=HTTPStatus.BAD_REQUEST)
             
+            try:
+                unit_conversion = get_unit_conversion_data(request, _product_type)
+            except ValueError as e:
+                return JsonResponse({
+                    'success': False,
+                    'message': str(e)
+                }, status=HTTPStatus.BAD_REQUEST)
+            
             product_obj = Product.objects.get(id=int(product_id))
             product_obj.name = _name
             product_obj.product_type = _product_type
@@ -216,6 +263,9 @@ def update_product(request):
             product_obj.brand = _brand if _brand else None
             product_obj.observations = _observations if _observations else None
             product_obj.active = (_active == 'true')
+            product_obj.density = unit_conversion['density']
+            product_obj.pack_size = unit_conversion['pack_size']
+            product_obj.pack_unit = unit_conversion['pack_unit']
             
             # Process expiration date
             if _expiration_date:
@@ -247,46 +297,133 @@ def get_inventory_transaction_list(request):
             active=True,
             product_type=Product.PRODUCT,
             product_category__isnull=False
-        ).order_by('name')
+        ).select_related('stock_snapshot').order_by('name')
         product_id = request.GET.get('product_id', '')
         selected_product = None
-        transaction_set = None
         
         if product_id:
             try:
-                selected_product = Product.objects.get(
+                selected_product = Product.objects.select_related('stock_snapshot').get(
                     id=int(product_id),
                     active=True,
                     product_type=Product.PRODUCT,
                     product_category__isnull=False
                 )
-                transaction_set = InventoryTransaction.objects.filter(product_id=int(product_id)).order_by('created_at', 'id')
             except Product.DoesNotExist:
                 pass
         
+        # The kardex itself is loaded page by page through get_inventory_transaction_grid
         return render(request, 'farm/inventory_transaction_list.html', {
-            'transaction_set': transaction_set,
             'product_set': product_set,
             'product_id': product_id,
             'selected_product': selected_product,
         })
 
 
+KARDEX_PAGE_SIZE = 100
+
+
 def get_inventory_transaction_grid(request):
-    """Get inventory transactions grid for AJAX loading"""
+    """
+    Get inventory transactions grid for AJAX loading, one keyset page at a time.
+    Without `cursor` the grid with the first page is rendered; with `cursor` (the position of
+    the last row already shown) only the next rows are returned as JSON for "load more".
+    """
     if request.method == 'GET':
         product_id = request.GET.get('product_id', '')
+        cursor = request.GET.get('cursor', '')
         transaction_set = None
-        
+        has_more = False
+        total_count = 0
+        row_offset = 0
+
         if product_id:
             try:
-                transaction_set = InventoryTransaction.objects.filter(product_id=int(product_id)).order_by('created_at', 'id')
+                product_id = int(product_id)
+                row_offset = int(request.GET.get('shown', 0))
+                after_created_at, after_id = InventoryTransaction.parse_kardex_cursor(cursor) if cursor else (None, None)
+                transaction_set, has_more = InventoryTransaction.get_kardex_page(
+                    product_id, after_created_at, after_id, KARDEX_PAGE_SIZE
+                )
+                total_count = ProductStockSnapshot.objects.filter(product_id=product_id).values_list(
+                    'transaction_count', flat=True
+                ).first()
+                if total_count is None:
+                    # Products without a snapshot yet (e.g. loaded in bulk) are counted directly
+                    total_count = InventoryTransaction.objects.filter(product_id=product_id).count()
             except ValueError:
-                pass
-        
-        return render(request, 'farm/inventory_transaction_grid_list.html', {
+                if cursor:
+                    return JsonResponse({
+                        'success': False,
+                        'message': 'Parámetros inválidos'
+                    }, status=HTTPStatus.BAD_REQUEST)
+
+        context = {
             'transaction_set': transaction_set,
-        })
+            'has_more': has_more,
+            'next_cursor': transaction_set[-1].get_kardex_cursor() if transaction_set else '',
+            'total_count': total_count,
+            'row_offset': row_offset,
+        }
+        if cursor:
+            t = loader.get_template('farm/inventory_transaction_grid_rows.html')
+            return JsonResponse({
+                'success': True,
+                'rows': t.render(context, request),
+                'has_more': has_more,
+                'next_cursor': context['next_cursor'],
+                'shown': row_offset + len(transaction_set or []),
+            }, status=HTTPStatus.OK)
+        return render(request, 'farm/inventory_transaction_grid_list.html', context)
+
+
+def get_product_stock(request):
+    """
+    Stock of one or more products for AJAX. Without `date` the current stock is read from
+    the snapshot table; with `date` (YYYY-MM-DD) the closing balance of that day is returned.
+    """
+    if request.method == 'GET':
+        try:
+            product_ids = [int(pk) for pk in request.GET.get('product_ids', request.GET.get('product_id', '')).split(',') if pk]
+            stock_date = request.GET.get('date', '')
+            product_set = Product.objects.filter(
+                product_type=Product.PRODUCT,
+                product_category__isnull=False
+            ).order_by('name')
+            if product_ids:
+                product_set = product_set.filter(id__in=product_ids)
+
+            if stock_date:
+                stock_date = datetime.strptime(stock_date, '%Y-%m-%d').date()
+                product_set = product_set.annotate(
+                    stock=Coalesce(ProductDailyStock.closing_balance_subquery(stock_date), Value(Decimal('0.00')))
+                )
+            else:
+                product_set = product_set.annotate(
+                    stock=Coalesce('stock_snapshot__balance', Value(Decimal('0.00')))
+                )
+
+            stock_list = [{
+                'id': product.id,
+                'name': product.name,
+                'unit': product.unit,
+                'stock': float(product.stock),
+            } for product in product_set]
+            return JsonResponse({
+                'success': True,
+                'date': stock_date.strftime('%Y-%m-%d') if stock_date else None,
+                'products': stock_list
+            }, status=HTTPStatus.OK)
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Parámetros inválidos'
+            }, status=HTTPStatus.BAD_REQUEST)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Error al obtener stock: {str(e)}'
+            }, status=HTTPStatus.INTERNAL_SERVER_ERROR)
 
 
 def modal_product_selection(request):
@@ -362,7 +499,7 @@ def modal_inventory_exit_create(request):
                 'message': 'Product not found or product cannot have inventory'
             }, status=HTTPStatus.NOT_FOUND)
         
-        crop_set = Crop.objects.filter(active=True).order_by('crop_name', 'crop_type')
+        crop_set = Crop.objects.filter(active=True).select_related('plot').order_by('crop_name', 'crop_type')
         t = loader.get_template('farm/inventory_exit_create.html')
         return JsonResponse({
             'form': t.render({
@@ -795,7 +932,7 @@ def update_crop_type(request):
 
 def get_plot_list(request):
     if request.method == 'GET':
-        plot_set = Plot.objects.all().order_by('name')
+        plot_set = Plot.objects.select_related('subsidiary').order_by('name')
         return render(request, 'farm/plot_list.html', {
             'plot_set': plot_set,
         })
@@ -977,7 +1114,10 @@ def update_plot(request):
 
 def get_crop_list(request):
     if request.method == 'GET':
-        crop_set = Crop.objects.all().order_by('-planting_date', 'plot')
+        # Plot and cost count in the same query as the crops
+        crop_set = Crop.objects.select_related('plot').annotate(
+            cost_count=Count('crop_cycle_costs')
+        ).order_by('-planting_date', 'plot')
         plot_set = Plot.objects.filter(active=True).order_by('name')
         crop_type_set = CropType.objects.filter(is_active=True).order_by('name')
         return render(request, 'farm/crop_list.html', {
@@ -1280,158 +1420,53 @@ def update_crop(request):
 def get_crop_cycle_cost_list(request):
     """List view for crop cycle costs, filtered by crop"""
     if request.method == 'GET':
-        crop_set = Crop.objects.filter(active=True).order_by('-planting_date', 'plot')
+        crop_set = Crop.objects.filter(active=True).select_related('plot').order_by('-planting_date', 'plot')
         crop_id = request.GET.get('crop_id', '')
         selected_crop = None
-        cost_set = None
-        total_accumulated = Decimal('0.00')
-        category_totals = {
-            'JORNALES': Decimal('0.00'),
-            'AGROQUIMICOS': Decimal('0.00'),
-            'ALQUILER': Decimal('0.00'),
-            'TRACTOR': Decimal('0.00'),
-            'ELECTROSTATICA': Decimal('0.00'),
-            'COSECHA': Decimal('0.00'),
+        report = {
+            'cost_set': None,
+            'cost_set_agrochemicals_services': None,
+            'cost_set_fertilizers': None,
+            'total_accumulated': Decimal('0.00'),
+            'total_accumulated_agrochemicals_services': Decimal('0.00'),
+            'total_accumulated_fertilizers': Decimal('0.00'),
+            'fertilizer_table_data': [],
+            'fertilizer_dates': [],
+            'fertilizer_date_totals': [],
+            'category_totals': {},
+            'category_list': [],
         }
         
-        # Separate cost sets: agrochemicals & services together, and fertilizers separately
-        cost_set_agrochemicals_services = None
-        cost_set_fertilizers = None
-        total_accumulated_agrochemicals_services = Decimal('0.00')
-        total_accumulated_fertilizers = Decimal('0.00')
-        
         if crop_id:
             try:
-                selected_crop = Crop.objects.get(id=int(crop_id), active=True)
-                all_costs = CropCycleCost.objects.filter(crop_id=int(crop_id)).order_by('-application_date', 'id')
-                
-                # Filter costs: fertilizers (PRODUCT with FERTILIZER category)
-                cost_set_fertilizers = all_costs.filter(
-                    product__product_type=Product.PRODUCT,
-                    product__product_category=Product.FERTILIZER
-                ).order_by('application_date', 'product__name')
-                
-                # Prepare fertilizer table data: group by date and fertilizer
-                fertilizer_table_data = []
-                fertilizer_dates = []
-                fertilizer_date_totals = []
-                
-                if cost_set_fertilizers:
-                    # Get unique dates
-                    dates_set = sorted(set(cost.application_date for cost in cost_set_fertilizers))
-                    fertilizer_dates = dates_set
-                    
-                    # Get unique products
-                    products_dict = {}
-                    for cost in cost_set_fertilizers:
-                        product_id = cost.product.id
-                        if product_id not in products_dict:
-                            products_dict[product_id] = {
-                                'id': product_id,
-                                'name': cost.product.name,
-                                'unit': cost.unit,
-                                'quantities_list': [],  # List of quantities in date order
-                                'total_quantity': Decimal('0.00')
-                            }
-                        products_dict[product_id]['total_quantity'] += cost.quantity
-                    
-                    # Build quantities_list for each product in date order
-                    for product_id, product_data in products_dict.items():
-                        product_data['quantities_list'] = []
-                        for date in fertilizer_dates:
-                            # Find quantity for this date
-                            quantity = None
-                            for cost in cost_set_fertilizers:
-                                if cost.product.id == product_id and cost.application_date == date:
-                                    quantity = cost.quantity
-                                    break
-                            product_data['quantities_list'].append(quantity)
-                    
-                    # Convert to list sorted by name
-                    fertilizer_table_data = sorted(products_dict.values(), key=lambda x: x['name'])
-                    
-                    # Calculate totals by date as list of (date, total) tuples
-                    for date in fertilizer_dates:
-                        date_costs = cost_set_fertilizers.filter(application_date=date)
-                        date_total = date_costs.aggregate(total=Sum('total_cost'))
-                        fertilizer_date_totals.append((date, date_total['total'] or Decimal('0.00')))
-                
-                # Filter costs: agrochemicals (PRODUCT with AGROCHEMICAL category) and services (SERVICE type) together
-                cost_set_agrochemicals_services = all_costs.filter(
-                    Q(product__product_type=Product.PRODUCT, product__product_category=Product.AGROCHEMICAL) |
-                    Q(product__product_type=Product.SERVICE)
-                )
-                
-                # Calculate totals for each type
-                fertilizers_result = cost_set_fertilizers.aggregate(total=Sum('total_cost'))
-                if fertilizers_result['total']:
-                    total_accumulated_fertilizers = fertilizers_result['total']
-                
-                agrochemicals_services_result = cost_set_agrochemicals_services.aggregate(total=Sum('total_cost'))
-                if agrochemicals_services_result['total']:
-                    total_accumulated_agrochemicals_services = agrochemicals_services_result['total']
-                
-                # For backward compatibility, keep cost_set as all non-fertilizer costs
-                cost_set = all_costs.exclude(
-                    product__product_type=Product.PRODUCT,
-                    product__product_category=Product.FERTILIZER
-                )
-                
-                # Calculate total accumulated (excluding fertilizers)
-                total_result = cost_set.aggregate(total=Sum('total_cost'))
-                if total_result['total']:
-                    total_accumulated = total_result['total']
-                
-                # Calculate totals by category (only agrochemicals and services, exclude fertilizers)
-                for cost in cost_set:
-                    if cost.total_cost:
-                        category = cost.get_category()
-                        # Skip fertilizers - they will have a separate report
-                        if category == 'FERTILIZANTES':
-                            continue
-                        # Handle 'OTROS' category or add to existing
-                        if category not in category_totals:
-                            category_totals[category] = Decimal('0.00')
-                        category_totals[category] += cost.total_cost
+                selected_crop = Crop.objects.select_related('plot').get(id=int(crop_id), active=True)
+                # Fertilizers are reported separately in a products x dates table
+                report.update(build_crop_cost_report(selected_crop.id))
             except Crop.DoesNotExist:
                 pass
         
-        # Filter categories with values > 0 and create ordered list
-        # Order: JORNALES, AGROQUIMICOS, ALQUILER, TRACTOR, ELECTROSTATICA, COSECHA, OTROS
-        # Note: FERTILIZANTES excluded - they will have a separate report
-        category_order = ['JORNALES', 'AGROQUIMICOS', 'ALQUILER', 'TRACTOR', 'ELECTROSTATICA', 'COSECHA', 'OTROS']
-        category_list = []
-        if crop_id:
-            for cat in category_order:
-                if cat in category_totals and category_totals[cat] > 0:
-                    category_list.append((cat, category_totals[cat]))
-            
-            # Add any other categories not in the predefined order
-            for cat, amount in category_totals.items():
-                if cat not in category_order and amount > 0:
-                    category_list.append((cat, amount))
-        
         # Get active products (both agrochemicals and fertilizers) and services separately for global use
         # Include all products for the create modal (will be filtered by category in the frontend)
         product_set = Product.objects.filter(active=True, product_type=Product.PRODUCT).order_by('product_category', 'name')
-        service_set = Product.objects.filter(active=True, product_type=Product.SERVICE).order_by('name')
+        service_set = Product.objects.filter(active=True, product_type=Product.SERVICE).select_related(
+            'service_type').order_by('name')
         now_date = datetime.now()
 
         return render(request, 'farm/crop_cycle_cost_list.html', {
-            'cost_set': cost_set,
-            'cost_set_agrochemicals_services': cost_set_agrochemicals_services,
-            'cost_set_fertilizers': cost_set_fertilizers,
-            'total_accumulated_agrochemicals_services': total_accumulated_agrochemicals_services,
-            'total_accumulated_fertilizers': total_accumulated_fertilizers,
-            'fertilizer_table_data': fertilizer_table_data if 'fertilizer_table_data' in locals() else [],
-            'fertilizer_dates': fertilizer_dates if 'fertilizer_dates' in locals() else [],
-            'fertilizer_date_totals': fertilizer_date_totals if 'fertilizer_date_totals' in locals() else {},
+            'cost_set': report['cost_set'],
+            'cost_set_agrochemicals_services': report['cost_set_agrochemicals_services'],
+            'cost_set_fertilizers': report['cost_set_fertilizers'],
+            'total_accumulated_agrochemicals_services': report['total_accumulated_agrochemicals_services'],
+            'total_accumulated_fertilizers': report['total_accumulated_fertilizers'],
+            'fertilizer_table_data': report['fertilizer_table_data'],
+            'fertilizer_dates': report['fertilizer_dates'],
+            'fertilizer_date_totals': report['fertilizer_date_totals'],
             'crop_set': crop_set,
             'crop_id': crop_id,
             'selected_crop': selected_crop,
-            'total_accumulated': total_accumulated,
-            'category_totals': category_totals,
-            'category_list': category_list,
+            'total_accumulated': report['total_accumulated'],
+            'category_totals': report['category_totals'],
+            'category_list': report['category_list'],
             'product_set': product_set,
             'service_set': service_set,
             'unit_set': UNIT_CHOICES,
@@ -1446,34 +1481,15 @@ def get_crop_cycle_cost_grid(request):
         crop_id = request.GET.get('crop_id', '')
         cost_set = None
         total_accumulated = Decimal('0.00')
-        category_totals = {
-            'JORNALES': Decimal('0.00'),
-            'AGROQUIMICOS': Decimal('0.00'),
-            'ALQUILER': Decimal('0.00'),
-            'TRACTOR': Decimal('0.00'),
-            'ELECTROSTATICA': Decimal('0.00'),
-            'COSECHA': Decimal('0.00'),
-        }
+        category_totals = {}
         
         if crop_id:
             try:
-                cost_set = CropCycleCost.objects.filter(crop_id=int(crop_id)).order_by('-application_date', 'id')
-                # Calculate total accumulated
-                total_result = cost_set.aggregate(total=Sum('total_cost'))
-                if total_result['total']:
-                    total_accumulated = total_result['total']
-                
-                # Calculate totals by category (only agrochemicals and services, exclude fertilizers)
-                for cost in cost_set:
-                    if cost.total_cost:
-                        category = cost.get_category()
-                        # Skip fertilizers - they will have a separate report
-                        if category == 'FERTILIZANTES':
-                            continue
-                        if category in category_totals:
-                            category_totals[category] += cost.total_cost
-                        else:
-                            category_totals[category] = cost.total_cost
+                report = build_crop_cost_report(int(crop_id))
+                cost_set = report['all_costs']
+                total_accumulated = report['total_all']
+                # Category totals only cover agrochemicals and services, fertilizers have a separate report
+                category_totals = report['category_totals']
             except ValueError:
                 pass
         
@@ -1484,6 +1500,145 @@ def get_crop_cycle_cost_grid(request):
         })
 
 
+def cost_per_hectare(total, area):
+    return float(total / area) if area else None
+
+
+def get_crop_cost_summary(request):
+    """Cost summary of a crop by category and month, served from CropCostRollup"""
+    if request.method == 'GET':
+        try:
+            crop = Crop.objects.get(id=int(request.GET.get('crop_id', '')))
+            rollup_set = CropCostRollup.objects.filter(crop=crop).order_by('month', 'category')
+
+            total = Decimal('0.00')
+            category_totals = {}
+            month_totals = {}
+            for rollup in rollup_set:
+                total += rollup.total_cost
+                category_totals[rollup.category] = category_totals.get(rollup.category, Decimal('0.00')) + rollup.total_cost
+                month = rollup.month.strftime('%Y-%m')
+                month_totals[month] = month_totals.get(month, Decimal('0.00')) + rollup.total_cost
+
+            return JsonResponse({
+                'success': True,
+                'crop_id': crop.id,
+                'planted_area': float(crop.planted_area),
+                'total': float(total),
+                'cost_per_hectare': cost_per_hectare(total, crop.planted_area),
+                'categories': [{'category': c, 'total': float(t)} for c, t in category_totals.items()],
+                'months': [{'month': m, 'total': float(t)} for m, t in month_totals.items()],
+            }, status=HTTPStatus.OK)
+        except (ValueError, Crop.DoesNotExist):
+            return JsonResponse({
+                'success': False,
+                'message': 'Cultivo no encontrado'
+            }, status=HTTPStatus.NOT_FOUND)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Error al obtener resumen de costos: {str(e)}'
+            }, status=HTTPStatus.INTERNAL_SERVER_ERROR)
+
+
+def get_plot_cost_summary(request):
+    """Cost summary of a plot by crop and category, served from CropCostRollup"""
+    if request.method == 'GET':
+        try:
+            plot = Plot.objects.get(id=int(request.GET.get('plot_id', '')))
+            crop_set = Crop.objects.filter(plot=plot).order_by('-planting_date')
+            rollup_set = CropCostRollup.objects.filter(crop__plot=plot).values('crop_id', 'category').annotate(
+                total=Sum('total_cost')
+            ).order_by()
+
+            crop_categories = {}
+            for row in rollup_set:
+                crop_categories.setdefault(row['crop_id'], {})[row['category']] = row['total']
+
+            crops = []
+            plot_total = Decimal('0.00')
+            for crop in crop_set:
+                categories = crop_categories.get(crop.id, {})
+                crop_total = sum(categories.values(), Decimal('0.00'))
+                plot_total += crop_total
+                crops.append({
+                    'id': crop.id,
+                    'name': crop.crop_name or crop.crop_type,
+                    'planting_date': crop.planting_date.strftime('%Y-%m-%d'),
+                    'planted_area': float(crop.planted_area),
+                    'total': float(crop_total),
+                    'cost_per_hectare': cost_per_hectare(crop_total, crop.planted_area),
+                    'categories': [{'category': c, 'total': float(t)} for c, t in categories.items()],
+                })
+
+            return JsonResponse({
+                'success': True,
+                'plot_id': plot.id,
+                'area_hectares': float(plot.area_hectares),
+                'total': float(plot_total),
+                'cost_per_hectare': cost_per_hectare(plot_total, plot.area_hectares),
+                'crops': crops,
+            }, status=HTTPStatus.OK)
+        except (ValueError, Plot.DoesNotExist):
+            return JsonResponse({
+                'success': False,
+                'message': 'Parcela no encontrada'
+            }, status=HTTPStatus.NOT_FOUND)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Error al obtener resumen de costos: {str(e)}'
+            }, status=HTTPStatus.INTERNAL_SERVER_ERROR)
+
+
+def get_farm_cost_per_hectare(request):
+    """Farm-wide cost per hectare by plot, optionally limited to a year (served from CropCostRollup)"""
+    if request.method == 'GET':
+        try:
+            rollup_set = CropCostRollup.objects.all()
+            year = request.GET.get('year', '')
+            if year:
+                rollup_set = rollup_set.filter(month__year=int(year))
+            plot_totals = {
+                row['crop__plot_id']: row['total']
+                for row in rollup_set.values('crop__plot_id').annotate(total=Sum('total_cost')).order_by()
+            }
+
+            plots = []
+            farm_total = Decimal('0.00')
+            farm_area = Decimal('0.00')
+            for plot in Plot.objects.filter(active=True).order_by('name'):
+                plot_total = plot_totals.get(plot.id) or Decimal('0.00')
+                farm_total += plot_total
+                farm_area += plot.area_hectares
+                plots.append({
+                    'id': plot.id,
+                    'name': plot.name,
+                    'area_hectares': float(plot.area_hectares),
+                    'total': float(plot_total),
+                    'cost_per_hectare': cost_per_hectare(plot_total, plot.area_hectares),
+                })
+
+            return JsonResponse({
+                'success': True,
+                'year': int(year) if year else None,
+                'area_hectares': float(farm_area),
+                'total': float(farm_total),
+                'cost_per_hectare': cost_per_hectare(farm_total, farm_area),
+                'plots': plots,
+            }, status=HTTPStatus.OK)
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Año inválido'
+            }, status=HTTPStatus.BAD_REQUEST)
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Error al obtener costo por hectárea: {str(e)}'
+            }, status=HTTPStatus.INTERNAL_SERVER_ERROR)
+
+
 def modal_crop_cycle_cost_create(request):
     """Modal to create crop cycle cost"""
     if request.method == 'GET':
@@ -1660,47 +1815,26 @@ def create_crop_cycle_cost(request):
                     pass
             
             cost_obj.save()
+            message = 'Costo de ciclo de cultivo registrado exitosamente'
             
             # Create inventory transaction automatically if product has inventory (PRODUCT type with category)
             # Register as exit (consumption) when a PRODUCT type is used in crop cycle cost
             if product.product_type == Product.PRODUCT and product.has_inventory():
-                exit_quantity_liters = None
-                
-                # Convert quantity to liters based on unit
-                if _unit == 'L':
-                    # Direct liters
-                    exit_quantity_liters = Decimal(str(quantity_val))
-                elif _unit == 'ML':
-                    # Convert milliliters to liters (divide by 1000)
-                    exit_quantity_liters = Decimal(str(quantity_val)) / Decimal('1000')
-                elif _unit in ['KG', 'G', 'BAG', 'SACK', 'CONTAINER']:
-                    # These units cannot be automatically converted to liters without density information
-                    # For now, we skip auto-registration but could be improved in the future
-                    # If product unit is L or ML, use that as a hint
-                    if product.unit == 'L':
-                        # If product's default unit is liters, assume the quantity is in liters
-                        exit_quantity_liters = Decimal(str(quantity_val))
-                    elif product.unit == 'ML':
-                        # If product's default unit is milliliters, convert
-                        exit_quantity_liters = Decimal(str(quantity_val)) / Decimal('1000')
-                    # Otherwise, skip automatic registration (user can register manually)
+                # Convert quantity to liters based on unit (None when it cannot be converted)
+                exit_quantity_liters = to_inventory_quantity(product, _unit, quantity_val)
+                if exit_quantity_liters is None:
+                    message += f'. No se registró la salida de inventario: configure la densidad o el contenido por envase de {product.name}'
                 
                 # Create inventory exit transaction if we have a valid quantity in liters
                 if exit_quantity_liters is not None and exit_quantity_liters > 0:
                     try:
-                        # Build observations text
-                        obs_text = f'Aplicación automática desde costo de ciclo de cultivo'
-                        if cost_obj.application_method:
-                            obs_text += f' - Método: {cost_obj.application_method}'
-                        if cost_obj.observations:
-                            obs_text += f' - Observaciones: {cost_obj.observations}'
-                        
                         inventory_transaction = InventoryTransaction(
                             product=product,
                             exit_date=cost_obj.application_date,
                             exit_quantity=exit_quantity_liters,
                             crop=crop,
-                            observations=obs_text
+                            crop_cycle_cost=cost_obj,
+                            observations=cost_obj.get_inventory_observations()
                         )
                         inventory_transaction.save()
                     except Exception as inv_error:
@@ -1711,7 +1845,7 @@ def create_crop_cycle_cost(request):
             
             return JsonResponse({
                 'success': True,
-                'message': 'Costo de ciclo de cultivo registrado exitosamente'
+                'message': message
             }, status=HTTPStatus.OK)
             
         except Exception as e:
@@ -1721,6 +1855,49 @@ def create_crop_cycle_cost(request):
             }, status=HTTPStatus.INTERNAL_SERVER_ERROR)
 
 
+@csrf_exempt
+def import_crop_cycle_costs(request):
+    """
+    Bulk import of crop cycle costs from an xlsx/csv file (field `file`). With `dry_run=true`
+    the file is only validated and the errors are reported per row.
+    """
+    if request.method == 'POST':
+        try:
+            _file = request.FILES.get('file')
+            _crop_id = request.POST.get('crop_id', '')
+            _dry_run = request.POST.get('dry_run', 'false') == 'true'
+
+            if not _file:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Archivo es requerido'
+                }, status=HTTPStatus.BAD_REQUEST)
+
+            try:
+                report = run_crop_cost_import(_file, _file.name, crop_id=_crop_id or None,
+                                              responsible=request.user, dry_run=_dry_run)
+            except ValueError as e:
+                return JsonResponse({
+                    'success': False,
+                    'message': str(e)
+                }, status=HTTPStatus.BAD_REQUEST)
+
+            if report['errors']:
+                report['message'] = f'El archivo tiene errores en {len(report["errors"])} fila(s)'
+                return JsonResponse(report, status=HTTPStatus.BAD_REQUEST)
+            if _dry_run:
+                report['message'] = f'{report["costs"]} costos válidos, no se registró nada (simulación)'
+            else:
+                report['message'] = f'{report["costs"]} costos importados exitosamente'
+            return JsonResponse(report, status=HTTPStatus.OK)
+
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'message': f'Error al importar costos: {str(e)}'
+            }, status=HTTPStatus.INTERNAL_SERVER_ERROR)
+
+
 def modal_crop_cycle_cost_update(request):
     """Modal to update crop cycle cost"""
     if request.method == 'GET':
@@ -1810,13 +1987,6 @@ def update_crop_cycle_cost(request):
             
             cost_obj = CropCycleCost.objects.get(id=int(cost_id))
             
-            # Get old values before updating (for inventory transaction matching)
-            old_product_id = cost_obj.product_id
-            old_crop_id = cost_obj.crop_id
-            old_quantity = cost_obj.quantity
-            old_unit = cost_obj.unit
-            old_date = cost_obj.application_date
-            
             cost_obj.crop_id = int(_crop_id)
             cost_obj.product_id = int(_product_id)
             cost_obj.unit = _unit
@@ -1897,79 +2067,47 @@ def update_crop_cycle_cost(request):
                     'message': 'Producto no encontrado'
                 }, status=HTTPStatus.BAD_REQUEST)
             
+            related_transaction = InventoryTransaction.objects.filter(crop_cycle_cost=cost_obj).first()
+            message = 'Costo de ciclo de cultivo actualizado exitosamente'
+            exit_quantity_liters = None
+            uses_inventory = updated_product.product_type == Product.PRODUCT and updated_product.has_inventory()
+            if uses_inventory:
+                # Convert quantity to liters based on unit (None when it cannot be converted)
+                exit_quantity_liters = to_inventory_quantity(updated_product, _unit, quantity_val)
+                if exit_quantity_liters is None:
+                    if related_transaction is not None:
+                        # Keep the existing exit instead of silently returning the stock
+                        return JsonResponse({
+                            'success': False,
+                            'message': f'No se puede convertir {_unit} a la unidad de inventario: configure la densidad o el contenido por envase de {updated_product.name}'
+                        }, status=HTTPStatus.BAD_REQUEST)
+                    message += f'. No se registró la salida de inventario: configure la densidad o el contenido por envase de {updated_product.name}'
+            
             cost_obj.save()
             
-            # Update or create inventory transaction if product is PRODUCT type with inventory
-            if updated_product.product_type == Product.PRODUCT and updated_product.has_inventory():
-                exit_quantity_liters = None
-                
-                # Convert quantity to liters based on unit
-                if _unit == 'L':
-                    exit_quantity_liters = Decimal(str(quantity_val))
-                elif _unit == 'ML':
-                    exit_quantity_liters = Decimal(str(quantity_val)) / Decimal('1000')
-                elif _unit in ['KG', 'G', 'BAG', 'SACK', 'CONTAINER']:
-                    # Use product's default unit as hint
-                    if updated_product.unit == 'L':
-                        exit_quantity_liters = Decimal(str(quantity_val))
-                    elif updated_product.unit == 'ML':
-                        exit_quantity_liters = Decimal(str(quantity_val)) / Decimal('1000')
-                
+            # Update, create or reverse the inventory exit linked to this cost
+            try:
                 if exit_quantity_liters is not None and exit_quantity_liters > 0:
-                    try:
-                        # Try to find existing inventory transaction related to this cost
-                        # Look for transaction with same product, crop, and date from the old values
-                        related_transaction = None
-                        if old_product_id and old_crop_id and old_date:
-                            try:
-                                old_product_obj = Product.objects.get(id=old_product_id)
-                                old_crop_obj = Crop.objects.get(id=old_crop_id)
-                                
-                                # Search for transaction with old product, old crop, and old date
-                                related_transaction = InventoryTransaction.objects.filter(
-                                    product_id=old_product_id,
-                                    crop_id=old_crop_id,
-                                    exit_date=old_date,
-                                    exit_quantity__isnull=False,
-                                    observations__icontains='Aplicación automática desde costo de ciclo'
-                                ).order_by('-created_at').first()
-                            except (Product.DoesNotExist, Crop.DoesNotExist):
-                                pass
-                        
-                        # Build observations text
-                        obs_text = f'Aplicación automática desde costo de ciclo de cultivo'
-                        if cost_obj.application_method:
-                            obs_text += f' - Método: {cost_obj.application_method}'
-                        if cost_obj.observations:
-                            obs_text += f' - Observaciones: {cost_obj.observations}'
-                        
-                        if related_transaction and 'Aplicación automática desde costo de ciclo' in (related_transaction.observations or ''):
-                            # Update existing transaction
-                            related_transaction.product = updated_product
-                            related_transaction.exit_date = cost_obj.application_date
-                            related_transaction.exit_quantity = exit_quantity_liters
-                            related_transaction.crop = cost_obj.crop
-                            related_transaction.observations = obs_text
-                            related_transaction.save()
-                        else:
-                            # Create new transaction
-                            inventory_transaction = InventoryTransaction(
-                                product=updated_product,
-                                exit_date=cost_obj.application_date,
-                                exit_quantity=exit_quantity_liters,
-                                crop=cost_obj.crop,
-                                observations=obs_text
-                            )
-                            inventory_transaction.save()
-                    except Exception as inv_error:
-                        # Log error but don't fail the cost update
-                        import logging
-                        logger = logging.getLogger(__name__)
-                        logger.error(f'Error updating inventory transaction for crop cycle cost {cost_obj.id}: {str(inv_error)}')
+                    if related_transaction is None:
+                        related_transaction = InventoryTransaction(crop_cycle_cost=cost_obj)
+                    related_transaction.product = updated_product
+                    related_transaction.exit_date = cost_obj.application_date
+                    related_transaction.exit_quantity = exit_quantity_liters
+                    related_transaction.crop = cost_obj.crop
+                    related_transaction.observations = cost_obj.get_inventory_observations()
+                    related_transaction.save()
+                elif related_transaction is not None and not uses_inventory:
+                    # The cost no longer refers to an inventory product: reverse its exit
+                    related_transaction.delete()
+            except Exception as inv_error:
+                # Log error but don't fail the cost update
+                import logging
+                logger = logging.getLogger(__name__)
+                logger.error(f'Error updating inventory transaction for crop cycle cost {cost_obj.id}: {str(inv_error)}')
             
             return JsonResponse({
                 'success': True,
-                'message': 'Costo de ciclo de cultivo actualizado exitosamente'
+                'message': message
             }, status=HTTPStatus.OK)
             
         except Exception as e:
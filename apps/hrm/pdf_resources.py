@@ -0,0 +1,160 @@
+"""
+Recursos compartidos para generar PDF: fuentes TrueType y hoja de estilos de párrafo.
+Nada se carga al importar el módulo: cada fuente se registra en reportlab la primera vez que
+se usa un estilo que la necesita (o se pide con get_font) y la hoja de estilos se arma una vez
+por proceso. Si falta el archivo de una fuente se usa Helvetica en lugar de fallar.
+"""
+import logging
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from reportlab.lib.colors import HexColor, white
+from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY, TA_RIGHT
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle, StyleSheet1
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont, TTFError
+
+logger = logging.getLogger(__name__)
+
+FONTS_DIR = os.path.join(str(settings.BASE_DIR), 'static', 'fonts')
+FALLBACK_FONT = 'Helvetica'
+
+# Nombre de la fuente en los estilos -> archivo en static/fonts
+FONT_FILES = {
+    'Narrow': 'Arial Narrow.ttf',
+    'Narrow-a': 'ARIALN.TTF',
+    'Narrow-b': 'ARIALNB.TTF',
+    'Narrow-c': 'Arialnbi.ttf',
+    'Narrow-d': 'ARIALNI.TTF',
+    'Square': 'square-721-condensed-bt.ttf',
+    'Square-Bold': 'sqr721bc.ttf',
+    'Newgot': 'newgotbc.ttf',
+    'Dotcirful-Regular': 'DotcirfulRegular.otf',
+    'Ticketing': 'ticketing.regular.ttf',
+    'Lucida-Console': 'lucida-console.ttf',
+    'Square-Dot': 'square_dot_digital-7.ttf',
+    'Serif-Dot': 'serif_dot_digital-7.ttf',
+    'Enhanced-Dot-Digital': 'enhanced-dot-digital-7.regular.ttf',
+    'Merchant-Copy-Wide': 'MerchantCopyWide.ttf',
+    'Dot-Digital': 'dot_digital-7.ttf',
+    'Raleway-Dots-Regular': 'RalewayDotsRegular.ttf',
+    'Ordre-Depart': 'Ordre-de-Depart.ttf',
+    'Nationfd': 'Nationfd.ttf',
+    'Kg-Primary-Dots': 'KgPrimaryDots-Pl0E.ttf',
+    'Dot-line': 'Dotline-LA7g.ttf',
+    'Dot-line-Light': 'DotlineLight-XXeo.ttf',
+    'Jd-Lcd-Rounded': 'JdLcdRoundedRegular-vXwE.ttf',
+}
+
+# Estilos de párrafo: nombre, alineación, interlineado, fuente, tamaño y atributos adicionales
+PARAGRAPH_STYLES = (
+    ('Right', TA_RIGHT, 8, 'Square', 8),
+    ('Title1', TA_JUSTIFY, 8, 'Helvetica', 12),
+    ('Left-text', TA_LEFT, 8, 'Square', 8),
+    ('Left_Square', TA_LEFT, 10, 'Square', 10),
+    ('Justify_Square', TA_JUSTIFY, 10, 'Square', 10),
+    ('Justify_Newgot_title', TA_JUSTIFY, 14, 'Newgot', 14),
+    ('Center_Newgot_title', TA_CENTER, 15, 'Newgot', 15),
+    ('Center_Newgots', TA_CENTER, 13, 'Newgot', 13),
+    ('Center_Newgots_invoice', TA_CENTER, 13, 'Newgot', 13, {'textColor': white}),
+    ('Left_Newgots', TA_LEFT, 14, 'Newgot', 13),
+    ('Justify_Newgot', TA_JUSTIFY, 10, 'Newgot', 10),
+    ('Center_Newgot', TA_CENTER, 11, 'Newgot', 11),
+    ('Center_Newgot_1', TA_CENTER, 11, 'Newgot', 9),
+    ('Right_Newgot', TA_RIGHT, 12, 'Newgot', 12),
+    ('Justify_Lucida', TA_JUSTIFY, 11, 'Lucida-Console', 11),
+    ('Justify', TA_JUSTIFY, 14, 'Square', 12),
+    ('Justify-Dotcirful', TA_JUSTIFY, 11, 'Dotcirful-Regular', 11),
+    ('Justify-Dotcirful-table', TA_JUSTIFY, 12, 'Dotcirful-Regular', 7),
+    ('Justify_Bold', TA_JUSTIFY, 8, 'Square-Bold', 8),
+    ('Justify_Square_Bold', TA_JUSTIFY, 5, 'Square-Bold', 10),
+    ('Center', TA_CENTER, 8, 'Square', 8),
+    ('Center_a4', TA_CENTER, 12, 'Square', 12),
+    ('Justify_a4', TA_JUSTIFY, 12, 'Square', 12),
+    ('Center-Dotcirful', TA_CENTER, 12, 'Dotcirful-Regular', 10),
+    ('Left', TA_LEFT, 12, 'Square', 12),
+    ('CenterTitle', TA_CENTER, 14, 'Square-Bold', 14),
+    ('CenterTitle-Dotcirful', TA_CENTER, 12, 'Dotcirful-Regular', 10),
+    ('CenterTitle2', TA_CENTER, 8, 'Square-Bold', 12),
+    ('Center_Regular', TA_CENTER, 8, 'Ticketing', 11),
+    ('Center_Bold', TA_CENTER, 8, 'Square-Bold', 12, {'spaceBefore': 6, 'spaceAfter': 6}),
+    ('Center2', TA_CENTER, 8, 'Ticketing', 8),
+    ('Center3', TA_JUSTIFY, 8, 'Ticketing', 7),
+    ('narrow_justify', TA_JUSTIFY, 11, 'Narrow', 10),
+    ('narrow_justify_observation', TA_JUSTIFY, 9, 'Narrow', 8),
+    ('narrow_center', TA_CENTER, 10, 'Narrow', 10),
+    ('narrow_b_tittle_center', TA_CENTER, 11, 'Narrow-b', 11, {'textColor': white}),
+    ('narrow_center_pie', TA_CENTER, 8, 'Narrow-b', 10),
+    ('narrow_left', TA_LEFT, 12, 'Narrow', 10),
+    ('narrow_a_justify', TA_JUSTIFY, 10, 'Narrow-a', 9),
+    ('narrow_b_justify', TA_JUSTIFY, 11, 'Narrow-b', 10),
+    ('narrow_a_center', TA_CENTER, 13, 'Narrow-a', 12),
+    ('narrow_a_right', TA_RIGHT, 11, 'Narrow-a', 11),
+    ('narrow_a_paragraph_justify', TA_JUSTIFY, 13, 'Narrow-a', 12, {'leftIndent': 0, 'rightIndent': 0}),
+    ('narrow_b_tittle_justify', TA_JUSTIFY, 12, 'Narrow-b', 12),
+    ('narrow_c_justify', TA_JUSTIFY, 10, 'Narrow-c', 10),
+    ('narrow_d_justify', TA_JUSTIFY, 10, 'Narrow-d', 10),
+    ('narrow_boleta_justify', TA_JUSTIFY, 10, 'Narrow-b', 10),
+    ('narrow_boleta1_justify', TA_JUSTIFY, 9, 'Narrow-b', 9),
+    ('narrow_boleta_firma_center', TA_CENTER, 9, 'Narrow-b', 9),
+    ('narrow_boleta_firma1_center', TA_CENTER, 8, 'Narrow-b', 8),
+    ('narrow_boleta_left', TA_LEFT, 8, 'Narrow', 8),
+    ('narrow_boleta_right', TA_RIGHT, 8, 'Narrow', 8),
+    ('boleta_date_right', TA_RIGHT, 9, 'Narrow-a', 9),
+    ('narrow_a_leading', TA_LEFT, 6, 'Narrow-a', 5),
+    ('narrow_b_tittle_center_leading', TA_CENTER, 6, 'Narrow-b', 5, {'textColor': white}),
+)
+
+# Estilos de los reportes de contabilidad: nombre, estilo base y atributos
+REPORT_STYLES = (
+    ('Report_Title', 'Heading1', {'fontSize': 18, 'spaceAfter': 30, 'alignment': TA_CENTER,
+                                  'textColor': HexColor('#007bff')}),
+    ('Report_User_Title', 'Heading1', {'fontSize': 16, 'spaceAfter': 30, 'alignment': TA_CENTER}),
+    ('Report_Cell', 'Normal', {'fontSize': 8, 'leading': 10, 'alignment': TA_CENTER, 'leftIndent': 0,
+                               'rightIndent': 0}),
+)
+
+
+@lru_cache(maxsize=None)
+def get_font(name):
+    """
+    Nombre de fuente listo para usar en estilos y tablas: registra la TTF la primera vez.
+    Las fuentes estándar de PDF (Helvetica, Times, ...) se devuelven tal cual.
+    """
+    if name not in FONT_FILES:
+        return name
+    try:
+        pdfmetrics.registerFont(TTFont(name, os.path.join(FONTS_DIR, FONT_FILES[name])))
+    except (TTFError, OSError) as e:
+        logger.warning('No se pudo cargar la fuente %s (%s), se usa %s', name, e, FALLBACK_FONT)
+        return FALLBACK_FONT
+    return name
+
+
+class LazyFontStyleSheet(StyleSheet1):
+    """Hoja de estilos que registra la fuente de un estilo al pedirlo"""
+
+    def __getitem__(self, key):
+        style = super().__getitem__(key)
+        if isinstance(style, ParagraphStyle):
+            style.fontName = get_font(style.fontName)
+        return style
+
+
+@lru_cache(maxsize=None)
+def get_stylesheet():
+    """
+    Hoja de estilos compartida (estilos de ejemplo de reportlab + los de la aplicación), una por proceso.
+    Los estilos no deben modificarse: para variantes crear un ParagraphStyle con parent.
+    """
+    sample = getSampleStyleSheet()
+    styles = LazyFontStyleSheet()
+    styles.byName.update(sample.byName)
+    styles.byAlias.update(sample.byAlias)
+    for name, alignment, leading, font_name, font_size, *extra in PARAGRAPH_STYLES:
+        styles.add(ParagraphStyle(name=name, alignment=alignment, leading=leading, fontName=font_name,
+                                  fontSize=font_size, **(extra[0] if extra else {})))
+    for name, parent, attributes in REPORT_STYLES:
+        styles.add(ParagraphStyle(name, parent=sample[parent], **attributes))
+    return styles